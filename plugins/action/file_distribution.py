@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible_collections.pulp.squeezer.plugins.plugin_utils.pulp_action import PulpActionModule
+
+
+class ActionModule(PulpActionModule):
+    pass
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+  name: api_stats
+  type: aggregate
+  short_description: Summarize the Pulp api usage of squeezer tasks
+  description:
+    - "This callback collects the C(metrics) returned by squeezer modules called with I(metrics=true), together with the duration of their tasks."
+    - "At the end of the playbook it ranks the tasks by duration and by number of requests,
+      and sums up the time spent waiting for Pulp tasks and the bytes uploaded as artifacts."
+    - "Setting I(metrics) for all squeezer modules is easiest done via C(module_defaults)."
+  requirements:
+    - enable in configuration
+  options:
+    top:
+      description:
+        - Number of tasks to show in each ranking.
+      type: int
+      default: 10
+      env:
+        - name: SQUEEZER_API_STATS_TOP
+      ini:
+        - section: callback_api_stats
+          key: top
+    output_file:
+      description:
+        - File to write the collected data to as json.
+      type: path
+      env:
+        - name: SQUEEZER_API_STATS_FILE
+      ini:
+        - section: callback_api_stats
+          key: output_file
+'''
+
+
+import json
+import time
+from collections import OrderedDict
+
+from ansible.plugins.callback import CallbackBase
+
+
+COUNTERS = ['requests', 'retries', 'latency', 'task_wait', 'polls', 'bytes_sent', 'bytes_received', 'bytes_uploaded']
+
+
+def _metrics(result):
+    # Looped tasks return the metrics of every item
+    metrics = [result.get('metrics')]
+    metrics.extend(item.get('metrics') for item in result.get('results', []) if isinstance(item, dict))
+    return [entry for entry in metrics if entry]
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'pulp.squeezer.api_stats'
+    CALLBACK_NEEDS_WHITELIST = True
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)
+        self.task_starts = {}
+        self.tasks = OrderedDict()
+
+    def _start_task(self, task):
+        self.task_starts[task._uuid] = time.time()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._start_task(task)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._start_task(task)
+
+    def _record(self, result):
+        metrics = _metrics(result._result)
+        if not metrics:
+            return
+        task = result._task
+        record = self.tasks.get(task._uuid)
+        if record is None:
+            record = dict(name=task.get_name(), action=task.action, hosts=0, duration=0.0, **dict.fromkeys(COUNTERS, 0))
+            self.tasks[task._uuid] = record
+        record['hosts'] += 1
+        # Wall clock time of the task until its last host finished
+        record['duration'] = max(record['duration'], time.time() - self.task_starts.get(task._uuid, time.time()))
+        for entry in metrics:
+            record['requests'] += entry['requests']
+            record['retries'] += entry['retries']
+            record['latency'] += entry['latency']['total']
+            record['task_wait'] += entry['task_wait']['time']
+            record['polls'] += entry['task_wait']['polls']
+            record['bytes_sent'] += entry['bytes_sent']
+            record['bytes_received'] += entry['bytes_received']
+            record['bytes_uploaded'] += entry.get('bytes_uploaded', 0)
+
+    def v2_runner_on_ok(self, result):
+        self._record(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result)
+
+    def _display_ranking(self, title, key, fmt):
+        self._display.display(title)
+        tasks = sorted(self.tasks.values(), key=lambda record: record[key], reverse=True)[:self.get_option('top')]
+        for record in tasks:
+            self._display.display('  {0:>12}  {1} ({2})'.format(fmt.format(record[key]), record['name'], record['action']))
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.tasks:
+            return
+        totals = dict((counter, sum(record[counter] for record in self.tasks.values())) for counter in COUNTERS)
+        totals['tasks'] = len(self.tasks)
+
+        self._display.banner('PULP API STATS')
+        self._display_ranking('Slowest tasks:', 'duration', '{0:.2f}s')
+        self._display_ranking('Most requests:', 'requests', '{0}')
+        self._display.display('Requests: {requests} ({retries} retries) in {latency:.2f}s'.format(**totals))
+        self._display.display('Waiting for Pulp tasks: {task_wait:.2f}s in {polls} polls'.format(**totals))
+        self._display.display('Uploaded: {bytes_uploaded} bytes'.format(**totals))
+
+        output_file = self.get_option('output_file')
+        if output_file:
+            with open(output_file, 'w') as stats_file:
+                json.dump({'tasks': list(self.tasks.values()), 'totals': totals}, stats_file, indent=2)
@@ -33,6 +33,132 @@ options:
       - Whether SSL certificates should be verified.
     type: bool
     default: true
+  auth_method:
+    description:
+      - How to authenticate against the api.
+      - With C(basic), username and password are sent with every request, and the server checks the password every time.
+      - With C(session), the module logs in once and authenticates all further requests with the session cookie.
+    type: str
+    choices:
+      - basic
+      - session
+    default: basic
+  session_cache_dir:
+    description:
+      - Directory to keep sessions in across module runs, until they expire.
+      - Only used with I(auth_method=session). The directory must only be accessible by its owner, and so are the files in it.
+      - A cached session the server does not take any more is replaced by logging in again.
+      - If not set, the environment variable C(SQUEEZER_SESSION_CACHE_DIR) is used. Without either, every module run logs in anew.
+    type: path
+  catalog:
+    description:
+      - Catalog of entities as collected by the M(catalog) module.
+      - Entities found in the catalog are not looked up on the server unless they need to be changed.
+      - The catalog is a snapshot, so it needs to be collected again after entities have been modified by other means (e.g. by a sync).
+    type: dict
+  lookup_cache_dir:
+    description:
+      - Directory to cache entities looked up by name across module runs in.
+      - Entities found in the cache are not looked up on the server unless they need to be changed.
+      - Entries are kept per server and user.
+      - If not set, the environment variable C(SQUEEZER_LOOKUP_CACHE_DIR) is used. Without either, no cache is used.
+    type: path
+  lookup_cache_ttl:
+    description:
+      - Seconds after which an entry of the lookup cache expires.
+    type: int
+    default: 3600
+  lookup_cache_verify:
+    description:
+      - Whether to check entities found in the lookup cache against the server.
+      - This reads only the fields that change with an entity, like C(pulp_last_updated), which is cheaper than a search by name.
+    type: bool
+    default: false
+  persistent_connection_dir:
+    description:
+      - Directory for the socket of a local daemon to send all api requests through.
+      - The daemon is started on demand and keeps its connections to the server open across module runs, so tls handshakes and logins are not repeated.
+      - The directory must only be accessible by its owner, and only a daemon of the same user is used.
+      - Statistics of the daemon, like how many requests found an open connection, are returned as C(persistent_connection).
+      - If not set, the environment variable C(SQUEEZER_PERSISTENT_CONNECTION_DIR) is used. Without either, every module run connects anew.
+    type: path
+  persistent_connection_idle_timeout:
+    description:
+      - Seconds after which an unused daemon shuts itself down.
+    type: int
+    default: 60
+  request_retries:
+    description:
+      - Number of times to repeat a request answered with status 429, 502, 503 or 504, waiting exponentially longer or as told by C(Retry-After) in between.
+      - Only requests that are safe to repeat (C(GET), C(HEAD), C(OPTIONS), C(PUT) and C(DELETE), like the chunks of uploads) are retried.
+      - The number of retried requests is returned as C(retries), if any.
+      - Set to C(0) to disable retrying.
+    type: int
+    default: 3
+  request_retry_backoff:
+    description:
+      - Seconds to wait before the first retry of a request. Every further retry doubles the wait, up to a minute.
+    type: float
+    default: 0.5
+  rate_limit:
+    description:
+      - Maximum number of requests per second to send to I(pulp_url), with bursts of up to a second worth of requests.
+      - The limit is shared by all module runs on the same machine using the same I(rate_limit_dir), like the forks of a playbook run on the controller.
+      - If not set, the environment variable C(SQUEEZER_RATE_LIMIT) is used. Without either, requests are not limited.
+    type: float
+  max_concurrent_requests:
+    description:
+      - Maximum number of requests to I(pulp_url) in flight at the same time, shared like I(rate_limit).
+      - If not set, the environment variable C(SQUEEZER_MAX_CONCURRENT_REQUESTS) is used.
+    type: int
+  rate_limit_dir:
+    description:
+      - Directory for the lock files holding the state of I(rate_limit) and I(max_concurrent_requests).
+      - If not set, the environment variable C(SQUEEZER_RATE_LIMIT_DIR) is used, and C(~/.ansible/tmp/squeezer-rate-limit) after that.
+      - The directory must only be accessible by its owner.
+      - The time spent waiting is returned as C(rate_limit_wait) with the I(metrics).
+    type: path
+  task_poll_interval:
+    description:
+      - Seconds to wait between polls of a task the module waits for.
+      - If not set, the environment variable C(SQUEEZER_TASK_POLL_INTERVAL) is used.
+    type: float
+    default: 2
+  metrics:
+    description:
+      - Whether to record all api requests of the module run and return a summary as C(metrics).
+      - The summary holds the number of requests, their latency with percentiles, bytes sent, received and uploaded as artifacts, retries,
+        counts by status and by endpoint, as well as the time spent waiting for tasks and the number of polls.
+    type: bool
+    default: false
+  trace_file:
+    description:
+      - File to append a trace of the module run to.
+      - The trace is a tree of spans covering the setup, imports of client packages, lookups and changes of entities,
+        every http request, upload chunk and task poll. Every module run appends one line of OTLP/JSON, as understood by OpenTelemetry tools.
+      - If not set, the environment variable C(SQUEEZER_TRACE_FILE) is used. Without either, nothing is traced.
+    type: path
+  profile:
+    description:
+      - Profile the module run with C(cpu) (cProfile) and/or C(memory) (tracemalloc), and return the top entries as C(profile).
+      - If not set, the environment variable C(SQUEEZER_PROFILE) is used as a comma separated list.
+      - Profiling memory needs python 3.4 or newer.
+    type: list
+    elements: str
+    choices:
+      - cpu
+      - memory
+  profile_dir:
+    description:
+      - Directory to write the full profiling data to, to be examined with C(pstats) or C(tracemalloc.Snapshot.load).
+      - If not set, the environment variable C(SQUEEZER_PROFILE_DIR) is used.
+    type: path
+  feature_sources:
+    description:
+      - Sources of the module_utils of optional features (like I(auth_method=session), I(lookup_cache_dir) or I(trace_file)), which are not part of the module.
+      - The action plugin sends them along for the options of the task needing them. Not to be set in tasks.
+    type: list
+    elements: list
 '''
 
     ENTITY_STATE = r'''
@@ -6,11 +6,8 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
-import traceback
-
-from ansible.module_utils.basic import missing_required_lib
-
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
+    PulpClient,
     PulpEntity,
 )
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
@@ -19,57 +16,43 @@ from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
     PulpRepositoryMixin,
 )
 
-try:
-    from pulpcore.client import pulp_ansible
-    HAS_PULP_ANSIBLE_CLIENT = True
-except ImportError:
-    class Dummy():
-        def __getattr__(self, attr):
-            return Dummy()
 
-    pulp_ansible = Dummy()
-
-    HAS_PULP_ANSIBLE_CLIENT = False
-    PULP_ANSIBLE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+pulp_ansible = PulpClient('pulp_ansible', 'pulp_ansible-client')
 
 
 class PulpAnsibleEntity(PulpEntity):
-    _api_client_class = pulp_ansible.ApiClient
-
-    def __init__(self, module, *args, **kwargs):
-        if not HAS_PULP_ANSIBLE_CLIENT:
-            module.fail_json(
-                msg=missing_required_lib('pulp_ansible-client'),
-                exception=PULP_ANSIBLE_CLIENT_IMPORT_ERROR,
-            )
-        super(PulpAnsibleEntity, self).__init__(module, *args, **kwargs)
+    _client = pulp_ansible
+    _plugin_name = 'ansible'
 
 
 class PulpAnsibleDistribution(PulpDistributionMixin, PulpAnsibleEntity):
-    _api_class = pulp_ansible.DistributionsAnsibleApi
-    _api_entity_class = pulp_ansible.AnsibleAnsibleDistribution
+    _api_class = pulp_ansible.lazy('DistributionsAnsibleApi')
+    _api_entity_class = pulp_ansible.lazy('AnsibleAnsibleDistribution')
 
-    def update(self):
-        if 'repository' in self.desired_attributes:
-            self.entity.repository_version = None
-        if 'repository_version' in self.desired_attributes:
-            self.entity.repository = None
-        return super(PulpAnsibleDistribution, self).update()
+    def changes(self):
+        # Serving a repository clears the repository version and vice versa
+        changes = super(PulpAnsibleDistribution, self).changes()
+        if changes:
+            for key, other in [('repository', 'repository_version'), ('repository_version', 'repository')]:
+                if key in self.desired_attributes and getattr(self.entity, other, None) is not None:
+                    changes[other] = None
+        return changes
 
 
 class PulpAnsibleRemote(PulpRemoteMixin, PulpAnsibleEntity):
-    _api_class = pulp_ansible.RemotesAnsibleApi
-    _api_entity_class = pulp_ansible.AnsibleAnsibleRemote
+    _api_class = pulp_ansible.lazy('RemotesAnsibleApi')
+    _api_entity_class = pulp_ansible.lazy('AnsibleAnsibleRemote')
 
 
 class PulpAnsibleRepository(PulpRepositoryMixin, PulpAnsibleEntity):
-    _api_class = pulp_ansible.RepositoriesAnsibleApi
-    _api_entity_class = pulp_ansible.AnsibleAnsibleRepository
+    _api_class = pulp_ansible.lazy('RepositoriesAnsibleApi')
+    _api_entity_class = pulp_ansible.lazy('AnsibleAnsibleRepository')
+    _api_sync_class = pulp_ansible.lazy('RepositorySyncURL')
 
 
 class PulpAnsibleRole(PulpAnsibleEntity):
     _name_singular = 'content'
     _name_plural = 'contents'
 
-    _api_class = pulp_ansible.ContentRolesApi
-    _api_entity_class = pulp_ansible.AnsibleRole
+    _api_class = pulp_ansible.lazy('ContentRolesApi')
+    _api_entity_class = pulp_ansible.lazy('AnsibleRole')
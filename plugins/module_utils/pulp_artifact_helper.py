@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
+    PulpArtifactEntity,
+    PulpEntity,
+    PulpTask,
+    pulpcore,
+)
+
+
+CONTENT_CHUNK_SIZE = 512 * 1024  # 1/2 MB
+
+
+class PulpArtifact(PulpArtifactEntity):
+    def _api_class(self, *args, **kwargs):
+        scope = self
+
+        class NewArtifactsApi(pulpcore.ArtifactsApi):
+            def create(self, entity, **kwargs):
+                size = os.stat(entity.file).st_size
+                if size > CONTENT_CHUNK_SIZE:
+                    artifact_href = PulpUpload(scope.module).chunked_upload(entity.file, entity.sha256, size)
+                    artifact = self.read(artifact_href)
+                else:
+                    # TODO Why is the ArtifactsApi strange with create?
+                    payload = {
+                        'file': entity.file,
+                        'sha256': entity.sha256,
+                    }
+                    payload.update(kwargs)
+                    artifact = super(NewArtifactsApi, self).create(**payload)
+                # Only what the server took counts as uploaded
+                if scope.module.metrics is not None:
+                    scope.module.metrics.upload(size)
+                return artifact
+
+        return NewArtifactsApi(*args, **kwargs)
+
+
+class PulpUpload(PulpEntity):
+    _api_class = pulpcore.lazy('UploadsApi')
+
+    def chunked_upload(self, path, sha256, size):
+        offset = 0
+
+        upload = self.api.create(pulpcore.Upload(size=size))
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(CONTENT_CHUNK_SIZE), b""):
+                    actual_chunk_size = len(chunk)
+                    content_range = 'bytes {start}-{end}/{size}'.format(
+                        start=offset,
+                        end=offset + actual_chunk_size - 1,
+                        size=size,
+                    )
+                    temp_dir = mkdtemp(dir="/tmp")
+                    try:
+                        chunk_file_name = os.path.join(temp_dir, 'chunk.bin')
+                        with open(chunk_file_name, 'wb') as chunk_file:
+                            chunk_file.write(chunk)
+                        with self.module.trace('PulpUpload.chunk', **{'pulp.content_range': content_range}):
+                            upload = self.api.update(
+                                upload_href=upload.pulp_href,
+                                file=chunk_file_name,
+                                content_range=content_range,
+                            )
+                    finally:
+                        rmtree(temp_dir)
+                    offset += actual_chunk_size
+
+                response = self.api.commit(
+                    upload.pulp_href, pulpcore.UploadCommit(sha256=sha256)
+                )
+                task = PulpTask(self.module, {'pulp_href': response.task}).wait_for()
+                artifact_href = task.created_resources[0]
+        except Exception:
+            self.api.delete(upload.pulp_href)
+            raise
+
+        return artifact_href
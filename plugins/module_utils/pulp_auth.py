@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from email.utils import mktime_tz, parsedate_tz
+from tempfile import mkstemp
+
+from ansible.module_utils.six.moves import http_cookies
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_files import open_private, private_directory
+
+
+LOGIN_PATH = '/auth/login/'
+# Used if the server does not tell when the session expires
+SESSION_LIFETIME = 24 * 3600
+# Random key of the cache directory, to tell the credentials a session was opened with without storing them
+SECRET_FILE = 'secret'
+SECRET_SIZE = 32
+
+
+# Django session of the api user.
+# The password is checked once at login; all later requests present the session cookie instead.
+class PulpSession(object):
+    def __init__(self, pulp_url, username, password, cache_dir=None):
+        self.pulp_url = pulp_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.cache_dir = cache_dir
+        self.cookies = None
+        self.expires = None
+        self.from_cache = False
+        self.renewed = False
+
+    @property
+    def login_url(self):
+        return self.pulp_url + LOGIN_PATH
+
+    @property
+    def cache_file(self):
+        key = json.dumps([self.pulp_url, self.username])
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _secret(self):
+        path = os.path.join(self.cache_dir, SECRET_FILE)
+        if not os.path.exists(path):
+            fd, temp_name = mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as secret_file:
+                secret_file.write(os.urandom(SECRET_SIZE))
+            try:
+                # Unlike a rename, this keeps the secret another process stored first
+                os.link(temp_name, path)
+            except OSError:
+                if not os.path.exists(path):
+                    raise
+            finally:
+                os.remove(temp_name)
+        with os.fdopen(open_private(path, os.O_RDONLY), 'rb') as secret_file:
+            return secret_file.read()
+
+    def _credentials(self):
+        # A cached session is never handed out for other credentials
+        key = json.dumps([self.pulp_url, self.username, self.password])
+        return hmac.new(self._secret(), key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    @property
+    def cookie(self):
+        return '; '.join('{0}={1}'.format(name, value) for name, value in sorted(self.cookies.items()))
+
+    @property
+    def headers(self):
+        return {
+            'X-CSRFToken': self.cookies.get('csrftoken', ''),
+            'Referer': self.login_url,
+        }
+
+    def open(self, pool_manager):
+        # The pool manager of the api client's rest client, so the same tls settings apply
+        if not self.load():
+            self.login(pool_manager)
+            self.save()
+        return self
+
+    def wrap(self, pool_manager):
+        return PulpSessionPoolManager(pool_manager, self)
+
+    def renew(self, pool_manager):
+        # A cached session may have ended on the server before its cookie expired; log in once more
+        if not self.from_cache or self.renewed:
+            return False
+        self.renewed = True
+        self.forget()
+        self.login(pool_manager)
+        self.save()
+        return True
+
+    def _set_cookies(self, response, cookies):
+        for header in response.headers.getlist('Set-Cookie'):
+            cookie = http_cookies.SimpleCookie()
+            cookie.load(header)
+            cookies.update(cookie)
+
+    def login(self, pool_manager):
+        cookies = http_cookies.SimpleCookie()
+        response = pool_manager.request('GET', self.login_url)
+        self._set_cookies(response, cookies)
+        csrftoken = cookies['csrftoken'].value if 'csrftoken' in cookies else ''
+        response = pool_manager.request(
+            'POST',
+            self.login_url,
+            fields={
+                'username': self.username,
+                'password': self.password,
+                'csrfmiddlewaretoken': csrftoken,
+            },
+            encode_multipart=False,
+            headers={'Referer': self.login_url, 'Cookie': 'csrftoken=' + csrftoken},
+            redirect=False,
+        )
+        self._set_cookies(response, cookies)
+        # A successful login redirects
+        if response.status not in [301, 302, 303] or 'sessionid' not in cookies:
+            raise Exception("Failed to log in to {0} as {1}.".format(self.pulp_url, self.username))
+        self.cookies = dict((name, morsel.value) for name, morsel in cookies.items())
+        session = cookies['sessionid']
+        if session['max-age']:
+            self.expires = time.time() + int(session['max-age'])
+        elif session['expires']:
+            self.expires = mktime_tz(parsedate_tz(session['expires']))
+        else:
+            self.expires = time.time() + SESSION_LIFETIME
+        self.from_cache = False
+
+    def load(self):
+        if not self.cache_dir:
+            return False
+        try:
+            with open(self.cache_file) as cache_file:
+                record = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return False
+        if record['expires'] < time.time():
+            self.forget()
+            return False
+        private_directory(self.cache_dir)
+        if not hmac.compare_digest(str(record.get('credentials')), self._credentials()):
+            return False
+        self.cookies = record['cookies']
+        self.expires = record['expires']
+        self.from_cache = True
+        return True
+
+    def save(self):
+        if not self.cache_dir:
+            return
+        private_directory(self.cache_dir)
+        # mkstemp creates the file readable by the owner only
+        fd, temp_name = mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump({'cookies': self.cookies, 'expires': self.expires, 'credentials': self._credentials()}, cache_file)
+        os.rename(temp_name, self.cache_file)
+
+    def forget(self):
+        if not self.cache_dir:
+            return
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
+
+
+# Stands in for the pool manager of the api clients, and presents the current session cookie with every request.
+# If the server does not take a cached session any more, the module logs in again and repeats the request.
+class PulpSessionPoolManager(object):
+    def __init__(self, pool_manager, session):
+        self.pool_manager = pool_manager
+        self.session = session
+
+    def _request(self, method, url, headers, **kwargs):
+        headers = dict(headers or {})
+        headers['Cookie'] = self.session.cookie
+        headers.update(self.session.headers)
+        return self.pool_manager.request(method, url, headers=headers, **kwargs)
+
+    def request(self, method, url, headers=None, **kwargs):
+        response = self._request(method, url, headers, **kwargs)
+        if response.status in [401, 403] and self.session.renew(self.pool_manager):
+            response = self._request(method, url, headers, **kwargs)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import time
+from tempfile import mkstemp
+
+
+LOOKUP_CACHE_SIZE = 1000
+
+
+# On disk cache of entities by (pulp_url, username, entity class, natural key).
+# Users may see different entities of the same server, so they never share entries.
+# Every entry lives in its own file, so concurrent processes never corrupt each other's entries.
+# The modification time of a file records its last use for LRU eviction.
+class PulpLookupCache(object):
+    def __init__(self, path, pulp_url, username, ttl, size=LOOKUP_CACHE_SIZE):
+        self.path = path
+        self.pulp_url = pulp_url
+        self.username = username
+        self.ttl = ttl
+        self.size = size
+
+    def _filename(self, entity_name, natural_key):
+        key = json.dumps([self.pulp_url, self.username, entity_name, natural_key], sort_keys=True)
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+    def get(self, entity_name, natural_key):
+        filename = self._filename(entity_name, natural_key)
+        try:
+            with open(filename) as cache_file:
+                record = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if record['stored'] + self.ttl < time.time():
+            self._remove(filename)
+            return None
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+        return record['entity']
+
+    def set(self, entity_name, natural_key, entity):
+        try:
+            os.makedirs(self.path, 0o700)
+        except OSError:
+            if not os.path.isdir(self.path):
+                raise
+        fd, temp_name = mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump({'stored': time.time(), 'entity': entity}, cache_file)
+        os.rename(temp_name, self._filename(entity_name, natural_key))
+        self.evict()
+
+    def invalidate(self, entity_name, natural_key):
+        self._remove(self._filename(entity_name, natural_key))
+
+    def evict(self):
+        filenames = [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.json')]
+        if len(filenames) > self.size:
+            entries = []
+            for filename in filenames:
+                try:
+                    entries.append((os.path.getmtime(filename), filename))
+                except OSError:
+                    pass
+            for _mtime, filename in sorted(entries)[:len(entries) - self.size]:
+                self._remove(filename)
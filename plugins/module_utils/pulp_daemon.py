@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import errno
+import fcntl
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_files import open_private, private_directory
+
+
+SOCKET_NAME = 'squeezer.sock'
+LOCK_NAME = 'squeezer.lock'
+IDLE_TIMEOUT = 60
+# Seconds to wait for new connections, before checking whether the daemon has been idle long enough
+ACCEPT_TIMEOUT = 1
+MAX_FD = 1024
+
+
+def _b64encode(data):
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return base64.b64encode(data).decode('ascii')
+
+
+def _b64decode(data):
+    return base64.b64decode(data.encode('ascii'))
+
+
+def encode_fields(fields):
+    # Files in multipart requests come as (filename, data, content_type) tuples, which json cannot carry
+    if fields is None:
+        return None
+    items = fields.items() if isinstance(fields, dict) else fields
+    result = []
+    for name, value in items:
+        if isinstance(value, (tuple, list)):
+            value = {'file': [value[0], _b64encode(value[1])] + list(value[2:])}
+        result.append([name, value])
+    return result
+
+
+def decode_fields(fields):
+    if fields is None:
+        return None
+    result = []
+    for name, value in fields:
+        if isinstance(value, dict):
+            value = tuple([value['file'][0], _b64decode(value['file'][1])] + value['file'][2:])
+        result.append((name, value))
+    return result
+
+
+def send_message(stream, message):
+    stream.write(json.dumps(message).encode('utf-8') + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+class PulpDaemonResponse(object):
+    # Mimics the urllib3 response the api client expects
+    def __init__(self, reply):
+        from urllib3._collections import HTTPHeaderDict
+
+        self.status = reply['status']
+        self.reason = reply['reason']
+        self.data = _b64decode(reply['data'])
+        self.headers = HTTPHeaderDict()
+        for name, value in reply['headers']:
+            self.headers.add(name, value)
+
+    def getheaders(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def release_conn(self):
+        pass
+
+
+# Stands in for the urllib3 pool manager of the api clients, and sends all requests through the daemon.
+# Every thread talks to the daemon on a connection of its own.
+class PulpDaemonPoolManager(object):
+    def __init__(self, path, tls, idle_timeout=IDLE_TIMEOUT):
+        self.path = path
+        self.tls = tls
+        self.idle_timeout = idle_timeout
+        self._local = threading.local()
+
+    @property
+    def socket_path(self):
+        return os.path.join(self.path, SOCKET_NAME)
+
+    def _connect(self):
+        try:
+            status = os.lstat(self.socket_path)
+        except OSError:
+            return None
+        # Requests carry credentials, so they only go to a daemon of the user
+        if not stat.S_ISSOCK(status.st_mode) or status.st_uid != os.getuid():
+            raise Exception("Refusing to use {0}, which is not a socket of the user.".format(self.socket_path))
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(self.socket_path)
+            stream = client.makefile('rwb')
+            # The daemon may have been shutting down while accepting the connection
+            send_message(stream, {'command': 'ping'})
+            if receive_message(stream) is not None:
+                return client, stream
+        except (IOError, OSError, ValueError):
+            pass
+        client.close()
+        return None
+
+    def connect(self):
+        if getattr(self._local, 'stream', None) is None:
+            private_directory(self.path)
+            connection = self._connect()
+            if connection is None:
+                start_daemon(self.path, self.idle_timeout)
+                connection = self._connect()
+                if connection is None:
+                    raise Exception("Failed to connect to the persistent connection in {0}.".format(self.path))
+            self._local.socket, self._local.stream = connection
+        return self._local.stream
+
+    def close(self):
+        # Leaves the daemon, like the end of the module process does
+        if getattr(self._local, 'stream', None) is not None:
+            self._local.socket.close()
+            self._local.stream = None
+
+    def _call(self, message):
+        stream = self.connect()
+        try:
+            send_message(stream, message)
+            reply = receive_message(stream)
+        except (IOError, OSError):
+            reply = None
+        if reply is None:
+            self._local.socket.close()
+            self._local.stream = None
+            raise Exception("Lost the persistent connection in {0}.".format(self.path))
+        if 'error' in reply:
+            raise Exception(reply['error'])
+        return reply
+
+    def request(self, method, url, fields=None, headers=None, body=None, encode_multipart=True,
+                timeout=None, redirect=True, preload_content=True, **kwargs):
+        if timeout is not None and not isinstance(timeout, (int, float)):
+            timeout = timeout.total
+        reply = self._call({
+            'command': 'request',
+            'tls': self.tls,
+            'method': method,
+            'url': url,
+            'fields': encode_fields(fields),
+            'headers': dict(headers or {}),
+            'body': None if body is None else _b64encode(body),
+            'encode_multipart': encode_multipart,
+            'timeout': timeout,
+            'redirect': redirect,
+        })
+        return PulpDaemonResponse(reply)
+
+    def stats(self):
+        return self._call({'command': 'stats'})['stats']
+
+
+def start_daemon(path, idle_timeout):
+    private_directory(path)
+    socket_path = os.path.join(path, SOCKET_NAME)
+    with os.fdopen(open_private(os.path.join(path, LOCK_NAME)), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Someone else may have been quicker
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(socket_path)
+            return
+        except (IOError, OSError):
+            pass
+        finally:
+            client.close()
+        try:
+            os.remove(socket_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        # The socket listens before the daemon is forked, so no connection attempt can come too early
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user may connect, from the moment the socket exists
+        umask = os.umask(0o077)
+        try:
+            listener.bind(socket_path)
+        finally:
+            os.umask(umask)
+        listener.listen(16)
+        # Needs to be loaded now, the payload of the module may be gone before the daemon first uses it
+        import urllib3  # noqa: F401
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.setsid()
+                if os.fork() == 0:
+                    devnull = os.open(os.devnull, os.O_RDWR)
+                    for fd in range(3):
+                        os.dup2(devnull, fd)
+                    os.closerange(3, listener.fileno())
+                    os.closerange(listener.fileno() + 1, MAX_FD)
+                    PulpDaemon(listener, path, idle_timeout).serve()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        listener.close()
+
+
+# Long lived process keeping connection pools (and with them tls handshakes and keep-alive connections) across module runs.
+# It leaves when nobody used it for idle_timeout seconds.
+class PulpDaemon(object):
+    def __init__(self, listener, path, idle_timeout):
+        self.listener = listener
+        self.path = path
+        self.socket_path = os.path.join(path, SOCKET_NAME)
+        self.inode = os.stat(self.socket_path).st_ino
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.pool_managers = {}
+        self.active = 0
+        self.last_active = time.time()
+        self.counters = {
+            'pid': os.getpid(),
+            'started': time.time(),
+            'clients': 0,
+            'requests': 0,
+            'errors': 0,
+            # Requests finding the pool manager for their tls settings, and the ones creating it
+            'pool_manager_hits': 0,
+            'pool_manager_misses': 0,
+        }
+
+    def pool_manager(self, tls):
+        import ssl
+        import urllib3
+
+        key = json.dumps(tls, sort_keys=True)
+        with self.lock:
+            if key in self.pool_managers:
+                self.counters['pool_manager_hits'] += 1
+            else:
+                self.counters['pool_manager_misses'] += 1
+                kwargs = dict(
+                    num_pools=32,
+                    maxsize=4,
+                    cert_reqs=ssl.CERT_REQUIRED if tls['verify_ssl'] else ssl.CERT_NONE,
+                    ca_certs=tls['ca_certs'],
+                    cert_file=tls['cert_file'],
+                    key_file=tls['key_file'],
+                )
+                if tls['proxy']:
+                    self.pool_managers[key] = urllib3.ProxyManager(proxy_url=tls['proxy'], **kwargs)
+                else:
+                    self.pool_managers[key] = urllib3.PoolManager(**kwargs)
+            return self.pool_managers[key]
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            pools = [pool_manager.pools[key] for pool_manager in self.pool_managers.values() for key in pool_manager.pools.keys()]
+        stats['uptime'] = time.time() - stats.pop('started')
+        stats['pools'] = len(pools)
+        stats['connections'] = sum(pool.num_connections for pool in pools)
+        stats['reused'] = max(sum(pool.num_requests for pool in pools) - stats['connections'], 0)
+        # Share of the requests sent on a connection kept open from before
+        stats['connection_hit_rate'] = float(stats['reused']) / stats['requests'] if stats['requests'] else 0.0
+        return stats
+
+    def request(self, message):
+        pool_manager = self.pool_manager(message['tls'])
+        kwargs = dict(
+            headers=message['headers'],
+            timeout=message['timeout'],
+            redirect=message['redirect'],
+        )
+        if message['fields'] is not None:
+            kwargs['fields'] = decode_fields(message['fields'])
+            # Fields of the other methods go into the url
+            if message['method'] in ['POST', 'PUT', 'PATCH']:
+                kwargs['encode_multipart'] = message['encode_multipart']
+        elif message['body'] is not None:
+            kwargs.update(body=_b64decode(message['body']))
+        response = pool_manager.request(message['method'], message['url'], **kwargs)
+        return {
+            'status': response.status,
+            'reason': response.reason,
+            # Keep repeated headers like Set-Cookie apart
+            'headers': list(getattr(response.headers, 'iteritems', response.headers.items)()),
+            'data': _b64encode(response.data),
+        }
+
+    def dispatch(self, message):
+        if message['command'] == 'ping':
+            return {}
+        if message['command'] == 'stats':
+            return {'stats': self.stats()}
+        if message['command'] == 'request':
+            with self.lock:
+                self.counters['requests'] += 1
+            try:
+                return self.request(message)
+            except Exception as e:
+                with self.lock:
+                    self.counters['errors'] += 1
+                return {'error': "{0}: {1}".format(type(e).__name__, e)}
+        return {'error': "Unknown command {0}.".format(message['command'])}
+
+    def handle(self, connection):
+        try:
+            stream = connection.makefile('rwb')
+            while True:
+                message = receive_message(stream)
+                if message is None:
+                    break
+                send_message(stream, self.dispatch(message))
+        except (IOError, OSError, ValueError):
+            pass
+        finally:
+            connection.close()
+            with self.lock:
+                self.active -= 1
+                self.last_active = time.time()
+
+    def serve(self):
+        self.listener.settimeout(ACCEPT_TIMEOUT)
+        while True:
+            try:
+                connection, _address = self.listener.accept()
+            except socket.timeout:
+                with self.lock:
+                    if self.active == 0 and time.time() - self.last_active > self.idle_timeout:
+                        break
+                continue
+            connection.settimeout(None)
+            with self.lock:
+                self.active += 1
+                self.counters['clients'] += 1
+            thread = threading.Thread(target=self.handle, args=(connection,))
+            thread.daemon = True
+            thread.start()
+        self.shutdown()
+
+    def shutdown(self):
+        with os.fdopen(open_private(os.path.join(self.path, LOCK_NAME)), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.listener.close()
+            # A successor may already listen on a socket of the same name
+            try:
+                if os.stat(self.socket_path).st_ino == self.inode:
+                    os.remove(self.socket_path)
+            except OSError:
+                pass
@@ -6,12 +6,9 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
-import traceback
-
-from ansible.module_utils.basic import missing_required_lib
-
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
-    PulpArtifact,
+    PulpArtifactEntity,
+    PulpClient,
     PulpEntity,
 )
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
@@ -21,30 +18,13 @@ from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
     PulpRepositoryMixin,
 )
 
-try:
-    from pulpcore.client import pulp_file
-    HAS_PULP_FILE_CLIENT = True
-except ImportError:
-    class Dummy():
-        def __getattr__(self, attr):
-            return Dummy()
 
-    pulp_file = Dummy()
-
-    HAS_PULP_FILE_CLIENT = False
-    PULP_FILE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+pulp_file = PulpClient('pulp_file', 'pulp_file-client')
 
 
 class PulpFileEntity(PulpEntity):
-    _api_client_class = pulp_file.ApiClient
-
-    def __init__(self, module, *args, **kwargs):
-        if not HAS_PULP_FILE_CLIENT:
-            module.fail_json(
-                msg=missing_required_lib('pulp_file-client'),
-                exception=PULP_FILE_CLIENT_IMPORT_ERROR,
-            )
-        super(PulpFileEntity, self).__init__(module, *args, **kwargs)
+    _client = pulp_file
+    _plugin_name = 'file'
 
 
 class PulpFileContent(PulpFileEntity):
@@ -72,7 +52,7 @@ class PulpFileContent(PulpFileEntity):
                 # FileContent can only be searched by digest,
                 # while it wants artifact to create.
                 if 'sha256' in kwargs:
-                    artifact = PulpArtifact(scope.module, {'sha256': kwargs.pop('sha256')}).find()
+                    artifact = PulpArtifactEntity(scope.module, {'sha256': kwargs.pop('sha256')}).find()
                     kwargs['artifact'] = artifact.pulp_href
                 super(NewFileContent, self).__init__(**kwargs)
 
@@ -80,20 +60,21 @@ class PulpFileContent(PulpFileEntity):
 
 
 class PulpFileDistribution(PulpDistributionMixin, PulpFileEntity):
-    _api_class = pulp_file.DistributionsFileApi
-    _api_entity_class = pulp_file.FileFileDistribution
+    _api_class = pulp_file.lazy('DistributionsFileApi')
+    _api_entity_class = pulp_file.lazy('FileFileDistribution')
 
 
 class PulpFilePublication(PulpPublicationMixin, PulpFileEntity):
-    _api_class = pulp_file.PublicationsFileApi
-    _api_entity_class = pulp_file.FileFilePublication
+    _api_class = pulp_file.lazy('PublicationsFileApi')
+    _api_entity_class = pulp_file.lazy('FileFilePublication')
 
 
 class PulpFileRemote(PulpRemoteMixin, PulpFileEntity):
-    _api_class = pulp_file.RemotesFileApi
-    _api_entity_class = pulp_file.FileFileRemote
+    _api_class = pulp_file.lazy('RemotesFileApi')
+    _api_entity_class = pulp_file.lazy('FileFileRemote')
 
 
 class PulpFileRepository(PulpRepositoryMixin, PulpFileEntity):
-    _api_class = pulp_file.RepositoriesFileApi
-    _api_entity_class = pulp_file.FileFileRepository
+    _api_class = pulp_file.lazy('RepositoriesFileApi')
+    _api_entity_class = pulp_file.lazy('FileFileRepository')
+    _api_sync_class = pulp_file.lazy('RepositorySyncURL')
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+import stat
+
+
+# Files holding secrets or shared state (sessions, locks, sockets) live in directories only their owner can use.
+def private_directory(path):
+    try:
+        os.makedirs(path, 0o700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    # makedirs leaves an existing directory (or a link to one) as it is
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or stat.S_IMODE(status.st_mode) & 0o077:
+        raise Exception("The directory {0} must be owned by the user and not be accessible by others.".format(path))
+    return path
+
+
+def open_private(path, flags=os.O_RDWR):
+    # Opens (or creates) a file readable by the owner only, never following a link placed instead
+    fd = os.open(path, flags | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    if os.fstat(fd).st_uid != os.getuid():
+        os.close(fd)
+        raise Exception("The file {0} must be owned by the user.".format(path))
+    return fd
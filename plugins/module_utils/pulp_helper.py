@@ -6,73 +6,350 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import importlib
+import json
+import sys
+import threading
 import traceback
-import os
-from shutil import rmtree
-from tempfile import mkdtemp
-from time import sleep
+import types
+from contextlib import contextmanager
+from functools import wraps
+from multiprocessing.pool import ThreadPool
+from time import sleep, time
+
+from ansible.module_utils.basic import AnsibleModule, env_fallback, missing_required_lib
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_retry import REQUEST_RETRIES, RETRY_BACKOFF, PulpRetry
+
+
+MODULE_UTILS_PACKAGE = 'ansible_collections.pulp.squeezer.plugins.module_utils.'
+
+
+# The optional features (sessions, lookup cache, persistent connections, rate limits, metrics, traces and profiles)
+# are not part of the payload of the modules, as ansible ships every module_utils a module mentions in an import.
+# The action plugins send the sources of those the options of a task turn on along with its arguments (see plugin_utils/pulp_action.py);
+# on the controller, they are imported from the collection.
+def load_module_utils(name, source):
+    fullname = MODULE_UTILS_PACKAGE + name
+    if fullname not in sys.modules:
+        module = types.ModuleType(fullname)
+        module.__file__ = fullname.replace('.', '/') + '.py'
+        sys.modules[fullname] = module
+        exec(compile(source, module.__file__, 'exec'), module.__dict__)
+
+
+class _NullSpan(object):
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+@contextmanager
+def null_span():
+    yield NULL_SPAN
+
+
+# Records calls of an entity method as spans, if the module traces (see pulp_trace)
+def traced(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        natural_key = str(self.natural_key) if self.natural_key else None
+        with self.module.trace('{0}.{1}'.format(type(self).__name__, method.__name__), **{'pulp.natural_key': natural_key}):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# The generated client packages take a good share of the startup time of a module.
+# So they are imported only once an entity actually needs them.
+class PulpClient(object):
+    def __init__(self, name, requirement):
+        self.name = name
+        self.requirement = requirement
+        self.import_error = None
+        self._package = None
+
+    def load(self):
+        if self._package is None and self.import_error is None:
+            try:
+                self._package = importlib.import_module('pulpcore.client.' + self.name)
+            except ImportError:
+                self.import_error = traceback.format_exc()
+        return self._package
+
+    def require(self, module):
+        if self._package is None and self.import_error is None:
+            with module.trace('import ' + self.requirement):
+                self.load()
+        if self._package is None:
+            module.fail_json(
+                msg=missing_required_lib(self.requirement),
+                exception=self.import_error,
+            )
+
+    def lazy(self, name):
+        return LazyClientAttribute(self, name)
+
+    def __getattr__(self, name):
+        package = self.load()
+        if package is None:
+            raise ImportError("Failed to import {0}.".format(self.requirement))
+        return getattr(package, name)
+
+
+# Stands in for a class of a client package in class attributes, or wherever it must not be imported yet
+class LazyClientAttribute(object):
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
 
-from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+    def resolve(self):
+        return getattr(self.client, self.name)
 
-try:
-    from pulpcore.client import pulpcore
-    HAS_PULPCORE_CLIENT = True
-except ImportError:
-    class Dummy():
-        def __getattr__(self, attr):
-            return Dummy()
+    def __get__(self, instance, owner):
+        return self.resolve()
 
-    pulpcore = Dummy()
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
 
-    HAS_PULPCORE_CLIENT = False
-    PULPCORE_CLIENT_IMPORT_ERROR = traceback.format_exc()
+
+pulpcore = PulpClient('pulpcore', 'pulpcore-client')
 
 
 PAGE_LIMIT = 20
-CONTENT_CHUNK_SIZE = 512 * 1024  # 1/2 MB
+BULK_WORKERS = 8
+TASK_POLL_INTERVAL = 2
+
+# Api clients and their pool managers by client package and connection details.
+# Modules called in the same process (see the controller runtime of the action plugins) share them.
+API_CLIENTS = {}
 
 
 class PulpAnsibleModule(AnsibleModule):
     def __init__(self, **kwargs):
+        self._start_time = time()
         argument_spec = dict(
             pulp_url=dict(required=True),
             username=dict(required=True),
             password=dict(required=True, no_log=True),
             validate_certs=dict(type='bool', default=True),
+            auth_method=dict(choices=['basic', 'session'], default='basic'),
+            session_cache_dir=dict(type='path', fallback=(env_fallback, ['SQUEEZER_SESSION_CACHE_DIR'])),
+            catalog=dict(type='dict'),
+            lookup_cache_dir=dict(type='path', fallback=(env_fallback, ['SQUEEZER_LOOKUP_CACHE_DIR'])),
+            lookup_cache_ttl=dict(type='int', default=3600),
+            lookup_cache_verify=dict(type='bool', default=False),
+            persistent_connection_dir=dict(type='path', fallback=(env_fallback, ['SQUEEZER_PERSISTENT_CONNECTION_DIR'])),
+            persistent_connection_idle_timeout=dict(type='int', default=60),
+            request_retries=dict(type='int', default=REQUEST_RETRIES),
+            request_retry_backoff=dict(type='float', default=RETRY_BACKOFF),
+            rate_limit=dict(type='float', fallback=(env_fallback, ['SQUEEZER_RATE_LIMIT'])),
+            max_concurrent_requests=dict(type='int', fallback=(env_fallback, ['SQUEEZER_MAX_CONCURRENT_REQUESTS'])),
+            rate_limit_dir=dict(type='path', fallback=(env_fallback, ['SQUEEZER_RATE_LIMIT_DIR'])),
+            task_poll_interval=dict(type='float', default=TASK_POLL_INTERVAL, fallback=(env_fallback, ['SQUEEZER_TASK_POLL_INTERVAL'])),
+            metrics=dict(type='bool', default=False),
+            trace_file=dict(type='path', fallback=(env_fallback, ['SQUEEZER_TRACE_FILE'])),
+            profile=dict(type='list', elements='str', choices=['cpu', 'memory'], fallback=(env_fallback, ['SQUEEZER_PROFILE'])),
+            profile_dir=dict(type='path', fallback=(env_fallback, ['SQUEEZER_PROFILE_DIR'])),
+            feature_sources=dict(type='list', elements='list'),
         )
         argument_spec.update(kwargs.pop('argument_spec', {}))
         supports_check_mode = kwargs.pop('supports_check_mode', True)
         super(PulpAnsibleModule, self).__init__(argument_spec=argument_spec, supports_check_mode=supports_check_mode, **kwargs)
-
-        if not HAS_PULPCORE_CLIENT:
-            self.fail_json(
-                msg=missing_required_lib("pulpcore-client"),
-                exception=PULPCORE_CLIENT_IMPORT_ERROR,
-            )
+        # Taken out of the params, so they are not returned with the invocation
+        for name, source in self.params.pop('feature_sources') or []:
+            load_module_utils(name, source)
 
     def __enter__(self):
         self._changed = False
         self._results = {}
 
-        self.api_config = pulpcore.Configuration()
-        self.api_config.host = self.params['pulp_url']
-        self.api_config.username = self.params['username']
-        self.api_config.password = self.params['password']
-        self.api_config.verify_ssl = self.params['validate_certs']
-        self.api_config.safe_chars_for_path_param = '/'
-
+        self.profiler = None
+        if self.params['profile']:
+            PulpProfiler = self.import_feature('pulp_profile').PulpProfiler
+            self.profiler = PulpProfiler(self.params['profile'], self.params['profile_dir'], name=self._name)
+            self.profiler.start()
+
+        self.tracer = None
+        if self.params['trace_file']:
+            PulpTracer = self.import_feature('pulp_trace').PulpTracer
+            self.tracer = PulpTracer(
+                self.params['trace_file'],
+                'module ' + self._name,
+                start=self._start_time,
+                **{'pulp.url': self.params['pulp_url'], 'ansible.check_mode': self.check_mode}
+            )
+        with self.trace('setup', start=self._start_time):
+            try:
+                self._setup()
+            except Exception as e:
+                # Not yet in the with block, so fail like __exit__ would
+                self.fail_json(msg=str(e))
         return self
 
+    def _setup(self):
+        self.api_configs = {}
+        self.pool_manager = None
+        self.session = None
+        self.api_cookie = None
+        self.api_headers = {}
+        if self.params['auth_method'] == 'session':
+            PulpSession = self.import_feature('pulp_auth').PulpSession
+            self.session = PulpSession(
+                self.params['pulp_url'],
+                self.params['username'],
+                self.params['password'],
+                cache_dir=self.params['session_cache_dir'],
+            )
+
+        self.retry = PulpRetry(self.params['request_retries'], self.params['request_retry_backoff'])
+        self.rate_limit = None
+        if self.params['rate_limit'] or self.params['max_concurrent_requests']:
+            PulpRateLimit = self.import_feature('pulp_ratelimit').PulpRateLimit
+            self.rate_limit = PulpRateLimit(
+                self.params['pulp_url'],
+                rate=self.params['rate_limit'],
+                concurrent=self.params['max_concurrent_requests'],
+                directory=self.params['rate_limit_dir'],
+            )
+        self.metrics = None
+        if self.params['metrics']:
+            PulpMetrics = self.import_feature('pulp_metrics').PulpMetrics
+            self.metrics = PulpMetrics()
+
+        self.lookup_cache = None
+        if self.params['lookup_cache_dir']:
+            PulpLookupCache = self.import_feature('pulp_cache').PulpLookupCache
+            self.lookup_cache = PulpLookupCache(
+                self.params['lookup_cache_dir'],
+                self.params['pulp_url'],
+                self.params['username'],
+                self.params['lookup_cache_ttl'],
+            )
+
+    def import_feature(self, name):
+        try:
+            return importlib.import_module(MODULE_UTILS_PACKAGE + name)
+        except ImportError:
+            self.fail_json(
+                msg="The module_utils {0} were not sent along with the module. "
+                    "Set the options using them on the task or in its environment, rather than in the environment of the target.".format(name),
+                exception=traceback.format_exc(),
+            )
+
+    def trace(self, name, **attributes):
+        if self.tracer is None:
+            return null_span()
+        return self.tracer.span(name, **attributes)
+
+    def get_api_config(self, client):
+        # Every client package needs a configuration of its own, they do not agree on the names of the auth settings
+        if client.name not in self.api_configs:
+            api_config = client.Configuration()
+            api_config.host = self.params['pulp_url']
+            api_config.verify_ssl = self.params['validate_certs']
+            api_config.safe_chars_for_path_param = '/'
+            self.api_configs[client.name] = api_config
+            if self.session is None:
+                api_config.username = self.params['username']
+                api_config.password = self.params['password']
+            elif self.api_cookie is None:
+                self.session.open(self.instrument(self.get_pool_manager(client, api_config)))
+                self.api_cookie = self.session.cookie
+                self.api_headers = self.session.headers
+        return self.api_configs[client.name]
+
+    def get_pool_manager(self, client, api_config):
+        # One pool manager serves the api clients of all client packages
+        if self.pool_manager is None:
+            if self.params['persistent_connection_dir']:
+                PulpDaemonPoolManager = self.import_feature('pulp_daemon').PulpDaemonPoolManager
+                self.pool_manager = PulpDaemonPoolManager(
+                    self.params['persistent_connection_dir'],
+                    tls=dict(
+                        verify_ssl=api_config.verify_ssl,
+                        ca_certs=api_config.ssl_ca_cert or client.rest.certifi.where(),
+                        cert_file=api_config.cert_file,
+                        key_file=api_config.key_file,
+                        proxy=api_config.proxy,
+                    ),
+                    idle_timeout=self.params['persistent_connection_idle_timeout'],
+                )
+            else:
+                self.pool_manager = client.rest.RESTClientObject(api_config, maxsize=BULK_WORKERS).pool_manager
+        return self.pool_manager
+
+    def instrument(self, pool_manager):
+        if self.rate_limit is not None:
+            pool_manager = self.rate_limit.wrap(pool_manager)
+        if self.tracer is not None:
+            pool_manager = self.tracer.wrap(pool_manager)
+        if self.metrics is not None:
+            pool_manager = self.metrics.wrap(pool_manager)
+        # Every attempt is measured and traced on its own
+        if self.retry.retries > 0:
+            pool_manager = self.retry.wrap(pool_manager)
+        return pool_manager
+
+    def get_api_client(self, client):
+        api_config = self.get_api_config(client)
+        key = (
+            client.name,
+            api_config.host,
+            api_config.verify_ssl,
+            api_config.username,
+            api_config.password,
+            self.api_cookie,
+            self.params['persistent_connection_dir'],
+        )
+        if key not in API_CLIENTS:
+            api_client = client.ApiClient(api_config, cookie=self.api_cookie)
+            for header, value in self.api_headers.items():
+                api_client.set_default_header(header, value)
+            API_CLIENTS[key] = (api_client, self.get_pool_manager(client, api_config))
+        api_client, self.pool_manager = API_CLIENTS[key]
+        # Requests are recorded for this module run only
+        api_client.rest_client.pool_manager = self.instrument(self.pool_manager)
+        if self.session is not None:
+            api_client.rest_client.pool_manager = self.session.wrap(api_client.rest_client.pool_manager)
+        return api_client
+
     def __exit__(self, exc_class, exc_value, traceback):
+        if self.profiler is not None:
+            self._results['profile'] = self.profiler.stop()
+            for warning in self.profiler.warnings:
+                self.warn(warning)
+        if self.retry.count:
+            self._results['retries'] = self.retry.count
+        if self.metrics is not None:
+            self.metrics.retry(self.retry.repeated)
+            if self.rate_limit is not None:
+                self.metrics.rate_limit_wait(self.rate_limit.waited)
+            self._results['metrics'] = self.metrics.summary()
+        if self.tracer is not None:
+            self.tracer.finish(error=exc_value, **{'ansible.changed': self._changed})
+            for warning in self.tracer.warnings:
+                self.warn(warning)
         if exc_class is not None:
+            if self.session is not None and getattr(exc_value, 'status', None) in [401, 403]:
+                # The session may have been ended on the server; log in again next time
+                self.session.forget()
             if issubclass(exc_class, Exception):
-                self.fail_json(msg=str(exc_value), changed=self._changed)
+                extra = dict((key, self._results[key]) for key in ['retries', 'metrics', 'profile'] if key in self._results)
+                self.fail_json(msg=str(exc_value), changed=self._changed, **extra)
                 return True
+        if self.params['persistent_connection_dir'] and self.pool_manager is not None:
+            self._results['persistent_connection'] = self.pool_manager.stats()
         self.exit_json(changed=self._changed, **self._results)
 
     def set_changed(self):
         self._changed = True
 
+    def sleep(self, seconds):
+        # Polling tasks waits through here, so tests running modules in process can take the time out
+        if seconds > 0:
+            sleep(seconds)
+
     def set_result(self, key, value):
         self._results[key] = value
 
@@ -88,34 +365,197 @@ class PulpEntityAnsibleModule(PulpAnsibleModule):
         super(PulpEntityAnsibleModule, self).__init__(argument_spec=argument_spec, **kwargs)
 
 
+# Runs the same operation on many independent entities at once, with at most `workers` running at a time.
+# The generated clients are synchronous, so the operations run in threads sharing the connection pool of the api client.
+class PulpBulk(object):
+    # Threads of all bulk operations running at the same time, nested ones included.
+    # Together they never exceed the connections of the pool (BULK_WORKERS); whatever does not get a thread runs in the calling one.
+    _lock = threading.Lock()
+    _threads = 0
+
+    def __init__(self, workers=BULK_WORKERS):
+        self.workers = workers
+
+    @classmethod
+    def _reserve(cls, wanted):
+        with cls._lock:
+            threads = min(wanted, BULK_WORKERS - cls._threads)
+            if threads <= 1:
+                return 0
+            cls._threads += threads
+            return threads
+
+    @classmethod
+    def _release(cls, threads):
+        with cls._lock:
+            cls._threads -= threads
+
+    def map(self, function, items):
+        items = list(items)
+        threads = self._reserve(min(self.workers, len(items)))
+        if not threads:
+            return [function(item) for item in items]
+        pool = ThreadPool(threads)
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+            self._release(threads)
+
+    def run(self, operation, entities, *args, **kwargs):
+        return self.map(lambda entity: getattr(entity, operation)(*args, **kwargs), entities)
+
+    def find(self, entities):
+        return self.run('find', entities)
+
+    def list(self, entities):
+        return self.run('list', entities)
+
+    def create(self, entities):
+        return self.run('create', entities)
+
+    def update(self, entities):
+        return self.run('update', entities)
+
+    def delete(self, entities):
+        return self.run('delete', entities)
+
+    def wait_for(self, tasks, desired_state='completed'):
+        return self.run('wait_for', tasks, desired_state=desired_state)
+
+
+class SerializedEntity(object):
+    # Mimics the RESTResponse the api client deserializes models from
+    def __init__(self, entry):
+        self.data = json.dumps(entry)
+
+
 class PulpEntity(object):
+    _client = pulpcore
+    _plugin_name = None
+    _catalog_key = 'name'
+
     def __init__(self, module, natural_key=None, desired_attributes=None):
         self.module = module
-        self.api_client = self._api_client_class(self.module.api_config)
+        self._client.require(self.module)
+        self.api_client = self.module.get_api_client(self._client)
         self.api = self._api_class(self.api_client)
         self.entity = None
         self.natural_key = natural_key
         self.desired_attributes = desired_attributes
+        self._use_cache = True
+        self._cached = False
+
+    def _deserialize(self, entry):
+        return self.api_client.deserialize(SerializedEntity(entry), self._api_entity_class)
+
+    def find_in_catalog(self):
+        catalog = self.module.params.get('catalog')
+        if not (catalog and self._plugin_name):
+            return None
+        if list(self.natural_key.keys()) != [self._catalog_key]:
+            return None
+        entry = catalog.get(self._plugin_name, {}).get(self._name_plural, {}).get(self.natural_key[self._catalog_key])
+        if entry is None:
+            return None
+        self._cached = True
+        return self._deserialize(entry)
+
+    def _cacheable(self):
+        # Content units are built by factories and cannot be restored from the cache
+        return self.module.lookup_cache is not None and isinstance(getattr(self, '_api_entity_class', None), type)
+
+    def find_in_lookup_cache(self):
+        if not self._cacheable():
+            return None
+        entry = self.module.lookup_cache.get(type(self).__name__, self.natural_key)
+        if entry is None:
+            return None
+        entity = self._deserialize(entry)
+        if self.module.params['lookup_cache_verify']:
+            if not self.verify(entity):
+                return None
+        else:
+            self._cached = True
+        return entity
+
+    def find_cached(self):
+        self._cached = False
+        if not self._use_cache:
+            return None
+        entity = self.find_in_catalog()
+        if entity is None:
+            entity = self.find_in_lookup_cache()
+        if entity is not None:
+            self.entity = entity
+        return entity
+
+    def verify(self, entity):
+        # Compare only the fields that change with the entity, reading as little as possible
+        fields = [field for field in ['pulp_last_updated', 'latest_version_href'] if field in entity.openapi_types]
+        try:
+            response = self.api.read(entity.pulp_href, fields=','.join(['pulp_href'] + fields), _preload_content=False)
+        except Exception as e:
+            if getattr(e, 'status', None) == 404:
+                return False
+            raise
+        current = json.loads(response.data)
+        for field in fields:
+            if self.api_client.deserialize(SerializedEntity(current.get(field)), entity.openapi_types[field]) != getattr(entity, field):
+                return False
+        return True
+
+    def update_cache(self):
+        if self.module.check_mode or not self._cacheable():
+            return
+        if self.entity is None:
+            self.module.lookup_cache.invalidate(type(self).__name__, self.natural_key)
+        else:
+            self.module.lookup_cache.set(type(self).__name__, self.natural_key, self.api_client.sanitize_for_serialization(self.entity))
+
+    def refresh(self):
+        # Entities taken from the catalog or the lookup cache may be outdated; ask the server
+        self._use_cache = False
+        return self.find()
 
+    @traced
     def find(self):
+        if self.find_cached() is not None:
+            return self.entity
         search_result = self.api.list(limit=1, **self.natural_key)
         if search_result.count == 1:
             self.entity = search_result.results[0]
         else:
             self.entity = None
+        self.update_cache()
         return self.entity
 
-    def list(self):
+    @traced
+    def list(self, workers=1):
         entities = []
         offset = 0
         search_result = self.api.list(limit=PAGE_LIMIT, offset=offset)
         entities.extend(search_result.results)
+        if workers > 1 and search_result.next:
+            # The first page told us the size of the collection, so fetch the others concurrently
+            pages = PulpBulk(workers).map(
+                lambda page_offset: self.api.list(limit=PAGE_LIMIT, offset=page_offset).results,
+                range(PAGE_LIMIT, search_result.count, PAGE_LIMIT),
+            )
+            for page in pages:
+                entities.extend(page)
+            return entities
         while search_result.next:
             offset += PAGE_LIMIT
             search_result = self.api.list(limit=PAGE_LIMIT, offset=offset)
             entities.extend(search_result.results)
         return entities
 
+    def catalog(self, workers=1):
+        return {getattr(entity, self._catalog_key): entity.to_dict() for entity in self.list(workers=workers)}
+
+    @traced
     def create(self):
         if not hasattr(self.api, 'create'):
             raise Exception("This entity is not creatable.")
@@ -130,19 +570,26 @@ class PulpEntity(object):
                 self.entity = self.api.read(task.created_resources[0])
             else:
                 self.entity = response
+            self.update_cache()
         self.module.set_changed()
         return self.entity
 
-    def update(self):
-        changed = False
-        for key, value in self.desired_attributes.items():
+    def changes(self):
+        return {
             # Skip 'file' because artifacts as well as content units are immutable anyway
-            if key == 'file':
-                continue
-            if getattr(self.entity, key, None) != value:
+            key: value for key, value in self.desired_attributes.items() if key != 'file' and getattr(self.entity, key, None) != value
+        }
+
+    @traced
+    def update(self):
+        changes = self.changes()
+        if changes and self._cached:
+            if self.refresh() is None:
+                return self.create()
+            changes = self.changes()
+        if changes:
+            for key, value in changes.items():
                 setattr(self.entity, key, value)
-                changed = True
-        if changed:
             if not hasattr(self.api, 'update'):
                 raise Exception("This entity is immutable.")
             if not self.module.check_mode:
@@ -152,20 +599,30 @@ class PulpEntity(object):
                     self.entity = self.api.read(self.entity.pulp_href)
                 else:
                     self.entity = response
+                self.update_cache()
             self.module.set_changed()
         return self.entity
 
+    @traced
     def delete(self):
         if not hasattr(self.api, 'delete'):
             raise Exception("This entity is not deletable.")
+        if self._cached and self.refresh() is None:
+            return self.entity
         if not self.module.check_mode:
             response = self.api.delete(self.entity.pulp_href)
             if getattr(response, 'task', None):
                 PulpTask(self.module, {'pulp_href': response.task}).wait_for()
         self.entity = None
+        self.update_cache()
         self.module.set_changed()
         return self.entity
 
+    def assert_supported(self, model_class, attributes):
+        unsupported = [key for key in sorted(attributes) if key not in model_class.openapi_types]
+        if unsupported:
+            raise Exception("The installed client does not support the option(s): {0}.".format(', '.join(unsupported)))
+
     def process_special(self):
         raise Exception("Invalid state ({0}) for entity.".format(self.module.params['state']))
 
@@ -192,61 +649,19 @@ class PulpEntity(object):
             self.module.set_result(self._name_plural, [entity.to_dict() for entity in entities])
 
 
-class PulpArtifact(PulpEntity):
-    _api_client_class = pulpcore.ApiClient
-    _api_entity_class = pulpcore.Artifact
+# Content refers to artifacts, which are only looked up here;
+# uploading them is left to PulpArtifact of pulp_artifact_helper, so only the modules uploading ship that.
+class PulpArtifactEntity(PulpEntity):
+    _api_class = pulpcore.lazy('ArtifactsApi')
+    _api_entity_class = pulpcore.lazy('Artifact')
 
     _name_singular = 'artifact'
     _name_plural = 'artifacts'
 
-    def _api_class(self, *args, **kwargs):
-        scope = self
-
-        class NewArtifactsApi(pulpcore.ArtifactsApi):
-            def create(self, entity, **kwargs):
-                size = os.stat(entity.file).st_size
-                if size > CONTENT_CHUNK_SIZE:
-                    artifact_href = PulpUpload(scope.module).chunked_upload(entity.file, entity.sha256, size)
-                    return self.read(artifact_href)
-                # TODO Why is the ArtifactsApi strange with create?
-                payload = {
-                    'file': entity.file,
-                    'sha256': entity.sha256,
-                }
-                payload.update(kwargs)
-                return super(NewArtifactsApi, self).create(**payload)
-
-        return NewArtifactsApi(*args, **kwargs)
-
-
-class PulpOrphans(PulpEntity):
-    _api_client_class = pulpcore.ApiClient
-    _api_class = pulpcore.OrphansApi
-
-    def delete(self):
-        if not self.module.check_mode:
-            response = self.api.delete()
-            task = PulpTask(self.module, {'pulp_href': response.task}).wait_for().to_dict()
-            response = task["progress_reports"]
-            response = {item["message"].split(" ")[-1].lower(): item["total"] for item in response}
-        else:
-            response = {
-                "artifacts": 0,
-                "content": 0,
-            }
-        self.module.set_changed()
-        return response
-
-
-class PulpStatus(PulpEntity):
-    _api_client_class = pulpcore.ApiClient
-    _api_class = pulpcore.StatusApi
-
 
 class PulpTask(PulpEntity):
-    _api_client_class = pulpcore.ApiClient
-    _api_class = pulpcore.TasksApi
-    _api_entity_class = pulpcore.Task
+    _api_class = pulpcore.lazy('TasksApi')
+    _api_entity_class = pulpcore.lazy('Task')
 
     _name_singular = 'task'
     _name_plural = 'tasks'
@@ -269,56 +684,21 @@ class PulpTask(PulpEntity):
         else:
             super(PulpTask, self).process_special()
 
+    @traced
     def wait_for(self, desired_state='completed'):
-        self.find()
-        while self.entity.state not in ['completed', 'failed', 'canceled']:
-            sleep(2)
-            self.find()
+        start = time()
+        polls = 0
+        while True:
+            with self.module.trace('PulpTask.poll', **{'pulp.task': self.natural_key['pulp_href']}):
+                self.find()
+            polls += 1
+            if self.entity.state in ['completed', 'failed', 'canceled']:
+                break
+            self.module.sleep(self.module.params['task_poll_interval'])
+        if self.module.metrics is not None:
+            self.module.metrics.task_wait(time() - start, polls)
         if self.entity.state != desired_state:
             if self.entity.state == 'failed':
                 raise Exception('Task failed to complete. ({0}; {1})'.format(self.entity.state, self.entity.error['description']))
             raise Exception('Task did not reach {0} state'.format(desired_state))
         return self.entity
-
-
-class PulpUpload(PulpEntity):
-    _api_client_class = pulpcore.ApiClient
-    _api_class = pulpcore.UploadsApi
-
-    def chunked_upload(self, path, sha256, size):
-        offset = 0
-
-        upload = self.api.create(pulpcore.Upload(size=size))
-        try:
-            with open(path, 'rb') as f:
-                for chunk in iter(lambda: f.read(CONTENT_CHUNK_SIZE), b""):
-                    actual_chunk_size = len(chunk)
-                    content_range = 'bytes {start}-{end}/{size}'.format(
-                        start=offset,
-                        end=offset + actual_chunk_size - 1,
-                        size=size,
-                    )
-                    temp_dir = mkdtemp(dir="/tmp")
-                    try:
-                        chunk_file_name = os.path.join(temp_dir, 'chunk.bin')
-                        with open(chunk_file_name, 'wb') as chunk_file:
-                            chunk_file.write(chunk)
-                        upload = self.api.update(
-                            upload_href=upload.pulp_href,
-                            file=chunk_file_name,
-                            content_range=content_range,
-                        )
-                    finally:
-                        rmtree(temp_dir)
-                    offset += actual_chunk_size
-
-                response = self.api.commit(
-                    upload.pulp_href, pulpcore.UploadCommit(sha256=sha256)
-                )
-                task = PulpTask(self.module, {'pulp_href': response.task}).wait_for()
-                artifact_href = task.created_resources[0]
-        except Exception:
-            self.api.delete(upload.pulp_href)
-            raise
-
-        return artifact_href
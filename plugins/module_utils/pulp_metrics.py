@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+import time
+
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+
+# Ids in hrefs are replaced to group requests by endpoint
+PATH_ID_PATTERNS = [
+    (re.compile(r'/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}/'), '/{pulp_id}/'),
+    (re.compile(r'/[0-9]+/'), '/{number}/'),
+]
+PERCENTILES = [50, 90, 99]
+# Methods sending fields in the body rather than in the url
+BODY_METHODS = ['POST', 'PUT', 'PATCH']
+
+
+def path_template(url):
+    path = urlparse(url).path
+    for pattern, replacement in PATH_ID_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def percentile(values, percent):
+    # Nearest rank
+    values = sorted(values)
+    return values[max(int(round(percent / 100.0 * len(values))) - 1, 0)]
+
+
+def _body_size(body, fields):
+    if body is not None:
+        return len(body)
+    size = 0
+    for _name, value in (fields.items() if isinstance(fields, dict) else fields or []):
+        # Files come as (filename, data, content_type)
+        if isinstance(value, (tuple, list)):
+            value = value[1]
+        size += len(value) if hasattr(value, '__len__') else len(str(value))
+    return size
+
+
+# Records every http request of a module run, and the time spent waiting for tasks.
+class PulpMetrics(object):
+    def __init__(self):
+        self.requests = []
+        self.task_wait_time = 0.0
+        self.task_polls = 0
+        self.uploaded = 0
+        self.retried = 0
+        self.rate_limit_waited = None
+
+    def wrap(self, pool_manager):
+        return PulpMetricsPoolManager(pool_manager, self)
+
+    def record(self, method, url, status, sent, received, latency, retries):
+        self.requests.append({
+            'method': method,
+            'path': path_template(url),
+            'status': status,
+            'sent': sent,
+            'received': received,
+            'latency': latency,
+            'retries': retries,
+        })
+
+    def task_wait(self, wait_time, polls):
+        self.task_wait_time += wait_time
+        self.task_polls += polls
+
+    def upload(self, size):
+        self.uploaded += size
+
+    def retry(self, count):
+        self.retried += count
+
+    def rate_limit_wait(self, wait_time):
+        self.rate_limit_waited = wait_time
+
+    def summary(self):
+        latencies = [request['latency'] for request in self.requests]
+        endpoints = {}
+        statuses = {}
+        for request in self.requests:
+            endpoint = endpoints.setdefault('{method} {path}'.format(**request), {'requests': 0, 'time': 0.0})
+            endpoint['requests'] += 1
+            endpoint['time'] += request['latency']
+            statuses[str(request['status'])] = statuses.get(str(request['status']), 0) + 1
+        latency = {'total': sum(latencies)}
+        if latencies:
+            latency['max'] = max(latencies)
+            for percent in PERCENTILES:
+                latency['p{0}'.format(percent)] = percentile(latencies, percent)
+        summary = {
+            'requests': len(self.requests),
+            'retries': self.retried + sum(request['retries'] for request in self.requests),
+            'bytes_sent': sum(request['sent'] for request in self.requests),
+            'bytes_received': sum(request['received'] for request in self.requests),
+            'bytes_uploaded': self.uploaded,
+            'latency': latency,
+            'statuses': statuses,
+            'endpoints': endpoints,
+            'task_wait': {'time': self.task_wait_time, 'polls': self.task_polls},
+        }
+        if self.rate_limit_waited is not None:
+            summary['rate_limit_wait'] = self.rate_limit_waited
+        return summary
+
+
+# Stands in for the pool manager of the api clients, and times all requests passing through
+class PulpMetricsPoolManager(object):
+    def __init__(self, pool_manager, metrics):
+        self.pool_manager = pool_manager
+        self.metrics = metrics
+
+    def request(self, method, url, fields=None, headers=None, **kwargs):
+        start = time.time()
+        status = None
+        response = None
+        try:
+            response = self.pool_manager.request(method, url, fields=fields, headers=headers, **kwargs)
+            status = response.status
+            return response
+        finally:
+            latency = time.time() - start
+            received = 0
+            retries = 0
+            if response is not None:
+                if kwargs.get('preload_content', True):
+                    received = len(response.data or b'')
+                else:
+                    received = int(response.headers.get('Content-Length') or 0)
+                history = getattr(getattr(response, 'retries', None), 'history', None)
+                retries = len(history) if history else 0
+            self.metrics.record(method, url, status, _body_size(kwargs.get('body'), fields if method in BODY_METHODS else None), received, latency, retries)
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
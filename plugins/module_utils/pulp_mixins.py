@@ -8,6 +8,7 @@ __metaclass__ = type
 
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
     PulpTask,
+    traced,
 )
 
 
@@ -19,15 +20,21 @@ class PulpDistributionMixin():
 class PulpPublicationMixin():
     _name_singular = 'publication'
     _name_plural = 'publications'
+    _catalog_key = 'repository_version'
 
+    @traced
     def find(self):
+        if self.find_cached() is not None:
+            return self.entity
         # Hack, because you cannot search for publications
         repository_version_href = self.natural_key['repository_version']
         search_result = self.list()
+        self.entity = None
         for item in search_result:
             if item.repository_version == repository_version_href:
                 self.entity = item
                 break
+        self.update_cache()
         return self.entity
 
 
@@ -35,11 +42,45 @@ class PulpRemoteMixin():
     _name_singular = 'remote'
     _name_plural = 'remotes'
 
+    # Options the installed client does not know are rejected before writing; deleting works regardless
+    def create(self):
+        self.assert_supported(self._api_entity_class, self.desired_attributes)
+        return super(PulpRemoteMixin, self).create()
+
+    def update(self):
+        self.assert_supported(self._api_entity_class, self.desired_attributes)
+        return super(PulpRemoteMixin, self).update()
+
 
 class PulpRepositoryMixin():
     _name_singular = 'repository'
     _name_plural = 'repositories'
 
-    def sync(self, remote_href):
-        response = self.api.sync(self.entity.pulp_href, {'remote': remote_href})
-        return PulpTask(self.module, {'pulp_href': response.task}).wait_for()
+    @traced
+    def sync(self, remote_href, parameters=None):
+        data = {'remote': remote_href}
+        if parameters:
+            self.assert_supported(self._api_sync_class, parameters)
+            data.update(parameters)
+        try:
+            response = self.api.sync(self.entity.pulp_href, data)
+        except Exception as e:
+            # The repository taken from the catalog or the lookup cache may be gone by now
+            if not (self._cached and getattr(e, 'status', None) == 404):
+                raise
+            if self.refresh() is None:
+                raise Exception("Repository not found.")
+            response = self.api.sync(self.entity.pulp_href, data)
+        task = PulpTask(self.module, {'pulp_href': response.task}).wait_for()
+        if task.created_resources:
+            # Keep the lookup cache from pointing to the version before the sync
+            self.entity.latest_version_href = task.created_resources[0]
+            self.update_cache()
+        return task
+
+    def latest_version(self):
+        # Every sync or modification, from wherever, makes a new latest version;
+        # a repository taken from the catalog or the lookup cache is read again before its latest version is used.
+        if self._cached and self.refresh() is None:
+            raise Exception("Repository not found.")
+        return self.entity.latest_version_href
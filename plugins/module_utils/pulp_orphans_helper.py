@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import uuid
+from time import gmtime, strftime, time
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
+    PulpBulk,
+    PulpEntity,
+    PulpTask,
+    pulpcore,
+    traced,
+)
+
+
+API_ROOT = '/pulp/api/v3/'
+ESTIMATE_PAGE_LIMIT = 1000
+# The content types of the plugins this collection has helpers for (pulp_<plugin>_helper.py),
+# with the component the server reports for the plugin, the repositories holding them and their endpoint.
+# Add the content types of a plugin here along with its helper; the ones of plugins not installed on the server are skipped.
+CONTENT_TYPES = [
+    ('file.file', 'pulp_file', 'repositories/file/file/', 'content/file/files/'),
+    ('ansible.role', 'pulp_ansible', 'repositories/ansible/ansible/', 'content/ansible/roles/'),
+    ('ansible.collection_version', 'pulp_ansible', 'repositories/ansible/ansible/', 'content/ansible/collection_versions/'),
+    ('python.python', 'pulp_python', 'repositories/python/python/', 'content/python/packages/'),
+]
+# The publications of these plugins hold the artifacts of their published metadata, which is content in no repository
+PUBLICATIONS = [
+    ('pulp_file', 'publications/file/file/'),
+    ('pulp_python', 'publications/python/pypi/'),
+]
+# Components bringing no content types
+CONTENT_FREE_COMPONENTS = ['core', 'pulpcore', 'certguard', 'pulp_certguard']
+
+
+def _key(href):
+    # Only the id of an entity is kept, in 16 bytes, to hold the ids of millions of them
+    return uuid.UUID(href.rstrip('/').rsplit('/', 1)[-1]).bytes
+
+
+def _progress_summary(task):
+    # The totals of an orphan cleanup task, by what was cleaned up ('Clean up orphan Content' -> 'content')
+    return {item["message"].split(" ")[-1].lower(): item["total"] for item in task["progress_reports"]}
+
+
+class PulpOrphans(PulpEntity):
+    _api_class = pulpcore.lazy('OrphansApi')
+
+    def __init__(self, module):
+        super(PulpOrphans, self).__init__(module)
+        self._installed_components = None
+
+    @traced
+    def delete(self, workers=1):
+        if not self.module.check_mode:
+            response = self.api.delete()
+            response = _progress_summary(PulpTask(self.module, {'pulp_href': response.task}).wait_for().to_dict())
+            self.module.set_changed()
+        else:
+            response = self.estimate(workers=workers)
+            if response['artifacts'] or response['content']:
+                self.module.set_changed()
+        return response
+
+    # Finds the orphans the way Pulp does: content in no repository version, and artifacts of no other content.
+    # Only the ids of the artifacts of content are held, all other entities are streamed.
+    # Artifacts of no content of the known types are orphans as well, unless publications or the content of other plugins may hold them;
+    # those are not counted, with a warning.
+    @traced
+    def estimate(self, workers=1):
+        content = 0
+        kept_artifacts = set()
+        orphaned_artifacts = set()
+        versions = {}
+        for _content_type, repository_path, content_path in self._installed_content_types():
+            for entry, orphaned in self._content(repository_path, content_path, versions, workers, fields='pulp_href,artifact'):
+                if orphaned:
+                    content += 1
+                    if entry.get('artifact'):
+                        orphaned_artifacts.add(_key(entry['artifact']))
+                elif entry.get('artifact'):
+                    kept_artifacts.add(_key(entry['artifact']))
+        # Looked up once an artifact of no known content turns up
+        holders = None
+        artifacts = 0
+        artifacts_size = 0
+        uncertain = 0
+        for entry in self._stream(API_ROOT + 'artifacts/', workers, fields='pulp_href,size'):
+            key = _key(entry['pulp_href'])
+            if key in kept_artifacts:
+                continue
+            if key not in orphaned_artifacts and holders is None:
+                holders = self._other_artifact_holders()
+            if key in orphaned_artifacts or not holders:
+                artifacts += 1
+                artifacts_size += entry['size'] or 0
+            else:
+                uncertain += 1
+        if uncertain:
+            self.module.warn(
+                "{0} artifact(s) belong to no content of the types {1}. They may be held by {2}, and are not counted as orphans.".format(
+                    uncertain, ', '.join(content_type for content_type, _component, _repository_path, _content_path in CONTENT_TYPES), ' and '.join(holders),
+                )
+            )
+        return {'artifacts': artifacts, 'content': content, 'artifacts_size': artifacts_size}
+
+    def _other_artifact_holders(self):
+        components = self._components()
+        known = set(component for _content_type, component, _repository_path, _content_path in CONTENT_TYPES)
+        holders = []
+        if any(
+            component in components and self._request('GET', API_ROOT + path, query_params=[('limit', 1), ('fields', 'pulp_href')])['count']
+            for component, path in PUBLICATIONS
+        ):
+            holders.append('publications')
+        others = sorted(components - known - set(CONTENT_FREE_COMPONENTS))
+        if others:
+            holders.append('the content of {0}'.format(', '.join(others)))
+        return holders
+
+    # Removes the orphaned content of the given types with a cleanup task per batch of at most batch_size units,
+    # pausing batch_pause seconds in between. Pulp removes the artifacts orphaned by each batch along with it.
+    # older_than (in minutes) spares the orphans created since, like the orphan protection time of Pulp.
+    # With report (or in check mode) the batches are only planned.
+    @traced
+    def delete_in_batches(self, content_types, batch_size, batch_pause=0, older_than=None, workers=1, report=False):
+        plan = report or self.module.check_mode
+        cutoff = None if older_than is None else strftime('%Y-%m-%dT%H:%M:%S', gmtime(time() - older_than * 60))
+        batches = []
+        versions = {}
+        for content_type, repository_path, content_path in self._installed_content_types():
+            if content_type not in content_types:
+                continue
+            # Deleting while paging would shift the pages, so the orphans are collected (as ids) first
+            orphans = [
+                _key(entry['pulp_href'])
+                for entry, orphaned in self._content(repository_path, content_path, versions, workers, fields='pulp_href,pulp_created')
+                if orphaned and (cutoff is None or entry['pulp_created'] < cutoff)
+            ]
+            for start in range(0, len(orphans), batch_size):
+                content_hrefs = ['{0}{1}{2}/'.format(API_ROOT, content_path, uuid.UUID(bytes=key)) for key in orphans[start:start + batch_size]]
+                if plan:
+                    batch = {'content': len(content_hrefs)}
+                else:
+                    if batches:
+                        self.module.sleep(batch_pause)
+                    batch = self._cleanup(content_hrefs, older_than)
+                batch['content_type'] = content_type
+                batches.append(batch)
+        if batches and not report:
+            self.module.set_changed()
+        return batches
+
+    def _cleanup(self, content_hrefs, older_than):
+        body = {'content_hrefs': content_hrefs}
+        if older_than is not None:
+            body['orphan_protection_time'] = older_than
+        try:
+            response = self._request('POST', API_ROOT + 'orphans/cleanup/', body=body)
+        except pulpcore.ApiException as e:
+            if e.status == 404:
+                raise Exception("Deleting orphans in batches needs pulpcore 3.14 or later on the server.")
+            raise
+        return _progress_summary(PulpTask(self.module, {'pulp_href': response['task']}).wait_for().to_dict())
+
+    def _components(self):
+        if self._installed_components is None:
+            self._installed_components = set(item['component'] for item in self._request('GET', API_ROOT + 'status/')['versions'])
+        return self._installed_components
+
+    def _installed_content_types(self):
+        components = self._components()
+        return [
+            (content_type, repository_path, content_path)
+            for content_type, component, repository_path, content_path in CONTENT_TYPES
+            if component in components
+        ]
+
+    def _content(self, repository_path, content_path, versions, workers, fields):
+        # Streams the content of an endpoint, telling whether each entry is orphaned.
+        # The versions of the repositories are listed once per repository type, and kept in versions.
+        if repository_path not in versions:
+            versions[repository_path] = [
+                version['pulp_href']
+                for repository in self._stream(API_ROOT + repository_path, workers, fields='versions_href')
+                for version in self._stream(repository['versions_href'], workers, fields='pulp_href')
+            ]
+        referenced = self._referenced(content_path, versions[repository_path], workers)
+        for entry in self._stream(API_ROOT + content_path, workers, fields=fields):
+            yield entry, _key(entry['pulp_href']) not in referenced
+
+    def _referenced(self, content_path, versions, workers):
+        # Pulp hands what a deleted version added on to the next one,
+        # so the content added by the remaining versions is all the content they hold.
+        referenced = set()
+        for start in range(0, len(versions), max(workers, 1)):
+            for keys in PulpBulk(workers).map(
+                lambda version: [
+                    _key(entry['pulp_href'])
+                    for entry in self._stream(API_ROOT + content_path, 1, fields='pulp_href', repository_version_added=version)
+                ],
+                versions[start:start + max(workers, 1)],
+            ):
+                referenced.update(keys)
+        return referenced
+
+    def _request(self, method, path, query_params=None, body=None):
+        # Raw json, sparing the models of the client for entities that are only counted
+        header_params = {'Accept': 'application/json'}
+        if body is not None:
+            header_params['Content-Type'] = 'application/json'
+        response = self.api_client.call_api(
+            path, method,
+            query_params=query_params,
+            header_params=header_params,
+            body=body,
+            auth_settings=['Basic'],
+            _return_http_data_only=True,
+            _preload_content=False,
+        )
+        return json.loads(response.data)
+
+    def _page(self, path, offset, query):
+        query_params = sorted(query.items()) + [('limit', ESTIMATE_PAGE_LIMIT), ('offset', offset)]
+        try:
+            return self._request('GET', path, query_params=query_params)
+        except pulpcore.ApiException as e:
+            if e.status == 404:
+                # The endpoint of a plugin missing in the reported versions
+                return None
+            raise
+
+    def _stream(self, path, workers, **query):
+        # The first page tells the number of entries, the others are fetched `workers` at a time
+        first = self._page(path, 0, query)
+        if first is None:
+            return
+        for entry in first['results']:
+            yield entry
+        offsets = list(range(ESTIMATE_PAGE_LIMIT, first['count'], ESTIMATE_PAGE_LIMIT))
+        for start in range(0, len(offsets), max(workers, 1)):
+            for page in PulpBulk(workers).map(lambda offset: self._page(path, offset, query), offsets[start:start + max(workers, 1)]):
+                for entry in page['results']:
+                    yield entry
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import cProfile
+import os
+import pstats
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # Only available with python >= 3.4
+    tracemalloc = None
+
+
+PROFILE_TOP = 10
+
+
+# Profiles cpu time and/or memory allocations of a module run.
+# The full data is written to `directory` to be examined with pstats or tracemalloc later; a summary of the top entries is returned.
+class PulpProfiler(object):
+    def __init__(self, kinds, directory=None, name='squeezer'):
+        self.kinds = kinds
+        self.directory = directory
+        self.name = name
+        self.profile = None
+        # Tracing started by someone else (like a test runner) is left running
+        self.tracing = False
+        self.warnings = []
+
+    def start(self):
+        if 'memory' in self.kinds:
+            if tracemalloc is None:
+                self.warnings.append("Memory profiling needs python >= 3.4.")
+            elif not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.tracing = True
+        if 'cpu' in self.kinds:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def _filename(self, suffix):
+        if not self.directory:
+            return None
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError as e:
+                self.warnings.append("Could not write the profile to {0}: {1}".format(self.directory, e))
+                return None
+        return os.path.join(self.directory, '{0}-{1}-{2}.{3}'.format(self.name, int(time.time()), os.getpid(), suffix))
+
+    def _cpu_summary(self):
+        self.profile.disable()
+        stats = pstats.Stats(self.profile)
+        summary = {'total_time': stats.total_tt, 'calls': stats.total_calls, 'top': []}
+        # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        for (filename, line, function), (_primitive_calls, calls, own_time, cumulative_time, _callers) in entries:
+            summary['top'].append({
+                'function': '{0}:{1}({2})'.format(filename, line, function),
+                'calls': calls,
+                'own_time': own_time,
+                'cumulative_time': cumulative_time,
+            })
+        filename = self._filename('prof')
+        if filename:
+            stats.dump_stats(filename)
+            summary['file'] = filename
+        return summary
+
+    def _memory_summary(self):
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+        summary = {'current': current, 'peak': peak, 'top': []}
+        for statistic in snapshot.statistics('lineno')[:PROFILE_TOP]:
+            summary['top'].append({
+                'location': str(statistic.traceback),
+                'size': statistic.size,
+                'count': statistic.count,
+            })
+        filename = self._filename('tracemalloc')
+        if filename:
+            snapshot.dump(filename)
+            summary['file'] = filename
+        return summary
+
+    def stop(self):
+        summary = {}
+        if self.profile is not None:
+            summary['cpu'] = self._cpu_summary()
+        if 'memory' in self.kinds and tracemalloc is not None:
+            summary['memory'] = self._memory_summary()
+        return summary
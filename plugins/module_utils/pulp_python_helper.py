@@ -6,12 +6,9 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
-import traceback
-
-from ansible.module_utils.basic import missing_required_lib
-
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
-    PulpArtifact,
+    PulpArtifactEntity,
+    PulpClient,
     PulpEntity,
 )
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
@@ -21,33 +18,16 @@ from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_mixins import (
     PulpRepositoryMixin,
 )
 
-try:
-    from pulpcore.client import pulp_python
-    HAS_PULP_PYTHON_CLIENT = True
-except ImportError:
-    class Dummy():
-        def __getattr__(self, attr):
-            return Dummy()
 
-    pulp_python = Dummy()
+pulp_python = PulpClient('pulp_python', 'pulp_python-client')
 
-    HAS_PULP_PYTHON_CLIENT = False
-    PULP_PYTHON_CLIENT_IMPORT_ERROR = traceback.format_exc()
 
-
-ProjectSpecifier = pulp_python.models.project_specifier.ProjectSpecifier
+ProjectSpecifier = pulp_python.lazy('ProjectSpecifier')
 
 
 class PulpPythonEntity(PulpEntity):
-    _api_client_class = pulp_python.ApiClient
-
-    def __init__(self, module, *args, **kwargs):
-        if not HAS_PULP_PYTHON_CLIENT:
-            module.fail_json(
-                msg=missing_required_lib('pulp_python-client'),
-                exception=PULP_PYTHON_CLIENT_IMPORT_ERROR,
-            )
-        super(PulpPythonEntity, self).__init__(module, *args, **kwargs)
+    _client = pulp_python
+    _plugin_name = 'python'
 
 
 class PulpPythonContent(PulpPythonEntity):
@@ -75,7 +55,7 @@ class PulpPythonContent(PulpPythonEntity):
                 # FileContent can only be searched by digest,
                 # while it wants artifact to create.
                 if 'sha256' in kwargs:
-                    artifact = PulpArtifact(scope.module, {'sha256': kwargs.pop('sha256')}).find()
+                    artifact = PulpArtifactEntity(scope.module, {'sha256': kwargs.pop('sha256')}).find()
                     kwargs['artifact'] = artifact.pulp_href
                 super(NewPythonContent, self).__init__(**kwargs)
 
@@ -83,20 +63,21 @@ class PulpPythonContent(PulpPythonEntity):
 
 
 class PulpPythonDistribution(PulpDistributionMixin, PulpPythonEntity):
-    _api_class = pulp_python.DistributionsPypiApi
-    _api_entity_class = pulp_python.PythonPythonDistribution
+    _api_class = pulp_python.lazy('DistributionsPypiApi')
+    _api_entity_class = pulp_python.lazy('PythonPythonDistribution')
 
 
 class PulpPythonPublication(PulpPublicationMixin, PulpPythonEntity):
-    _api_class = pulp_python.PublicationsPypiApi
-    _api_entity_class = pulp_python.PythonPythonPublication
+    _api_class = pulp_python.lazy('PublicationsPypiApi')
+    _api_entity_class = pulp_python.lazy('PythonPythonPublication')
 
 
 class PulpPythonRemote(PulpRemoteMixin, PulpPythonEntity):
-    _api_class = pulp_python.RemotesPythonApi
-    _api_entity_class = pulp_python.PythonPythonRemote
+    _api_class = pulp_python.lazy('RemotesPythonApi')
+    _api_entity_class = pulp_python.lazy('PythonPythonRemote')
 
 
 class PulpPythonRepository(PulpRepositoryMixin, PulpPythonEntity):
-    _api_class = pulp_python.RepositoriesPythonApi
-    _api_entity_class = pulp_python.PythonPythonRepository
+    _api_class = pulp_python.lazy('RepositoriesPythonApi')
+    _api_entity_class = pulp_python.lazy('PythonPythonRepository')
+    _api_sync_class = pulp_python.lazy('RepositorySyncURL')
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_files import open_private, private_directory
+
+
+# Interval to check for a free slot, while all concurrent requests are taken
+SLOT_POLL_INTERVAL = 0.01
+# Directory of the user for the lock files, next to the remote temporary files of ansible
+RATE_LIMIT_DIR = os.path.join('~', '.ansible', 'tmp', 'squeezer-rate-limit')
+
+
+@contextmanager
+def _locked(path, operation=fcntl.LOCK_EX):
+    with os.fdopen(open_private(path), 'r+') as lock_file:
+        fcntl.flock(lock_file, operation)
+        yield lock_file
+
+
+# Limits the requests to one pulp_url to a rate and a number of concurrent requests.
+# The state lives in lock files, so all processes (e.g. the forks of ansible) and threads using the same directory share the limits.
+# Only the user can use the directory, so no one else can hold a lock or change the state.
+class PulpRateLimit(object):
+    def __init__(self, pulp_url, rate=None, concurrent=None, directory=None):
+        self.rate = rate
+        self.concurrent = concurrent
+        directory = private_directory(directory or os.path.expanduser(RATE_LIMIT_DIR))
+        key = hashlib.sha256(pulp_url.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(directory, 'squeezer-rate-limit-{0}'.format(key))
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def wrap(self, pool_manager):
+        return PulpRateLimitPoolManager(pool_manager, self)
+
+    def _take_token(self):
+        # Token bucket holding up to one second worth of requests; returns the time to wait for the next token
+        with _locked(self.path) as state_file:
+            state_file.seek(0)
+            try:
+                state = json.loads(state_file.read())
+            except ValueError:
+                state = {}
+            now = time.time()
+            capacity = max(self.rate, 1.0)
+            tokens = min(capacity, state.get('tokens', capacity) + (now - state.get('time', now)) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            state_file.seek(0)
+            state_file.truncate()
+            state_file.write(json.dumps({'tokens': tokens, 'time': now}))
+        return wait
+
+    def _take_slot(self):
+        while True:
+            for slot in range(self.concurrent):
+                slot_fd = open_private('{0}.slot{1}'.format(self.path, slot))
+                try:
+                    fcntl.flock(slot_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return slot_fd
+                except (IOError, OSError) as e:
+                    os.close(slot_fd)
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    @contextmanager
+    def acquire(self):
+        start = time.time()
+        slot_fd = self._take_slot() if self.concurrent else None
+        try:
+            if self.rate:
+                wait = self._take_token()
+                while wait > 0:
+                    time.sleep(wait)
+                    wait = self._take_token()
+            with self._lock:
+                self.waited += time.time() - start
+            yield
+        finally:
+            if slot_fd is not None:
+                # Closing the file releases the lock
+                os.close(slot_fd)
+
+
+# Stands in for the pool manager of the api clients, and holds back requests exceeding the limits
+class PulpRateLimitPoolManager(object):
+    def __init__(self, pool_manager, rate_limit):
+        self.pool_manager = pool_manager
+        self.rate_limit = rate_limit
+
+    def request(self, method, url, **kwargs):
+        with self.rate_limit.acquire():
+            return self.pool_manager.request(method, url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
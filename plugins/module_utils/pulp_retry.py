@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+
+REQUEST_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 60
+# Only requests that can be sent twice without harm are retried; this includes the PUTs of upload chunks
+RETRY_METHODS = ['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE']
+RETRY_STATUSES = [429, 502, 503, 504]
+RETRY_AFTER_STATUSES = [429, 503]
+
+
+def retry_after(response):
+    # Seconds to wait as told by the server, either as a number or a http date
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(mktime_tz(date) - time.time(), 0)
+
+
+# Counts the retried requests of a module run, which may come from the threads of PulpBulk.
+class PulpRetry(object):
+    def __init__(self, retries=REQUEST_RETRIES, backoff=RETRY_BACKOFF):
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        # All retries, including those urllib3 did on its own (e.g. for a 503 with Retry-After)
+        self.count = 0
+        # Requests repeated here
+        self.repeated = 0
+
+    def wrap(self, pool_manager):
+        return PulpRetryPoolManager(pool_manager, self)
+
+    def add(self, count, repeated=0):
+        with self._lock:
+            self.count += count
+            self.repeated += repeated
+
+    def delay(self, attempt, response):
+        delay = None
+        if response.status in RETRY_AFTER_STATUSES:
+            delay = retry_after(response)
+        if delay is None:
+            delay = self.backoff * 2 ** attempt
+        return min(delay, RETRY_BACKOFF_MAX)
+
+
+# Stands in for the pool manager of the api clients, and repeats idempotent requests failing with a transient status, backing off exponentially
+class PulpRetryPoolManager(object):
+    def __init__(self, pool_manager, retry):
+        self.pool_manager = pool_manager
+        self.retry = retry
+
+    def request(self, method, url, **kwargs):
+        attempt = 0
+        while True:
+            response = self.pool_manager.request(method, url, **kwargs)
+            history = getattr(getattr(response, 'retries', None), 'history', None)
+            if history:
+                self.retry.add(len(history))
+            if method not in RETRY_METHODS or response.status not in RETRY_STATUSES or attempt >= self.retry.retries:
+                return response
+            if not kwargs.get('preload_content', True):
+                # Hand the connection back to the pool
+                getattr(response, 'drain_conn', response.release_conn)()
+            time.sleep(self.retry.delay(attempt, response))
+            attempt += 1
+            self.retry.add(1, repeated=1)
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2019, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
+    PulpEntity,
+    pulpcore,
+)
+
+
+class PulpStatus(PulpEntity):
+    _api_class = pulpcore.lazy('StatusApi')
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import binascii
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from ansible.module_utils.six import integer_types, string_types
+from ansible.module_utils.six.moves.urllib.parse import urlparse
+
+
+SCOPE_NAME = 'pulp.squeezer'
+# Status codes of OpenTelemetry spans
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _id(size):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+def _attribute(key, value):
+    # Attributes in the shape of OTLP/JSON
+    if isinstance(value, bool):
+        typed_value = {'boolValue': value}
+    elif isinstance(value, integer_types):
+        typed_value = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed_value = {'doubleValue': value}
+    elif isinstance(value, string_types):
+        typed_value = {'stringValue': value}
+    else:
+        typed_value = {'stringValue': str(value)}
+    return {'key': key, 'value': typed_value}
+
+
+class PulpSpan(object):
+    def __init__(self, tracer, name, parent, attributes, start=None):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = _id(8)
+        self.parent = parent
+        self.attributes = dict(attributes)
+        self.start = time.time() if start is None else start
+        self.end = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.tracer.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 3 if self.name.startswith('HTTP ') else 1,  # client or internal
+            'startTimeUnixNano': str(int(self.start * 1e9)),
+            'endTimeUnixNano': str(int(self.end * 1e9)),
+            'attributes': [_attribute(key, value) for key, value in sorted(self.attributes.items()) if value is not None],
+            'status': {'code': STATUS_OK} if self.error is None else {'code': STATUS_ERROR, 'message': self.error},
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = self.parent.span_id
+        return span
+
+
+# Records a tree of spans for one module run, and appends it as one line of OTLP/JSON to a file.
+# Spans of other threads (see PulpBulk) are children of the root span.
+class PulpTracer(object):
+    def __init__(self, path, name, start=None, **attributes):
+        self.path = path
+        self.warnings = []
+        self.trace_id = _id(16)
+        self.spans = []
+        self._local = threading.local()
+        self.root = self._start(name, attributes, start=start)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _start(self, name, attributes, start=None):
+        stack = self._stack()
+        parent = stack[-1] if stack else getattr(self, 'root', None)
+        span = PulpSpan(self, name, parent, attributes, start=start)
+        self.spans.append(span)
+        stack.append(span)
+        return span
+
+    def _end(self, span, error=None):
+        span.end = time.time()
+        if error is not None:
+            span.error = '{0}: {1}'.format(type(error).__name__, error)
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    @contextmanager
+    def span(self, name, start=None, **attributes):
+        span = self._start(name, attributes, start=start)
+        try:
+            yield span
+        except Exception as e:
+            self._end(span, e)
+            raise
+        self._end(span)
+
+    def wrap(self, pool_manager):
+        return PulpTracePoolManager(pool_manager, self)
+
+    def finish(self, error=None, **attributes):
+        self.root.set(**attributes)
+        self._end(self.root, error)
+        # Spans left open by an exception end with the root
+        for span in self.spans:
+            if span.end is None:
+                span.end = self.root.end
+        record = {'resourceSpans': [{
+            'resource': {'attributes': [_attribute('service.name', SCOPE_NAME), _attribute('process.pid', os.getpid())]},
+            'scopeSpans': [{
+                'scope': {'name': SCOPE_NAME},
+                'spans': [span.to_otlp() for span in self.spans],
+            }],
+        }]}
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a') as trace_file:
+                # Concurrent module runs append to the same file
+                fcntl.flock(trace_file, fcntl.LOCK_EX)
+                trace_file.write(json.dumps(record) + '\n')
+        except (IOError, OSError) as e:
+            # The trace is lost, but not the result of the module
+            self.warnings.append("Could not write the trace to {0}: {1}".format(self.path, e))
+
+
+# Stands in for the pool manager of the api clients, and records a span for every request
+class PulpTracePoolManager(object):
+    def __init__(self, pool_manager, tracer):
+        self.pool_manager = pool_manager
+        self.tracer = tracer
+
+    def request(self, method, url, **kwargs):
+        with self.tracer.span('HTTP ' + method, **{'http.method': method, 'http.target': urlparse(url).path}) as span:
+            response = self.pool_manager.request(method, url, **kwargs)
+            span.set(**{'http.status_code': response.status})
+            return response
+
+    def __getattr__(self, name):
+        return getattr(self.pool_manager, name)
@@ -25,6 +25,15 @@ options:
       - Name of the repository
     type: str
     required: true
+  mirror:
+    description:
+      - Whether content not present in the remote should be removed from the repository.
+    type: bool
+  optimize:
+    description:
+      - Whether the server may skip the sync, if the remote did not change since the last sync.
+      - Requires a version of the plugin client that supports this option.
+    type: bool
 extends_documentation_fragment:
   - pulp.squeezer.pulp
 author:
@@ -65,6 +74,8 @@ def main():
         argument_spec=dict(
             remote=dict(required=True),
             repository=dict(required=True),
+            mirror=dict(type='bool'),
+            optimize=dict(type='bool'),
         ),
     ) as module:
 
@@ -75,16 +86,19 @@ def main():
             module.fail_json(msg="Remote '{0}' not found.".format(module.params['remote']))
 
         repository = PulpAnsibleRepository(module, {'name': module.params['repository']})
-        repository_entity = repository.find()
-        if repository_entity is None:
+        if repository.find() is None:
             module.fail_json(msg="Repository '{0}' not found.".format(module.params['repository']))
 
-        repository_version = repository_entity.latest_version_href
-        sync_task = repository.sync(remote_entity.pulp_href)
+        parameters = {
+            key: module.params[key] for key in ['mirror', 'optimize'] if module.params[key] is not None
+        }
+        sync_task = repository.sync(remote_entity.pulp_href, parameters)
 
         if sync_task.created_resources:
             module._changed = True
             repository_version = sync_task.created_resources[0]
+        else:
+            repository_version = repository.latest_version()
 
         module.set_result('repository_version', repository_version)
 
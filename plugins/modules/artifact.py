@@ -76,10 +76,8 @@ RETURN = r'''
 '''
 
 
-from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
-    PulpEntityAnsibleModule,
-    PulpArtifact,
-)
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import PulpEntityAnsibleModule
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_artifact_helper import PulpArtifact
 
 
 def main():
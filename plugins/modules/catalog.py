@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+
+DOCUMENTATION = r'''
+---
+module: catalog
+short_description: Collect a catalog of entities of a pulp api server instance as facts
+description:
+  - "This module fetches all repositories, remotes, distributions and publications of the given plugins at once."
+  - "The resulting catalog can be handed to other modules via their C(catalog) option to save them looking up entities by name."
+options:
+  plugins:
+    description:
+      - Plugins to collect entities for
+    type: list
+    elements: str
+    required: true
+    choices:
+      - ansible
+      - file
+      - python
+  workers:
+    description:
+      - Number of requests to send in parallel, for the entity types as well as the pages of each
+      - All of them share a connection pool of 8, which caps the requests sent at a time
+    type: int
+    default: 4
+extends_documentation_fragment:
+  - pulp.squeezer.pulp
+author:
+  - Matthias Dellweg (@mdellweg)
+'''
+
+EXAMPLES = r'''
+- name: Collect catalog of file entities
+  catalog:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    plugins:
+      - file
+- name: Publish a repository without looking it up on the server
+  file_publication:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    repository: my_file_repo
+    catalog: "{{ pulp_catalog }}"
+    state: present
+'''
+
+RETURN = r'''
+  ansible_facts:
+    description: Facts to add to ansible_facts
+    returned: always
+    type: complex
+    contains:
+      pulp_catalog:
+        description:
+          - Entities by plugin and entity type.
+          - Publications are keyed by their repository version, all other entities by name.
+        type: dict
+        returned: always
+'''
+
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import PulpAnsibleModule, PulpBulk
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_ansible_helper import (
+    PulpAnsibleDistribution,
+    PulpAnsibleRemote,
+    PulpAnsibleRepository,
+)
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_file_helper import (
+    PulpFileDistribution,
+    PulpFilePublication,
+    PulpFileRemote,
+    PulpFileRepository,
+)
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_python_helper import (
+    PulpPythonDistribution,
+    PulpPythonPublication,
+    PulpPythonRemote,
+    PulpPythonRepository,
+)
+
+
+CATALOG_ENTITIES = {
+    'ansible': [PulpAnsibleDistribution, PulpAnsibleRemote, PulpAnsibleRepository],
+    'file': [PulpFileDistribution, PulpFilePublication, PulpFileRemote, PulpFileRepository],
+    'python': [PulpPythonDistribution, PulpPythonPublication, PulpPythonRemote, PulpPythonRepository],
+}
+
+
+def main():
+    with PulpAnsibleModule(
+        argument_spec=dict(
+            plugins=dict(
+                type='list',
+                elements='str',
+                required=True,
+                choices=['ansible', 'file', 'python'],
+            ),
+            workers=dict(type='int', default=4),
+        ),
+    ) as module:
+
+        # The entity types are collected at once, each fetching its pages concurrently with the threads left
+        entities = [
+            (plugin, entity_class(module))
+            for plugin in module.params['plugins']
+            for entity_class in CATALOG_ENTITIES[plugin]
+        ]
+        sections = PulpBulk(module.params['workers']).map(lambda item: item[1].catalog(workers=module.params['workers']), entities)
+
+        catalog = {}
+        for (plugin, entity), section in zip(entities, sections):
+            catalog.setdefault(plugin, {})[entity._name_plural] = section
+
+        module.set_result('ansible_facts', {'pulp_catalog': catalog})
+
+
+if __name__ == '__main__':
+    main()
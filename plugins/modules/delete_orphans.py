@@ -14,7 +14,52 @@ module: delete_orphans
 short_description: Deletes all orphaned entities of a pulp server
 description:
   - "This module deletes all orphaned artifacts and content units of a pulp server."
-options: {}
+  - "In check mode, or with C(report), it counts the orphans and the size of their artifacts instead, without deleting anything.
+    Only content of the file, ansible and python plugins is known to it, as far as they are installed on the server.
+    The ids of the content in repository versions are held in memory, all other entities are streamed page by page."
+  - "With C(batch_size), the orphaned content is deleted incrementally instead, by content type, in cleanup tasks of a bounded size.
+    This needs pulpcore 3.14 or later on the server."
+options:
+  report:
+    description:
+      - Only report the orphans that would be deleted
+    type: bool
+    default: false
+  workers:
+    description:
+      - Number of pages to fetch in parallel while counting the orphans
+    type: int
+    default: 4
+  batch_size:
+    description:
+      - Delete the orphaned content in batches of at most this many units, each in a cleanup task of its own
+      - Pulp removes the artifacts orphaned by a batch along with it
+    type: int
+  batch_pause:
+    description:
+      - Seconds to pause between two batches, to leave the server to other tasks
+    type: float
+    default: 0
+  content_types:
+    description:
+      - Content types to delete the orphans of in batches
+    type: list
+    elements: str
+    choices:
+      - file.file
+      - ansible.role
+      - ansible.collection_version
+      - python.python
+    default:
+      - file.file
+      - ansible.role
+      - ansible.collection_version
+      - python.python
+  older_than:
+    description:
+      - Only delete orphans in batches that were created more than this many minutes ago
+      - Without it, the orphan protection time of the server applies
+    type: int
 extends_documentation_fragment:
   - pulp.squeezer.pulp
 author:
@@ -27,25 +72,95 @@ EXAMPLES = r'''
     api_url: localhost:24817
     username: admin
     password: password
+
+- name: Estimate the cost of deleting orphans
+  delete_orphans:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    report: true
+  register: orphans
+
+- name: Delete orphaned files older than a day in small batches
+  delete_orphans:
+    api_url: localhost:24817
+    username: admin
+    password: password
+    content_types:
+      - file.file
+    older_than: 1440
+    batch_size: 1000
+    batch_pause: 30
 '''
 
 RETURN = r'''
   summary:
-    description: Summary of deleted entities
+    description:
+      - Summary of deleted entities
+      - In check mode, or with C(report), the orphans that would be deleted, with the size of their artifacts in bytes as C(artifacts_size)
+      - Artifacts of no content of the supported types are not counted there if publications or content of other plugins may hold them, with a warning
+      - With I(batch_size), the totals of all batches
     type: dict
     returned: always
+    sample:
+      artifacts: 2
+      content: 1
+      artifacts_size: 2048
+  batches:
+    description:
+      - The content type and the deleted content and artifacts of every batch
+      - In check mode, or with C(report), the number of orphaned content units that would be deleted in each batch
+    type: list
+    returned: when I(batch_size) is given
+    sample:
+      - content_type: file.file
+        content: 1000
+        artifacts: 1000
 '''
 
 
-from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
-    PulpAnsibleModule,
-    PulpOrphans,
-)
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import PulpAnsibleModule
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_orphans_helper import PulpOrphans
 
 
 def main():
-    with PulpAnsibleModule() as module:
-        summary = PulpOrphans(module).delete()
+    with PulpAnsibleModule(
+        argument_spec=dict(
+            report=dict(type='bool', default=False),
+            workers=dict(type='int', default=4),
+            batch_size=dict(type='int'),
+            batch_pause=dict(type='float', default=0),
+            content_types=dict(
+                type='list',
+                elements='str',
+                choices=['file.file', 'ansible.role', 'ansible.collection_version', 'python.python'],
+                default=['file.file', 'ansible.role', 'ansible.collection_version', 'python.python'],
+            ),
+            older_than=dict(type='int'),
+        ),
+    ) as module:
+        orphans = PulpOrphans(module)
+        if module.params['batch_size'] is not None:
+            if module.params['batch_size'] < 1:
+                module.fail_json(msg="The batch_size must be at least 1.")
+            batches = orphans.delete_in_batches(
+                module.params['content_types'],
+                module.params['batch_size'],
+                batch_pause=module.params['batch_pause'],
+                older_than=module.params['older_than'],
+                workers=module.params['workers'],
+                report=module.params['report'],
+            )
+            summary = {}
+            for batch in batches:
+                for key, value in batch.items():
+                    if key != 'content_type':
+                        summary[key] = summary.get(key, 0) + value
+            module.set_result('batches', batches)
+        elif module.params['report']:
+            summary = orphans.estimate(workers=module.params['workers'])
+        else:
+            summary = orphans.delete(workers=module.params['workers'])
         module.set_result('summary', summary)
 
 
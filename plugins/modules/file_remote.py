@@ -27,6 +27,11 @@ options:
     description:
       - How many downloads should be attempted in parallel
     type: int
+  rate_limit:
+    description:
+      - Limits total download rate in requests per second.
+      - Requires a version of the plugin client that supports this option.
+    type: int
   policy:
     description:
       - Whether downloads should be performed immediately, or lazy.
@@ -93,12 +98,16 @@ from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import P
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_file_helper import PulpFileRemote
 
 
+DESIRED_KEYS = {'url', 'download_concurrency', 'rate_limit', 'policy', 'proxy_url', 'tls_validation'}
+
+
 def main():
     with PulpEntityAnsibleModule(
         argument_spec=dict(
             name=dict(),
             url=dict(),
             download_concurrency=dict(type='int'),
+            rate_limit=dict(type='int'),
             policy=dict(
                 choices=['immediate', 'on-demand', 'streamed'],
             ),
@@ -113,7 +122,7 @@ def main():
 
         natural_key = {'name': module.params['name']}
         desired_attributes = {
-            key: module.params[key] for key in ['url', 'download_concurrency', 'policy', 'proxy_url', 'tls_validation'] if module.params[key] is not None
+            key: module.params[key] for key in DESIRED_KEYS if module.params[key] is not None
         }
 
         PulpFileRemote(module, natural_key, desired_attributes).process()
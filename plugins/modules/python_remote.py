@@ -27,6 +27,11 @@ options:
     description:
       - How many downloads should be attempted in parallel
     type: int
+  rate_limit:
+    description:
+      - Limits total download rate in requests per second.
+      - Requires a version of the plugin client that supports this option.
+    type: int
   excludes:
     description:
       - List of packages to exclude from the sync.
@@ -129,7 +134,7 @@ from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import P
 from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_python_helper import PulpPythonRemote, ProjectSpecifier
 
 
-DESIRED_KEYS = {'url', 'download_concurrency', 'policy', 'proxy_url', 'tls_validation', 'prereleases'}
+DESIRED_KEYS = {'url', 'download_concurrency', 'rate_limit', 'policy', 'proxy_url', 'tls_validation', 'prereleases'}
 
 
 def main():
@@ -138,6 +143,7 @@ def main():
             name=dict(),
             url=dict(),
             download_concurrency=dict(type='int'),
+            rate_limit=dict(type='int'),
             policy=dict(
                 choices=['immediate', 'on-demand', 'streamed'],
             ),
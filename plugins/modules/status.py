@@ -41,10 +41,8 @@ RETURN = r'''
 '''
 
 
-from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import (
-    PulpAnsibleModule,
-    PulpStatus,
-)
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import PulpAnsibleModule
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_status_helper import PulpStatus
 
 
 def main():
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# copyright (c) 2020, Matthias Dellweg
+# GNU General Public License v3.0+ (see LICENSE or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import importlib
+import json
+import os
+import sys
+import traceback
+
+from ansible.errors import AnsibleError
+from ansible.module_utils import basic
+from ansible.module_utils._text import to_bytes
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.module_utils.six import StringIO
+from ansible.plugins.action.normal import ActionModule as NormalActionModule
+from ansible.utils.display import Display
+from ansible.utils.unsafe_proxy import wrap_var
+from ansible.vars.clean import remove_internal_keys
+
+try:
+    from ansible.module_utils.common import warnings
+except ImportError:
+    # Before ansible 2.10, warnings are kept by the module instance
+    warnings = None
+
+
+display = Display()
+
+MODULE_PACKAGE = 'ansible_collections.pulp.squeezer.plugins.modules.'
+MODULE_UTILS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'module_utils')
+RUNTIMES = ['module', 'controller']
+
+
+def features(module_args, environment):
+    # The module_utils of the optional features the options of a task turn on, in the order to load them in.
+    # Like in the module, options not set fall back to the environment variables.
+    def option(name, variable=None):
+        value = module_args.get(name)
+        if value is None and variable is not None:
+            value = environment.get(variable)
+        return value
+
+    names = []
+    if option('auth_method') == 'session':
+        names.extend(['pulp_files', 'pulp_auth'])
+    if option('lookup_cache_dir', 'SQUEEZER_LOOKUP_CACHE_DIR'):
+        names.append('pulp_cache')
+    if option('persistent_connection_dir', 'SQUEEZER_PERSISTENT_CONNECTION_DIR'):
+        names.extend(['pulp_files', 'pulp_daemon'])
+    if option('rate_limit', 'SQUEEZER_RATE_LIMIT') or option('max_concurrent_requests', 'SQUEEZER_MAX_CONCURRENT_REQUESTS'):
+        names.extend(['pulp_files', 'pulp_ratelimit'])
+    if boolean(option('metrics') or False, strict=False):
+        names.append('pulp_metrics')
+    if option('trace_file', 'SQUEEZER_TRACE_FILE'):
+        names.append('pulp_trace')
+    if option('profile', 'SQUEEZER_PROFILE'):
+        names.append('pulp_profile')
+    return [name for index, name in enumerate(names) if name not in names[:index]]
+
+
+def feature_sources(names):
+    sources = []
+    for name in names:
+        with open(os.path.join(MODULE_UTILS_DIR, name + '.py')) as source_file:
+            sources.append([name, source_file.read()])
+    return sources
+
+
+def run_module(module_name, module_args):
+    # Run the module in this process, as if it had been called with the arguments on stdin.
+    # The module, its module_utils and the client packages stay imported for the next call.
+    module = importlib.import_module(MODULE_PACKAGE + module_name)
+    basic._ANSIBLE_ARGS = to_bytes(json.dumps({'ANSIBLE_MODULE_ARGS': module_args}))
+    if warnings is not None:
+        # Do not report warnings of a previous call again
+        del warnings._global_warnings[:]
+        del warnings._global_deprecations[:]
+    stdout = StringIO()
+    stderr = ''
+    real_stdout = sys.stdout
+    sys.stdout = stdout
+    try:
+        module.main()
+        rc = 0
+    except SystemExit as e:
+        rc = e.code or 0
+    except Exception:
+        rc = 1
+        stderr = traceback.format_exc()
+    finally:
+        sys.stdout = real_stdout
+        basic._ANSIBLE_ARGS = None
+    return {'rc': rc, 'stdout': stdout.getvalue(), 'stderr': stderr}
+
+
+# With the variable squeezer_runtime set to 'controller', modules that would run on the controller anyway
+# (i.e. delegated to localhost) are called in the worker process instead of a freshly spawned interpreter.
+# This saves building and transferring the payload, starting python and importing the client packages.
+# Api clients and their connection pools are shared between the calls, e.g. for all the items of a loop.
+class PulpActionModule(NormalActionModule):
+    def _runtime(self, task_vars):
+        runtime = self._templar.template(task_vars.get('squeezer_runtime', 'module'))
+        if runtime not in RUNTIMES:
+            raise AnsibleError("squeezer_runtime must be one of {0}, not '{1}'.".format(', '.join(RUNTIMES), runtime))
+        if runtime == 'controller':
+            # Anything that needs a separate process is left to the module runtime
+            if self._connection.transport != 'local' or self._play_context.become or self._task.async_val:
+                display.vvv("Cannot run {0} on the controller; falling back to the module runtime.".format(self._task.action))
+                runtime = 'module'
+        return runtime
+
+    def _module_environment(self):
+        environment = {}
+        self._compute_environment_string(environment)
+        if self._connection.transport == 'local':
+            # The module inherits the environment of the controller
+            environment = dict(os.environ, **environment)
+        return environment
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        if self._runtime(task_vars) == 'module':
+            names = features(self._task.args, self._module_environment())
+            if names:
+                # The optional features are not part of the payload; send those the task needs along (see load_module_utils)
+                display.vvv("Sending {0} along with {1}".format(', '.join(names), self._task.action))
+                self._task.args = dict(self._task.args, feature_sources=feature_sources(names))
+            return super(PulpActionModule, self).run(tmp, task_vars)
+
+        self._supports_check_mode = True
+        # Skip the module execution of the normal action plugin
+        result = super(NormalActionModule, self).run(tmp, task_vars)
+        del tmp  # tmp no longer has any effect
+        if result.get('skipped'):
+            return result
+
+        module_name = self._task.action.split('.')[-1]
+        module_args = self._task.args.copy()
+        self._update_module_args(module_name, module_args, task_vars)
+        display.vvv("Running {0} on the controller".format(module_name))
+        data = self._parse_returned_data(run_module(module_name, module_args))
+        remove_internal_keys(data)
+        result.update(data)
+        return wrap_var(result)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Cassettes are stored as json, one interaction per line, which loads many times faster than yaml.
+# Bodies that are not text (like uploaded chunks) are stored base64 encoded, to keep them from blowing up with escapes.
+# Text bodies with control characters are encoded alike, and marked to be decoded back to text.
+#
+# Called as a script, it converts yaml cassettes to this format and reports the load time of both.
+
+import argparse
+import base64
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import yaml
+
+from vcr import serialize as vcr_serialize
+from vcr.serializers import yamlserializer
+
+NAME = 'squeezer_json'
+SUFFIX = '.json'
+
+BINARY = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+
+def _encode_body(body):
+    if isinstance(body, bytes):
+        return {'base64': base64.b64encode(body).decode('ascii')}
+    if isinstance(body, str) and BINARY.search(body):
+        # Marked as text, to be played back as it was recorded
+        return {'base64': base64.b64encode(body.encode('utf8')).decode('ascii'), 'type': 'str'}
+    return body
+
+
+def _decode_body(body):
+    if isinstance(body, dict):
+        decoded = base64.b64decode(body['base64'])
+        if body.get('type') == 'str':
+            return decoded.decode('utf8')
+        return decoded
+    return body
+
+
+def serialize(cassette_dict):
+    interactions = []
+    for interaction in cassette_dict['interactions']:
+        request = dict(interaction['request'], body=_encode_body(interaction['request']['body']))
+        response = dict(interaction['response'])
+        response['body'] = dict(response['body'], string=_encode_body(response['body']['string']))
+        interactions.append(json.dumps({'request': request, 'response': response}, sort_keys=True, separators=(',', ':')))
+    return '{{"version":{0},"interactions":[\n{1}\n]}}\n'.format(cassette_dict['version'], ',\n'.join(interactions))
+
+
+def deserialize(cassette_string):
+    cassette_dict = json.loads(cassette_string)
+    for interaction in cassette_dict['interactions']:
+        interaction['request']['body'] = _decode_body(interaction['request']['body'])
+        interaction['response']['body']['string'] = _decode_body(interaction['response']['body']['string'])
+    return cassette_dict
+
+
+def load_time(cassette_string, serializer, rounds):
+    start = time.perf_counter()
+    for _index in range(rounds):
+        vcr_serialize.deserialize(cassette_string, serializer)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert yaml cassettes to json and compare their load times.")
+    parser.add_argument('cassettes', nargs='*', help="yaml cassettes (default: tests/fixtures/*.yml)")
+    parser.add_argument('--rounds', type=int, default=10, help="loads of each cassette to average the time over")
+    parser.add_argument('--keep', action='store_true', help="keep the yaml cassettes")
+    args = parser.parse_args()
+    serializer = sys.modules[__name__]
+    cassettes = args.cassettes or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '*.yml')))
+
+    print("libyaml: {0}".format('yes' if yaml.__with_libyaml__ else 'no'))
+    print("{0:<40} {1:>10} {2:>10} {3:>10} {4:>10}".format('cassette', 'yaml [kB]', 'json [kB]', 'yaml [ms]', 'json [ms]'))
+    totals = [0, 0, 0.0, 0.0]
+    for cassette in cassettes:
+        with open(cassette) as f:
+            yaml_string = f.read()
+        requests, responses = vcr_serialize.deserialize(yaml_string, yamlserializer)
+        json_string = vcr_serialize.serialize({'requests': requests, 'responses': responses}, serializer)
+        # The converted cassette must play back the very same interactions (serializing converted the responses in place)
+        requests, responses = vcr_serialize.deserialize(yaml_string, yamlserializer)
+        json_requests, json_responses = vcr_serialize.deserialize(json_string, serializer)
+        assert [request._to_dict() for request in json_requests] == [request._to_dict() for request in requests], cassette
+        assert json_responses == responses, cassette
+        row = [
+            len(yaml_string),
+            len(json_string),
+            load_time(yaml_string, yamlserializer, args.rounds),
+            load_time(json_string, serializer, args.rounds),
+        ]
+        totals = [total + value for total, value in zip(totals, row)]
+        print("{0:<40} {1:>10.1f} {2:>10.1f} {3:>10.3f} {4:>10.3f}".format(
+            os.path.basename(cassette), row[0] / 1024.0, row[1] / 1024.0, row[2] * 1000, row[3] * 1000))
+        with open(os.path.splitext(cassette)[0] + SUFFIX, 'w') as f:
+            f.write(json_string)
+        if not args.keep:
+            os.remove(cassette)
+    if cassettes:
+        print("{0:<40} {1:>10.1f} {2:>10.1f} {3:>10.3f} {4:>10.3f}".format(
+            'average', totals[0] / 1024.0 / len(cassettes), totals[1] / 1024.0 / len(cassettes),
+            totals[2] * 1000 / len(cassettes), totals[3] * 1000 / len(cassettes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,87 @@
+import json
+import os
+
 import pytest
 
+from pulp_server import PulpServer
+
+try:
+    from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+except ImportError:
+    # Before ansible 2.10
+    _AnsibleCollectionFinder = None
+
+# Test files importing the collection themselves
+IN_PROCESS_TESTS = ['test_api_stats.py', 'test_bulk.py', 'test_daemon.py', 'test_lookup_cache.py', 'test_modules.py', 'test_payload.py']
+
+# Modules are run in this process against the stand-in server, like the controller runtime of the action plugins does.
+# Older ansible cannot load the collection in process; the tests doing so are left out there, the playbook tests still run.
+if _AnsibleCollectionFinder is not None:
+    _AnsibleCollectionFinder(paths=[os.path.join(os.getcwd(), 'build', 'collections')])._install()
+    from ansible_collections.pulp.squeezer.plugins.plugin_utils.pulp_action import run_module
+    collect_ignore = []
+else:
+    run_module = None
+    collect_ignore = IN_PROCESS_TESTS
+
 
 def pytest_addoption(parser):
     parser.addoption("--record", action="store_true",
                      help="record new server-responses")
+    parser.addoption("--update-budgets", action="store_true",
+                     help="raise the request budgets to the requests the modules send")
+    parser.addoption("--update-invocations", action="store_true",
+                     help="store the module calls of the playbooks for the in process module tests")
+    parser.addoption("--benchmark", action="store_true",
+                     help="run the benchmarks and compare them to the baselines")
+    parser.addoption("--benchmark-update", action="store_true",
+                     help="run the benchmarks and store the results as new baselines")
+    parser.addoption("--benchmark-tolerance", type=float, default=0.5,
+                     help="allowed regression of cpu time and memory against the baselines (default: 0.5 for 50%%)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: measures a module against the stand-in server; needs --benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('benchmark') or config.getoption('benchmark_update'):
+        return
+    skip = pytest.mark.skip(reason="needs --benchmark")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture
 def record(request):
     return request.config.getoption('record')
+
+
+@pytest.fixture
+def update_budgets(request):
+    return request.config.getoption('update_budgets')
+
+
+@pytest.fixture
+def update_invocations(request):
+    return request.config.getoption('update_invocations')
+
+
+@pytest.fixture
+def pulp_server():
+    with PulpServer() as server:
+        yield server
+
+
+@pytest.fixture
+def squeeze(pulp_server):
+    if run_module is None:
+        pytest.skip("running modules in process needs ansible 2.10")
+
+    def _squeeze(module_name, **module_args):
+        module_args = dict(dict(username=pulp_server.username, password=pulp_server.password), pulp_url=pulp_server.url, **module_args)
+        result = run_module(module_name, module_args)
+        assert result['stderr'] == ''
+        return json.loads(result['stdout'])
+    return _squeeze
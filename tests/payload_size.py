@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Report the size of the AnsiballZ payload, ansible ships to the target for every module of the collection.
+# Needs ansible >= 2.10 and the collection installed (make dist) into the collections path.
+
+import argparse
+import base64
+import io
+import os
+import re
+import sys
+import zipfile
+
+import yaml
+from ansible.executor.module_common import modify_module
+from ansible.parsing.dataloader import DataLoader
+from ansible.template import Templar
+try:
+    from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+except ImportError:
+    sys.exit("payload_size.py needs ansible 2.10 or later.")
+
+
+def build_payload(collection_dir, fqcn, module_name, module_args=None):
+    module_path = os.path.join(collection_dir, 'plugins', 'modules', module_name + '.py')
+    b_module_data, _module_style, _shebang = modify_module(
+        fqcn,
+        module_path,
+        module_args or {},
+        Templar(loader=DataLoader()),
+        task_vars={'ansible_python_interpreter': sys.executable},
+        module_compression='ZIP_DEFLATED',
+    )
+    zip_data = re.search(br'ZIPDATA = """(.*?)"""', b_module_data, re.DOTALL).group(1)
+    return b_module_data, zipfile.ZipFile(io.BytesIO(base64.b64decode(zip_data)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the AnsiballZ payload size per module.")
+    parser.add_argument('--collections-path', default='build/collections')
+    parser.add_argument('--limit', type=int, help="fail if the payload of any module exceeds this many bytes")
+    parser.add_argument('modules', nargs='*', help="modules to report on (default: all)")
+    args = parser.parse_args()
+
+    with open('galaxy.yml') as galaxy_file:
+        galaxy = yaml.safe_load(galaxy_file)
+    collections_path = os.path.abspath(args.collections_path)
+    collection_dir = os.path.join(collections_path, 'ansible_collections', galaxy['namespace'], galaxy['name'])
+    _AnsibleCollectionFinder(paths=[collections_path])._install()
+
+    module_names = args.modules or sorted(
+        name[:-3] for name in os.listdir(os.path.join(collection_dir, 'plugins', 'modules')) if name.endswith('.py') and not name.startswith('__')
+    )
+    module_utils_prefix = 'ansible_collections/{namespace}/{name}/plugins/module_utils/'.format(**galaxy)
+
+    exceeded = []
+    print('{0:24} {1:>8} {2:>6}  {3}'.format('module', 'bytes', 'files', 'collection module_utils'))
+    for module_name in module_names:
+        fqcn = '{namespace}.{name}.{module}'.format(module=module_name, **galaxy)
+        b_module_data, payload_zip = build_payload(collection_dir, fqcn, module_name)
+        module_utils = sorted(
+            os.path.basename(info.filename)[:-3] for info in payload_zip.infolist()
+            if info.filename.startswith(module_utils_prefix) and not info.filename.endswith('__init__.py')
+        )
+        print('{0:24} {1:>8} {2:>6}  {3}'.format(module_name, len(b_module_data), len(payload_zip.infolist()), ' '.join(module_utils)))
+        if args.limit and len(b_module_data) > args.limit:
+            exceeded.append(module_name)
+
+    if exceeded:
+        print('Payload exceeds {0} bytes: {1}'.format(args.limit, ', '.join(exceeded)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
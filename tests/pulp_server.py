@@ -0,0 +1,807 @@
+# Stand-in for the Pulp api, to test the modules offline with collection sizes, latencies and failures beyond what recorded cassettes hold.
+# It keeps all entities in memory and answers the endpoints of pulpcore 3.5 and its plugins the modules use
+# (and the targeted orphan cleanup of pulpcore 3.14),
+# creating, updating and deleting with or without a task the way Pulp does.
+# Like Pulp, it only answers requests with basic auth or a session of the login page.
+# Collections of millions of entities can be synthesized; their entities are generated from their index when read.
+
+import argparse
+import base64
+import functools
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+try:
+    from http.cookies import SimpleCookie
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qsl, urlparse
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from Cookie import SimpleCookie
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl, urlparse
+
+
+API_ROOT = '/pulp/api/v3/'
+LOGIN_PATH = '/auth/login/'
+# Django keeps sessions for two weeks
+SESSION_LIFETIME = 14 * 24 * 3600
+SAFE_METHODS = ['GET', 'HEAD', 'OPTIONS']
+# Collections by their path below the api root, with the operations Pulp runs in a task
+COLLECTIONS = {
+    'artifacts/': {},
+    'uploads/': {},
+    'tasks/': {},
+    'content/file/files/': {'async': ['create']},
+    'content/ansible/roles/': {'async': ['create']},
+    'content/ansible/collection_versions/': {'async': ['create']},
+    'content/python/packages/': {'async': ['create']},
+    'repositories/file/file/': {'async': ['update', 'delete']},
+    'repositories/ansible/ansible/': {'async': ['update', 'delete']},
+    'repositories/python/python/': {'async': ['update', 'delete']},
+    'remotes/file/file/': {'async': ['update', 'delete']},
+    'remotes/ansible/ansible/': {'async': ['update', 'delete']},
+    'remotes/ansible/collection/': {'async': ['update', 'delete']},
+    'remotes/python/python/': {'async': ['update', 'delete']},
+    'publications/file/file/': {'async': ['create', 'delete']},
+    'publications/python/pypi/': {'async': ['create', 'delete']},
+    'distributions/file/file/': {'async': ['create', 'update', 'delete']},
+    'distributions/ansible/ansible/': {'async': ['create', 'update', 'delete']},
+    'distributions/python/pypi/': {'async': ['create', 'update', 'delete']},
+}
+DIGESTS = ['md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512']
+STATUS = {
+    'versions': [
+        {'component': 'pulpcore', 'version': '3.5.0'},
+        {'component': 'pulp_file', 'version': '1.1.0'},
+        {'component': 'pulp_ansible', 'version': '0.2.0b14'},
+        {'component': 'pulp_python', 'version': '3.0.0b9'},
+    ],
+    'online_workers': [],
+    'online_content_apps': [],
+    'database_connection': {'connected': True},
+    'redis_connection': {'connected': True},
+    'storage': {'total': 0, 'used': 0, 'free': 0},
+}
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+# Synthetic entities have ids of this prefix followed by their index, and were created a second apart from this point in time
+SYNTHETIC_ID = '00000000-0000-4000-8000-'
+SYNTHETIC_EPOCH = 1577836800
+# Fields of the generated entities that are named after the index, so filtering by them needs no scan
+INDEXED_FIELDS = ['name', 'base_path', 'relative_path']
+
+
+def _now():
+    return _timestamp(time.time())
+
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000000Z', time.gmtime(seconds))
+
+
+def kind(path):
+    # The singular of the first part of the path
+    return re.sub(r'ies$', 'y', path.split('/')[0]).rstrip('s')
+
+
+def synthetic_href(path, index):
+    return '{0}{1}{2}{3:012x}/'.format(API_ROOT, path, SYNTHETIC_ID, index)
+
+
+def generate_entity(path, index):
+    # An entity like Pulp would answer it for the collection at path, named '<kind>-<index>'
+    plugin = path.split('/')[1]
+    name = '{0}-{1}'.format(kind(path), index)
+    if path == 'artifacts/':
+        content = name.encode('ascii')
+        entity = dict((digest, hashlib.new(digest, content).hexdigest()) for digest in DIGESTS)
+        entity.update(size=len(content), file='artifact/{0}/{1}'.format(entity['sha256'][:2], entity['sha256'][2:]))
+        return entity
+    if path == 'tasks/':
+        return {
+            'name': 'pulpcore.app.tasks.base.general_update',
+            'state': 'completed',
+            'error': None,
+            'created_resources': [],
+            'started_at': _timestamp(SYNTHETIC_EPOCH + index),
+            'finished_at': _timestamp(SYNTHETIC_EPOCH + index + 1),
+            'worker': '{0}workers/{1}{2:012x}/'.format(API_ROOT, SYNTHETIC_ID, index % 4),
+            'parent_task': None,
+            'child_tasks': [],
+            'progress_reports': [],
+            'reserved_resources_record': [],
+        }
+    if path == 'uploads/':
+        return {'size': 1024, 'completed': _timestamp(SYNTHETIC_EPOCH + index)}
+    if path.startswith('content/'):
+        artifact = generate_entity('artifacts/', index)
+        return {'relative_path': name, 'artifact': synthetic_href('artifacts/', index), 'sha256': artifact['sha256']}
+    if path.startswith('remotes/'):
+        return {
+            'name': name,
+            'url': 'https://example.com/{0}/'.format(index),
+            'policy': 'immediate',
+            'download_concurrency': 10,
+            'proxy_url': None,
+            'tls_validation': True,
+            'ca_cert': None,
+            'client_cert': None,
+            'client_key': None,
+        }
+    if path.startswith('publications/'):
+        repository_href = synthetic_href('repositories/{0}/{0}/'.format(plugin), index)
+        return {'repository': repository_href, 'repository_version': repository_href + 'versions/0/', 'distributions': []}
+    if path.startswith('distributions/'):
+        return {
+            'name': name,
+            'base_path': name,
+            'base_url': 'https://pulp.example.com/pulp/content/{0}/'.format(name),
+            'content_guard': None,
+        }
+    return {'name': name}
+
+
+def complete_entity(path, entity, href, created):
+    entity = dict(entity, pulp_href=href, pulp_created=created)
+    if path.startswith('repositories/'):
+        entity.setdefault('description', None)
+        entity['versions_href'] = entity['pulp_href'] + 'versions/'
+        entity['latest_version_href'] = entity['versions_href'] + '0/'
+        # The content hrefs added by and present in each version
+        entity['_versions'] = [{'added': set(), 'present': set()}]
+    return entity
+
+
+def parse_multipart(content_type, body):
+    boundary = b'--' + re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode('ascii')
+    fields = {}
+    for part in body.split(boundary)[1:-1]:
+        head, _separator, value = part[2:-2].partition(b'\r\n\r\n')
+        disposition = dict(re.findall(r'(\w+)="([^"]*)"', head.decode('utf-8')))
+        fields[disposition['name']] = value if 'filename' in disposition else value.decode('utf-8')
+    return fields
+
+
+class Collection(object):
+    # The entities of an endpoint in the order they were created.
+    # The first `synthetic` of them are generated by factory(index) whenever they are read,
+    # only the ones handed out to be changed are kept.
+    def __init__(self, path):
+        self.path = path
+        self.kind = kind(path)
+        self.entities = {}
+        self.order = []
+        self.synthetic = 0
+        self.factory = None
+        self.indexed = []
+        self.deleted = set()
+
+    def __len__(self):
+        return self.synthetic - len(self.deleted) + len(self.order)
+
+    def synthesize(self, count, factory=None):
+        self.synthetic = count
+        self.factory = factory
+        self.indexed = []
+        if factory is None:
+            self.factory = functools.partial(generate_entity, self.path)
+            self.indexed = [key for key in INDEXED_FIELDS if self.factory(0).get(key) == self.kind + '-0']
+
+    def synthetic_index(self, href):
+        pulp_id = href[len(API_ROOT + self.path):-1]
+        if not pulp_id.startswith(SYNTHETIC_ID) or href in self.deleted:
+            return None
+        index = int(pulp_id[len(SYNTHETIC_ID):], 16)
+        return index if index < self.synthetic else None
+
+    def generate(self, index):
+        href = synthetic_href(self.path, index)
+        entity = self.entities.get(href)
+        if entity is None:
+            entity = complete_entity(self.path, self.factory(index), href, _timestamp(SYNTHETIC_EPOCH + index))
+        return entity
+
+    def add(self, entity):
+        self.entities[entity['pulp_href']] = entity
+        self.order.append(entity['pulp_href'])
+
+    def get(self, href):
+        entity = self.entities.get(href)
+        if entity is None:
+            index = self.synthetic_index(href)
+            if index is not None:
+                entity = self.entities[href] = self.generate(index)
+        return entity
+
+    def remove(self, href):
+        if self.synthetic_index(href) is not None:
+            self.deleted.add(href)
+            self.entities.pop(href, None)
+        else:
+            del self.entities[href]
+            self.order.remove(href)
+
+    def __iter__(self):
+        for index in range(self.synthetic):
+            if not self.deleted or synthetic_href(self.path, index) not in self.deleted:
+                yield self.generate(index)
+        for href in self.order:
+            yield self.entities[href]
+
+    def page(self, offset, limit, filters, within=None):
+        # Returns the number of matching entities and the ones on the page, only looking at the hrefs within if given
+        if within is not None:
+            matches = [entity for entity in (self.get(href) for href in sorted(within)) if entity is not None]
+            matches = [entity for entity in matches if all(str(entity.get(key)) == value for key, value in filters.items())]
+            return len(matches), matches[offset:offset + limit]
+        if filters:
+            matches = self._lookup(filters)
+            if matches is None:
+                matches = [entity for entity in self if all(str(entity.get(key)) == value for key, value in filters.items())]
+            return len(matches), matches[offset:offset + limit]
+        if self.deleted:
+            return len(self), list(itertools.islice(self, offset, offset + limit))
+        synthetic = [self.generate(index) for index in range(offset, min(offset + limit, self.synthetic))]
+        start = max(offset - self.synthetic, 0)
+        added = [self.entities[href] for href in self.order[start:start + limit - len(synthetic)]]
+        return len(self), synthetic + added
+
+    def _lookup(self, filters):
+        # Unchanged generated entities can only match the value named after their own index,
+        # so finding them by these fields needs no scan
+        keys = [key for key in self.indexed if key in filters]
+        if not keys:
+            return None
+        candidates = dict(self.entities)
+        for key in keys:
+            match = re.match(r'^{0}-(\d+)$'.format(self.kind), filters[key])
+            if match is not None and int(match.group(1)) < self.synthetic and synthetic_href(self.path, int(match.group(1))) not in self.deleted:
+                candidates.setdefault(synthetic_href(self.path, int(match.group(1))), self.generate(int(match.group(1))))
+        hrefs = sorted(href for href in candidates if self.synthetic_index(href) is not None) + self.order
+        return [candidates[href] for href in hrefs if all(str(candidates[href].get(key)) == value for key, value in filters.items())]
+
+
+class PulpServerError(Exception):
+    def __init__(self, status, detail, headers=None):
+        super(PulpServerError, self).__init__(detail)
+        self.status = status
+        self.headers = headers or {}
+
+
+class PulpServer(object):
+    # latency: seconds added to every answer
+    # task_duration: seconds a task runs, before the first poll finding it completed
+    # sizes: number of entities to synthesize per collection, e.g. {'repositories/file/file/': 1000000}
+    # error_rate, error_status: share of requests to fail at random with that status
+    # username, password: the only user; every request but the status needs its basic auth or a session of the login page
+    # port: to listen on (a free one by default)
+    def __init__(self, latency=0.0, task_duration=0.0, sizes=None, error_rate=0.0, error_status=503, seed=0,
+                 username='admin', password='password', port=0):
+        self.latency = latency
+        self.task_duration = task_duration
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.collections = dict((path, Collection(path)) for path in COLLECTIONS)
+        self.uploads = {}
+        self.injected = []
+        self.requests = []
+        # The bytes of the request and response bodies
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        # Requests being answered, and the most at the same time
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # The bodies of the sync requests, with the href of the repository
+        self.syncs = []
+        # Whether syncs find new content, making a new repository version
+        self.sync_changes = True
+        self.username = username
+        self.password = password
+        self.session_lifetime = SESSION_LIFETIME
+        # Expiry of the sessions by their id
+        self.sessions = {}
+        for path, count in (sizes or {}).items():
+            self.synthesize(path, count)
+        self.port = port
+        self.httpd = None
+        self.thread = None
+
+    # Life cycle
+
+    def start(self):
+        server = self
+
+        class Handler(PulpRequestHandler):
+            pulp_server = server
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.httpd.server_address)
+
+    # Setup and inspection
+
+    def add(self, path, entity):
+        entity = complete_entity(path, entity, API_ROOT + path + str(uuid.uuid4()) + '/', _now())
+        with self.lock:
+            self.collections[path].add(entity)
+        return entity
+
+    def populate(self, path, count, factory=None):
+        # Add entities named like '<kind>-<index>' (see generate_entity), or as returned by factory(index)
+        for index in range(count):
+            self.add(path, generate_entity(path, index) if factory is None else factory(index))
+
+    def synthesize(self, path, count, factory=None):
+        # Like populate, but the entities are only generated when read; for collections far beyond what fits in memory
+        with self.lock:
+            self.collections[path].synthesize(count, factory)
+
+    def entities(self, path):
+        with self.lock:
+            return list(self.collections[path])
+
+    def modify(self, repository_href, add=(), remove=()):
+        # Add and remove content of a repository in a new version, returning its href
+        return self._new_version(repository_href, add, remove)
+
+    def inject_error(self, status, count=1, method=None, path=None, retry_after=None):
+        # Answer the next count requests (matching method and the start of the path) with status
+        self.injected.append({'status': status, 'count': count, 'method': method, 'path': path, 'retry_after': retry_after})
+
+    def expire_sessions(self):
+        # Like the sessions running out on the server, before their cookies do
+        with self.lock:
+            self.sessions.clear()
+
+    def request_count(self, method=None, path=None):
+        return len([1 for request in self.requests if method in (None, request[0]) and (path is None or request[1].startswith(path))])
+
+    # Request handling
+
+    def _injected_error(self, method, path):
+        with self.lock:
+            for rule in self.injected:
+                if rule['count'] > 0 and rule['method'] in (None, method) and (rule['path'] is None or path.startswith(rule['path'])):
+                    rule['count'] -= 1
+                    headers = {} if rule['retry_after'] is None else {'Retry-After': str(rule['retry_after'])}
+                    return PulpServerError(rule['status'], 'Injected error.', headers)
+            if self.error_rate and self.random.random() < self.error_rate:
+                return PulpServerError(self.error_status, 'Random error.')
+        return None
+
+    def handle(self, method, url, headers, body):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return self._handle(method, url, headers, body)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _handle(self, method, url, headers, body):
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(url)
+        path = parsed.path
+        query = dict(parse_qsl(parsed.query))
+        self.requests.append((method, path))
+        error = self._injected_error(method, path)
+        if error is not None:
+            raise error
+        if path == API_ROOT + 'status/' and method == 'GET':
+            return 200, STATUS
+        if path == LOGIN_PATH:
+            return self._login(method, headers, body)
+        self._authenticate(method, headers)
+        if path == API_ROOT + 'orphans/' and method == 'DELETE':
+            progress_reports = []
+            return 202, self._task('orphans', lambda: self._delete_orphans(progress_reports), progress_reports)
+        data = self._parse_body(headers, body)
+        if path == API_ROOT + 'orphans/cleanup/' and method == 'POST':
+            # Targeted cleanup of pulpcore 3.14
+            progress_reports = []
+            return 202, self._task('orphans', lambda: self._delete_orphans(
+                progress_reports, data.get('content_hrefs'), data.get('orphan_protection_time')), progress_reports)
+        collection, href, action = self._route(path)
+        if href is None:
+            if method == 'GET':
+                return 200, self._list(collection, query)
+            if method == 'POST':
+                return self._create(collection, data)
+        elif action is None:
+            entity = self._get(collection, href)
+            if method == 'GET':
+                return 200, self._render(entity, query)
+            if method in ['PUT', 'PATCH']:
+                if collection == 'uploads/':
+                    return self._upload_chunk(entity, headers, data)
+                if collection == 'tasks/':
+                    entity['state'] = data['state']
+                    return 200, self._render(entity, {})
+                return self._update(collection, entity, data)
+            if method == 'DELETE':
+                return self._delete(collection, entity)
+        elif method == 'POST' and action == 'sync/':
+            self._get(collection, href)
+            self.syncs.append((href, data))
+            return 202, self._task('sync', lambda: [self._new_version(href)] if self.sync_changes else [])
+        elif method == 'POST' and action == 'modify/':
+            add, remove = data.get('add_content_units', []), data.get('remove_content_units', [])
+            return 202, self._task('modify', lambda: [self._new_version(href, add, remove)])
+        elif method == 'POST' and action == 'commit/':
+            return self._commit(self._get(collection, href), data)
+        elif method == 'GET' and action == 'versions/':
+            return 200, self._versions(self._get(collection, href), query)
+        elif method == 'GET' and action.startswith('versions/'):
+            return 200, self._render(self._version(self._get(collection, href), int(action.split('/')[1])), query)
+        raise PulpServerError(405, 'Method "{0}" not allowed.'.format(method))
+
+    def _authenticate(self, method, headers):
+        authorization = headers.get('Authorization') or ''
+        if authorization.startswith('Basic '):
+            try:
+                username, _colon, password = base64.b64decode(authorization[len('Basic '):]).decode('utf-8').partition(':')
+            except (TypeError, ValueError):
+                username = password = None
+            if (username, password) != (self.username, self.password):
+                raise PulpServerError(401, 'Invalid username/password.', {'WWW-Authenticate': 'Basic realm="api"'})
+            return
+        cookies = SimpleCookie(headers.get('Cookie') or '')
+        if 'sessionid' in cookies:
+            with self.lock:
+                expires = self.sessions.get(cookies['sessionid'].value)
+            if expires is not None and expires > time.time():
+                csrftoken = cookies['csrftoken'].value if 'csrftoken' in cookies else None
+                if method not in SAFE_METHODS and (csrftoken is None or headers.get('X-CSRFToken') != csrftoken):
+                    raise PulpServerError(403, 'CSRF Failed: CSRF token missing or incorrect.')
+                return
+        raise PulpServerError(401, 'Authentication credentials were not provided.', {'WWW-Authenticate': 'Basic realm="api"'})
+
+    def _login(self, method, headers, body):
+        # The login form of the Django admin: a csrf token cookie first, then a session for the posted credentials
+        if method == 'GET':
+            return 200, None, [('Set-Cookie', 'csrftoken={0}; Path=/'.format(uuid.uuid4().hex))]
+        if method != 'POST':
+            raise PulpServerError(405, 'Method "{0}" not allowed.'.format(method))
+        cookies = SimpleCookie(headers.get('Cookie') or '')
+        form = dict(parse_qsl(body.decode('utf-8')))
+        if 'csrftoken' not in cookies or form.get('csrfmiddlewaretoken') != cookies['csrftoken'].value:
+            raise PulpServerError(403, 'CSRF verification failed.')
+        if (form.get('username'), form.get('password')) != (self.username, self.password):
+            # The form is shown again
+            return 200, None
+        session = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session] = time.time() + self.session_lifetime
+        return 302, None, [
+            ('Location', '/'),
+            ('Set-Cookie', 'sessionid={0}; Max-Age={1}; Path=/; HttpOnly'.format(session, self.session_lifetime)),
+        ]
+
+    def _parse_body(self, headers, body):
+        content_type = headers.get('Content-Type') or ''
+        if not body:
+            return {}
+        if content_type.startswith('multipart/form-data'):
+            return parse_multipart(content_type, body)
+        return json.loads(body.decode('utf-8'))
+
+    def _route(self, path):
+        if not path.startswith(API_ROOT):
+            raise PulpServerError(404, 'Not found.')
+        rest = path[len(API_ROOT):]
+        for collection in COLLECTIONS:
+            if rest == collection:
+                return collection, None, None
+            if rest.startswith(collection):
+                pulp_id, _slash, action = rest[len(collection):].partition('/')
+                return collection, API_ROOT + collection + pulp_id + '/', action or None
+        raise PulpServerError(404, 'Not found.')
+
+    def _get(self, collection, href):
+        with self.lock:
+            entity = self.collections[collection].get(href)
+        if entity is None:
+            raise PulpServerError(404, 'Not found.')
+        return entity
+
+    def _render(self, entity, query):
+        entity = dict((key, value) for key, value in entity.items() if not key.startswith('_'))
+        if entity.get('state') in ['waiting', 'running']:
+            entity['state'] = 'completed' if time.time() >= entity.pop('finish_at') else 'running'
+        else:
+            entity.pop('finish_at', None)
+        if query.get('fields'):
+            fields = query['fields'].split(',')
+            entity = dict((key, value) for key, value in entity.items() if key in fields)
+        return entity
+
+    def _list(self, collection, query):
+        limit = int(query.pop('limit', 100))
+        offset = int(query.pop('offset', 0))
+        query.pop('ordering', None)
+        filters = dict((key, value) for key, value in query.items() if key != 'fields')
+        within = None
+        for key, kind in [('repository_version', 'present'), ('repository_version_added', 'added')]:
+            if key in filters:
+                content = self._version_content(filters.pop(key), kind)
+                within = content if within is None else within & content
+        with self.lock:
+            count, page = self.collections[collection].page(offset, limit, filters, within)
+        next_page = None
+        if offset + limit < count:
+            next_page = '{0}{1}?limit={2}&offset={3}'.format(API_ROOT, collection, limit, offset + limit)
+        return {
+            'count': count,
+            'next': next_page,
+            'previous': None,
+            'results': [self._render(entity, query) for entity in page],
+        }
+
+    def _task(self, name, work, progress_reports=None):
+        try:
+            created_resources = work()
+            state, error = 'waiting', None
+        except PulpServerError as e:
+            created_resources = []
+            state, error = 'failed', {'description': str(e)}
+        task = self.add('tasks/', {
+            'name': 'pulpcore.app.tasks.' + name,
+            'state': state,
+            'error': error,
+            'created_resources': created_resources,
+            'finish_at': time.time() + self.task_duration,
+            'started_at': _now(),
+            'finished_at': None,
+            'parent_task': None,
+            'child_tasks': [],
+            'progress_reports': progress_reports or [],
+            'reserved_resources_record': [],
+        })
+        return {'task': task['pulp_href']}
+
+    def _create(self, collection, data):
+        if collection == 'tasks/':
+            raise PulpServerError(405, 'Method "POST" not allowed.')
+        if collection == 'artifacts/':
+            return 201, self._render(self._artifact(data.pop('file')), {})
+        if collection == 'uploads/':
+            upload = self.add(collection, {'size': data['size'], 'completed': None})
+            with self.lock:
+                self.uploads[upload['pulp_href']] = {'offset': 0, 'sha256': hashlib.sha256()}
+            return 201, self._render(upload, {})
+        if 'create' in COLLECTIONS[collection].get('async', []):
+            return 202, self._task('create', lambda: [self._add_related(collection, data)['pulp_href']])
+        return 201, self._render(self._add_related(collection, data), {})
+
+    def _add_related(self, collection, data):
+        if collection.startswith('publications/'):
+            repository_version = data.get('repository_version')
+            if repository_version is None:
+                repository_version = self._get(collection.replace('publications/', 'repositories/'), data['repository'])['latest_version_href']
+            data = dict(data, repository_version=repository_version)
+        return self.add(collection, data)
+
+    def _artifact(self, content):
+        artifact = dict((digest, hashlib.new(digest, content).hexdigest()) for digest in DIGESTS)
+        artifact['size'] = len(content)
+        artifact['file'] = 'artifact/' + artifact['sha256']
+        return self.add('artifacts/', artifact)
+
+    def _update(self, collection, entity, data):
+        def work():
+            with self.lock:
+                entity.update(data)
+            return []
+        if 'update' in COLLECTIONS[collection].get('async', []):
+            return 202, self._task('update', work)
+        work()
+        return 200, self._render(entity, {})
+
+    def _delete(self, collection, entity):
+        def work():
+            with self.lock:
+                self.collections[collection].remove(entity['pulp_href'])
+            return []
+        if 'delete' in COLLECTIONS[collection].get('async', []):
+            return 202, self._task('delete', work)
+        work()
+        return 204, None
+
+    def _new_version(self, repository_href, add=(), remove=()):
+        repository = self._get(self._route(repository_href)[0], repository_href)
+        with self.lock:
+            present = repository['_versions'][-1]['present']
+            repository['_versions'].append({'added': set(add) - present, 'present': (present - set(remove)) | set(add)})
+            repository['latest_version_href'] = '{0}{1}/'.format(repository['versions_href'], len(repository['_versions']) - 1)
+        return repository['latest_version_href']
+
+    def _version(self, repository, number):
+        if number >= len(repository['_versions']):
+            raise PulpServerError(404, 'Not found.')
+        return {
+            'pulp_href': '{0}{1}/'.format(repository['versions_href'], number),
+            'pulp_created': repository['pulp_created'],
+            'number': number,
+            'base_version': None,
+            'content_summary': {'added': {}, 'removed': {}, 'present': {}},
+        }
+
+    def _versions(self, repository, query):
+        # Newest first, like Pulp lists them
+        limit = int(query.pop('limit', 100))
+        offset = int(query.pop('offset', 0))
+        numbers = list(reversed(range(len(repository['_versions']))))
+        return {
+            'count': len(numbers),
+            'next': None if offset + limit >= len(numbers) else '{0}?limit={1}&offset={2}'.format(repository['versions_href'], limit, offset + limit),
+            'previous': None,
+            'results': [self._render(self._version(repository, number), query) for number in numbers[offset:offset + limit]],
+        }
+
+    def _version_content(self, version_href, kind):
+        # The hrefs of the content added by or present in a repository version
+        repository_href, _versions, number = version_href.rstrip('/').rpartition('/versions/')
+        repository_href += '/'
+        try:
+            repository = self._get(self._route(repository_href)[0], repository_href)
+            return set(repository['_versions'][int(number)][kind])
+        except (PulpServerError, IndexError, ValueError):
+            raise PulpServerError(400, 'Invalid repository version.')
+
+    def _delete_orphans(self, progress_reports, content_hrefs=None, protection_time=None):
+        # Content in no repository version (of content_hrefs if given), and then artifacts of no content,
+        # created more than protection_time minutes ago
+        content_paths = [path for path in COLLECTIONS if path.startswith('content/')]
+        cutoff = _timestamp(time.time() - protection_time * 60) if protection_time else None
+
+        def orphaned(entity, kept):
+            return entity['pulp_href'] not in kept and (cutoff is None or entity['pulp_created'] < cutoff)
+
+        with self.lock:
+            referenced = set()
+            for path in COLLECTIONS:
+                if path.startswith('repositories/'):
+                    for repository in self.collections[path]:
+                        for version in repository['_versions']:
+                            referenced |= version['present']
+            if content_hrefs is None:
+                candidates = [(path, entity) for path in content_paths for entity in self.collections[path]]
+            else:
+                paths = [self._route(href)[0] for href in content_hrefs]
+                candidates = [(path, self.collections[path].get(href)) for path, href in zip(paths, content_hrefs)]
+            content = [(path, entity['pulp_href']) for path, entity in candidates if entity is not None and orphaned(entity, referenced)]
+            for path, href in content:
+                self.collections[path].remove(href)
+            kept = set(entity.get('artifact') for path in content_paths for entity in self.collections[path])
+            artifacts = [entity['pulp_href'] for entity in self.collections['artifacts/'] if orphaned(entity, kept)]
+            for href in artifacts:
+                self.collections['artifacts/'].remove(href)
+        for name, total in [('Content', len(content)), ('Artifacts', len(artifacts))]:
+            progress_reports.append({
+                'message': 'Clean up orphan ' + name,
+                'code': 'clean-up.content',
+                'state': 'completed',
+                'total': total,
+                'done': total,
+                'suffix': None,
+            })
+        return []
+
+    def _upload_chunk(self, upload, headers, data):
+        match = CONTENT_RANGE.match(headers.get('Content-Range') or '')
+        if match is None:
+            raise PulpServerError(400, 'Missing or invalid Content-Range header.')
+        start, end, size = [int(value) for value in match.groups()]
+        chunk = data['file']
+        if end - start + 1 != len(chunk) or size != upload['size']:
+            raise PulpServerError(400, 'The chunk does not match the Content-Range header.')
+        with self.lock:
+            state = self.uploads[upload['pulp_href']]
+            # Chunks are only hashed (not kept), so they need to come in order
+            if start != state['offset']:
+                raise PulpServerError(400, 'Chunks must be uploaded in order.')
+            state['sha256'].update(chunk)
+            state['offset'] = end + 1
+        return 200, self._render(upload, {})
+
+    def _commit(self, upload, data):
+        state = self.uploads[upload['pulp_href']]
+
+        def work():
+            if state['offset'] != upload['size'] or state['sha256'].hexdigest() != data['sha256']:
+                raise PulpServerError(400, 'The uploaded data does not match the checksum.')
+            artifact = self.add('artifacts/', dict(
+                size=upload['size'],
+                file='artifact/' + data['sha256'],
+                sha256=data['sha256'],
+                **dict.fromkeys([digest for digest in DIGESTS if digest != 'sha256'])
+            ))
+            return [artifact['pulp_href']]
+        return 202, self._task('commit', work)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class PulpRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send every answer in one piece, rather than waiting for the client to acknowledge the headers
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    pulp_server = None
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        headers = []
+        try:
+            answer = self.pulp_server.handle(self.command, self.path, self.headers, body)
+            # Answers setting headers (like cookies, which may repeat) carry them as a list
+            status, data = answer[:2]
+            headers = answer[2] if len(answer) > 2 else []
+        except PulpServerError as e:
+            status, data, headers = e.status, {'detail': str(e)}, list(e.headers.items())
+        payload = b'' if data is None else json.dumps(data).encode('utf-8')
+        with self.pulp_server.lock:
+            self.pulp_server.bytes_received += len(body)
+            self.pulp_server.bytes_sent += len(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for header, value in headers:
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the stand-in Pulp api, e.g. to record cassettes without a Pulp server.")
+    parser.add_argument('--port', type=int, default=24817, help="port to listen on (default: 24817)")
+    parser.add_argument('--username', default='admin', help="user to accept (default: admin)")
+    parser.add_argument('--password', default='password', help="password of the user (default: password)")
+    args = parser.parse_args()
+    server = PulpServer(username=args.username, password=args.password, port=args.port).start()
+    print("Serving the stand-in Pulp api at {0}".format(server.url))
+    try:
+        while server.thread.is_alive():
+            server.thread.join(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+# Show the rate limiter holding its limits, with several processes (like the forks of ansible) sending requests in several threads each (like PulpBulk).
+# The requests go to a stand-in pool manager taking a fixed time per request, so no server is needed.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+except ImportError:
+    sys.exit("rate_limit_benchmark.py needs ansible 2.10 or later.")
+
+# The collection as built by make
+_AnsibleCollectionFinder(paths=[os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'build', 'collections')])._install()
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_ratelimit import PulpRateLimit  # noqa: E402
+
+
+PULP_URL = 'https://pulp.example.com'
+
+
+class Response(object):
+    status = 200
+
+
+class SleepingPoolManager(object):
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        start = time.time()
+        time.sleep(self.latency)
+        with self.lock:
+            self.requests.append((start, time.time()))
+        return Response()
+
+
+def worker(args, directory, queue):
+    rate_limit = PulpRateLimit(PULP_URL, rate=args.rate, concurrent=args.concurrent, directory=directory)
+    pool_manager = SleepingPoolManager(args.latency)
+    limited = rate_limit.wrap(pool_manager)
+
+    def send():
+        for _index in range(args.requests):
+            limited.request('GET', PULP_URL + '/pulp/api/v3/status/')
+
+    threads = [threading.Thread(target=send) for _index in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(pool_manager.requests)
+
+
+def max_concurrency(requests):
+    events = sorted([(start, 1) for start, _end in requests] + [(end, -1) for _start, end in requests])
+    current = peak = 0
+    for _time, change in events:
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+def max_window_rate(requests, window):
+    # Most requests started in any window of the given length
+    starts = sorted(start for start, _end in requests)
+    peak = 0
+    first = 0
+    for last, start in enumerate(starts):
+        while starts[first] < start - window:
+            first += 1
+        peak = max(peak, last - first + 1)
+    return peak / window
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the client side rate limiting of squeezer.")
+    parser.add_argument('--rate', type=float, default=20.0, help="requests per second to allow")
+    parser.add_argument('--concurrent', type=int, default=4, help="concurrent requests to allow")
+    parser.add_argument('--processes', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=4, help="threads per process")
+    parser.add_argument('--requests', type=int, default=10, help="requests per thread")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per request")
+    parser.add_argument('--json', action='store_true', help="print the results as json")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='squeezer-rate-limit-')
+    queue = multiprocessing.Queue()
+    start = time.time()
+    processes = [multiprocessing.Process(target=worker, args=(args, directory, queue)) for _index in range(args.processes)]
+    for process in processes:
+        process.start()
+    requests = [request for _process in processes for request in queue.get()]
+    for process in processes:
+        process.join()
+    duration = time.time() - start
+
+    # The bucket allows a burst of one second worth of requests up front
+    burst = min(max(args.rate, 1.0), len(requests))
+    expected = (len(requests) - burst) / args.rate
+    results = {
+        'requests': len(requests),
+        'duration': duration,
+        'expected_duration': expected,
+        'rate': len(requests) / duration,
+        'sustained_rate': (len(requests) - burst) / duration,
+        'max_rate_per_2s': max_window_rate(requests, 2.0),
+        'max_concurrent': max_concurrency(requests),
+        'limits': {'rate': args.rate, 'concurrent': args.concurrent},
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print('{requests} requests in {duration:.2f}s (at least {expected_duration:.2f}s expected)'.format(**results))
+        print('rate: {rate:.1f}/s overall, {sustained_rate:.1f}/s after the initial burst, {max_rate_per_2s:.1f}/s at most over 2s (limit {0})'.format(
+            args.rate, **results))
+        print('concurrent: {max_concurrent} at most (limit {0})'.format(args.concurrent, **results))
+    ok = results['max_concurrent'] <= args.concurrent and results['sustained_rate'] <= args.rate * 1.02
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+from ansible.utils.display import Display
+
+from ansible_collections.pulp.squeezer.plugins.callback.api_stats import CallbackModule
+
+
+class CapturedDisplay(Display):
+    def __init__(self):
+        super(CapturedDisplay, self).__init__()
+        self.lines = []
+
+    def display(self, msg, *args, **kwargs):
+        self.lines.append(msg)
+
+
+class Task(object):
+    def __init__(self, name, action):
+        self._uuid = name
+        self.name = name
+        self.action = action
+
+    def get_name(self):
+        return self.name
+
+
+class Result(object):
+    def __init__(self, task, result):
+        self._task = task
+        self._result = result
+
+
+def test_api_stats(pulp_server, squeeze, tmpdir):
+    data = os.urandom(100 * 1024)
+    artifact_file = tmpdir.join('artifact.bin')
+    artifact_file.write_binary(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    pulp_server.inject_error(400, method='POST', path='/pulp/api/v3/artifacts/')
+    failed = squeeze('artifact', file=artifact_file.strpath, sha256=sha256, state='present', metrics=True)
+    assert failed['failed']
+    # The rejected upload does not count
+    assert failed['metrics']['bytes_uploaded'] == 0
+    uploaded = squeeze('artifact', file=artifact_file.strpath, sha256=sha256, state='present', metrics=True)
+    assert uploaded['changed']
+    assert uploaded['metrics']['bytes_uploaded'] == len(data)
+    listed = squeeze('artifact', metrics=True)
+
+    display = CapturedDisplay()
+    callback = CallbackModule(display=display)
+    callback.set_option('top', 1)
+    callback.set_option('output_file', tmpdir.join('api_stats.json').strpath)
+    upload = Task('Upload an artifact', 'pulp.squeezer.artifact')
+    listing = Task('List the artifacts', 'pulp.squeezer.artifact')
+    callback.v2_playbook_on_task_start(upload, False)
+    callback.v2_runner_on_failed(Result(upload, failed), ignore_errors=True)
+    callback.v2_runner_on_ok(Result(upload, uploaded))
+    callback.v2_playbook_on_task_start(listing, False)
+    # Looped tasks return the metrics of each item
+    callback.v2_runner_on_ok(Result(listing, {'results': [listed, listed]}))
+    callback.v2_playbook_on_stats(None)
+
+    with open(tmpdir.join('api_stats.json').strpath) as stats_file:
+        stats = json.load(stats_file)
+    totals = stats['totals']
+    assert totals['tasks'] == 2
+    assert totals['requests'] == failed['metrics']['requests'] + uploaded['metrics']['requests'] + 2 * listed['metrics']['requests']
+    assert totals['requests'] == pulp_server.request_count() + listed['metrics']['requests']
+    assert totals['bytes_uploaded'] == len(data)
+    assert [(record['name'], record['hosts']) for record in stats['tasks']] == [('Upload an artifact', 2), ('List the artifacts', 1)]
+    assert 'Uploaded: {0} bytes'.format(len(data)) in display.lines
+    # Only the top task of each ranking is shown
+    assert len([line for line in display.lines if line.startswith('  ')]) == 2
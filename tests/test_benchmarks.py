@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import resource
+import time
+
+import pytest
+
+from pulp_server import generate_entity, synthetic_href
+
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_baselines.json')
+# Deterministic measurements, which must not grow at all
+EXACT = ['requests', 'bytes_received', 'bytes_sent']
+# Measurements compared to the baselines with the tolerance, plus some slack for the noise of short runs.
+# The cpu time is relative to a calibration run in the same session, the wall time is only recorded.
+SLACK = {'relative_cpu_time': 0.5, 'peak_rss_growth': 5.0}
+CALIBRATION_RUNS = 3
+UPLOAD_SIZE = 1024 ** 3
+UPLOAD_BLOCK = 1024 ** 2
+CATALOG_PATHS = ['repositories/file/file/', 'remotes/file/file/', 'distributions/file/file/', 'repositories/python/python/', 'remotes/python/python/']
+# The concurrent catalog must be this many times faster than the serial one, when waiting for the server
+BULK_SPEEDUP = 2
+
+
+def resident_memory():
+    # in MiB
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 1024.0 ** 2
+
+
+def measure(function):
+    # Run function in a forked process, so the peak memory is its own; the stand-in server keeps running in this one.
+    # The process starts with the memory of this one, which depends on the tests run before, so the growth is measured.
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(reader)
+        try:
+            memory = resident_memory()
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            start = time.time()
+            result = function()
+            end = time.time()
+            end_usage = resource.getrusage(resource.RUSAGE_SELF)
+            measurement = {
+                'wall_time': end - start,
+                'cpu_time': (end_usage.ru_utime - usage.ru_utime) + (end_usage.ru_stime - usage.ru_stime),
+                # in MiB (linux reports KiB)
+                'peak_rss_growth': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 - memory,
+                'result': result,
+            }
+            with os.fdopen(writer, 'w') as pipe:
+                json.dump(measurement, pipe)
+        finally:
+            os._exit(0)
+    os.close(writer)
+    with os.fdopen(reader) as pipe:
+        data = pipe.read()
+    os.waitpid(pid, 0)
+    assert data, "The benchmark process died."
+    return json.loads(data)
+
+
+def calibrate():
+    # A fixed workload like the one of the modules: encoding and decoding pages of entities
+    page = [generate_entity('repositories/file/file/', index) for index in range(1000)]
+    for _index in range(200):
+        json.loads(json.dumps(page))
+
+
+@pytest.fixture(scope='session')
+def calibration():
+    # The cpu time of the calibration workload on this machine, the best of a few runs
+    return min(measure(calibrate)['cpu_time'] for _run in range(CALIBRATION_RUNS))
+
+
+@pytest.fixture
+def benchmark(request, pulp_server, squeeze, calibration):
+    # Benchmark a module run against the stand-in server and compare it to the baseline of the test
+    name = request.node.name[len('test_'):]
+    config = request.config
+
+    def _benchmark(module_name, **module_args):
+        # Import the client packages up front, they are measured by test_import_time
+        squeeze('status')
+        requests_before = len(pulp_server.requests)
+        received_before, sent_before = pulp_server.bytes_received, pulp_server.bytes_sent
+        measurement = measure(lambda: squeeze(module_name, **module_args))
+        measurement['requests'] = len(pulp_server.requests) - requests_before
+        measurement['bytes_received'] = pulp_server.bytes_received - received_before
+        measurement['bytes_sent'] = pulp_server.bytes_sent - sent_before
+        measurement['relative_cpu_time'] = measurement['cpu_time'] / calibration
+        result = measurement.pop('result')
+        assert not result.get('failed'), result.get('msg')
+
+        with open(BASELINES_FILE) as baselines_file:
+            baselines = json.load(baselines_file)
+        if config.getoption('benchmark_update'):
+            baselines[name] = measurement
+            with open(BASELINES_FILE, 'w') as baselines_file:
+                json.dump(baselines, baselines_file, indent=2, sort_keys=True)
+                baselines_file.write('\n')
+        elif name in baselines:
+            baseline = baselines[name]
+            tolerance = config.getoption('benchmark_tolerance')
+            limits = dict((key, baseline[key] * (1 + tolerance) + slack) for key, slack in SLACK.items())
+            limits.update((key, baseline[key]) for key in EXACT)
+            regressions = [
+                '{0}: {1:.2f} > {2:.2f}'.format(key, measurement[key], limit) for key, limit in sorted(limits.items()) if measurement[key] > limit
+            ]
+            assert not regressions, '{0} regressed against the baseline ({1})'.format(name, '; '.join(regressions))
+        return result
+    return _benchmark
+
+
+@pytest.mark.benchmark
+def test_noop_repository(pulp_server, benchmark):
+    pulp_server.add('repositories/file/file/', {'name': 'benchmark'})
+    result = benchmark('file_repository', name='benchmark', state='present')
+    assert not result['changed']
+
+
+@pytest.mark.benchmark
+def test_list_10k(pulp_server, benchmark):
+    pulp_server.populate('repositories/file/file/', 10000)
+    result = benchmark('file_repository')
+    assert len(result['repositories']) == 10000
+
+
+@pytest.mark.benchmark
+def test_publication_find(pulp_server, benchmark):
+    # Publications cannot be searched for by their repository version, so all are read
+    pulp_server.populate('publications/file/file/', 2000, factory=lambda index: {'repository_version': 'version-{0}'.format(index)})
+    repository = pulp_server.add('repositories/file/file/', {'name': 'benchmark'})
+    pulp_server.add('publications/file/file/', {'repository_version': repository['latest_version_href']})
+    result = benchmark('file_publication', repository='benchmark', state='present')
+    assert not result['changed']
+
+
+@pytest.mark.benchmark
+def test_publication_find_10k(pulp_server, benchmark):
+    # Synthesized publications, each of a repository of its own
+    pulp_server.synthesize('publications/file/file/', 10000)
+    repository = pulp_server.add('repositories/file/file/', {'name': 'benchmark'})
+    pulp_server.add('publications/file/file/', {'repository_version': repository['latest_version_href']})
+    result = benchmark('file_publication', repository='benchmark', state='present')
+    assert not result['changed']
+
+
+@pytest.mark.benchmark
+def test_list_tasks_10k(pulp_server, benchmark):
+    pulp_server.synthesize('tasks/', 10000)
+    result = benchmark('task')
+    assert len(result['tasks']) == 10000
+
+
+@pytest.mark.benchmark
+def test_list_content_10k(pulp_server, benchmark):
+    pulp_server.synthesize('content/file/files/', 10000)
+    result = benchmark('file_content')
+    assert len(result['contents']) == 10000
+
+
+@pytest.mark.benchmark
+def test_catalog_10k(pulp_server, benchmark):
+    # All entity types are listed at once by PulpBulk, with the pages of each fetched concurrently as well
+    for path in CATALOG_PATHS:
+        pulp_server.synthesize(path, 2000)
+    pulp_server.latency = 0.005
+    result = benchmark('catalog', plugins=['file', 'python'], workers=8)
+    assert len(result['ansible_facts']['pulp_catalog']['file']['repositories']) == 2000
+    assert pulp_server.max_in_flight <= 8
+
+
+@pytest.mark.benchmark
+def test_catalog_serial_vs_concurrent(pulp_server, squeeze, record_property):
+    # Few entities on a slow server, so the time goes to waiting for the answers, which PulpBulk does in parallel
+    for path in CATALOG_PATHS:
+        pulp_server.synthesize(path, 200)
+    pulp_server.latency = 0.05
+    squeeze('status')
+    wall_times = {}
+    for workers in [1, 8]:
+        requests_before = len(pulp_server.requests)
+        measurement = measure(lambda: squeeze('catalog', plugins=['file', 'python'], workers=workers))
+        assert len(measurement['result']['ansible_facts']['pulp_catalog']['file']['repositories']) == 200
+        wall_times[workers] = measurement['wall_time']
+        record_property('wall_time_{0}_workers'.format(workers), measurement['wall_time'])
+        record_property('requests_{0}_workers'.format(workers), len(pulp_server.requests) - requests_before)
+    assert wall_times[1] > BULK_SPEEDUP * wall_times[8], wall_times
+
+
+@pytest.mark.benchmark
+def test_find_1m(pulp_server, benchmark):
+    # Listing a million entities is beyond a module run, but finding one of them must not depend on their number
+    pulp_server.synthesize('repositories/file/file/', 1000000)
+    result = benchmark('file_repository', name='repository-999999', state='present')
+    assert not result['changed']
+
+
+@pytest.mark.benchmark
+def test_orphans_estimate_100k(pulp_server, benchmark):
+    # Only the content in repositories is held while counting, the orphans are streamed
+    pulp_server.synthesize('artifacts/', 100000)
+    pulp_server.synthesize('content/file/files/', 100000)
+    repository = pulp_server.add('repositories/file/file/', {'name': 'benchmark'})
+    pulp_server.modify(repository['pulp_href'], add=[synthetic_href('content/file/files/', index) for index in range(10000)])
+    result = benchmark('delete_orphans', report=True)
+    assert result['summary']['artifacts'] == 90000
+    assert result['summary']['content'] == 90000
+
+
+@pytest.mark.benchmark
+def test_chunked_upload_1g(benchmark, tmpdir):
+    artifact_file = tmpdir.join('artifact.bin')
+    sha256 = hashlib.sha256()
+    with artifact_file.open('wb') as f:
+        for _index in range(UPLOAD_SIZE // UPLOAD_BLOCK):
+            block = os.urandom(UPLOAD_BLOCK)
+            sha256.update(block)
+            f.write(block)
+    result = benchmark('artifact', file=artifact_file.strpath, sha256=sha256.hexdigest(), state='present')
+    assert result['artifact']['size'] == UPLOAD_SIZE
+
+
+@pytest.mark.benchmark
+def test_task_wait(pulp_server, benchmark):
+    pulp_server.task_duration = 3.0
+    result = benchmark('file_distribution', name='benchmark', base_path='benchmark', state='present')
+    assert result['changed']
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from ansible.module_utils import basic
+from ansible.module_utils._text import to_bytes
+
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_helper import PulpBulk, PulpEntityAnsibleModule, PulpTask
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_file_helper import PulpFileDistribution, PulpFileRepository
+
+
+@pytest.fixture
+def module(pulp_server):
+    # A module run in this process, for using the entities directly
+    module_args = dict(pulp_url=pulp_server.url, username=pulp_server.username, password=pulp_server.password, task_poll_interval=0.01)
+    basic._ANSIBLE_ARGS = to_bytes(json.dumps({'ANSIBLE_MODULE_ARGS': module_args}))
+    try:
+        module = PulpEntityAnsibleModule()
+    finally:
+        basic._ANSIBLE_ARGS = None
+    return module.__enter__()
+
+
+def repositories(module, count, **desired_attributes):
+    return [PulpFileRepository(module, {'name': 'bulk-{0}'.format(index)}, desired_attributes) for index in range(count)]
+
+
+def test_bulk_concurrency(pulp_server, squeeze):
+    # The catalog lists all entity types at once, each fetching its pages concurrently
+    for path in ['repositories/file/file/', 'remotes/file/file/', 'distributions/file/file/', 'repositories/python/python/', 'remotes/python/python/']:
+        pulp_server.populate(path, 200)
+    pulp_server.latency = 0.01
+    result = squeeze('catalog', plugins=['file', 'python'], workers=8)
+    assert len(result['ansible_facts']['pulp_catalog']['file']['repositories']) == 200
+    assert len(result['ansible_facts']['pulp_catalog']['python']['remotes']) == 200
+    # No more requests at a time than the connections of the pool
+    assert pulp_server.max_in_flight <= 8
+
+
+def test_bulk_entities(pulp_server, module):
+    pulp_server.latency = 0.01
+    assert PulpBulk().find(repositories(module, 20)) == [None] * 20
+    created = PulpBulk().create(repositories(module, 20))
+    assert sorted(entity.name for entity in created) == sorted('bulk-{0}'.format(index) for index in range(20))
+    assert len(pulp_server.entities('repositories/file/file/')) == 20
+    assert pulp_server.request_count('POST') == 20
+    assert 1 < pulp_server.max_in_flight <= 8
+
+    entities = repositories(module, 20, description='bulk')
+    found = PulpBulk().find(entities)
+    assert [entity.pulp_href for entity in found] == [entity.pulp_href for entity in created]
+    PulpBulk().update(entities)
+    assert [entity['description'] for entity in pulp_server.entities('repositories/file/file/')] == ['bulk'] * 20
+
+    PulpBulk().delete(entities)
+    assert pulp_server.entities('repositories/file/file/') == []
+    assert module._changed
+
+
+def test_bulk_tasks(pulp_server, module):
+    # Distributions are created by tasks, waited for in the threads creating them
+    pulp_server.task_duration = 0.2
+    distributions = [PulpFileDistribution(module, {'name': 'bulk-{0}'.format(index)}, {'base_path': 'bulk-{0}'.format(index)}) for index in range(10)]
+    PulpBulk().create(distributions)
+    assert len(pulp_server.entities('distributions/file/file/')) == 10
+
+    tasks = [PulpTask(module, {'pulp_href': task['pulp_href']}) for task in pulp_server.entities('tasks/')]
+    assert [task.state for task in PulpBulk().wait_for(tasks)] == ['completed'] * 10
+    # A task not reaching the desired state fails the whole operation
+    with pytest.raises(Exception, match='Task did not reach canceled state'):
+        PulpBulk().wait_for(tasks, desired_state='canceled')
+
+
+def test_bulk_serial(pulp_server, module):
+    # A single worker runs the operations one after the other, in the calling thread
+    pulp_server.latency = 0.01
+    PulpBulk(1).create(repositories(module, 10))
+    assert pulp_server.max_in_flight == 1
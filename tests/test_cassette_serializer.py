@@ -0,0 +1,31 @@
+import cassette_serializer
+
+
+def _cassette(request_body, response_body):
+    return {
+        'version': 1,
+        'interactions': [{
+            'request': {'method': 'POST', 'uri': 'https://pulp.example.org/pulp/api/v3/uploads/', 'body': request_body, 'headers': {}},
+            'response': {'status': {'code': 200, 'message': 'OK'}, 'headers': {}, 'body': {'string': response_body}},
+        }],
+    }
+
+
+def test_round_trip():
+    for request_body, response_body in [
+        (None, '{"name": "test"}'),
+        (b'\x00\x01chunk\xff', b'{"pulp_href": "/pulp/api/v3/uploads/1/"}'),
+        ('line\x0bfeed\x1b[0m', 'bell\x07 and \x00 in text'),
+    ]:
+        cassette = _cassette(request_body, response_body)
+        loaded = cassette_serializer.deserialize(cassette_serializer.serialize(cassette))
+        assert loaded == cassette
+        interaction = loaded['interactions'][0]
+        assert type(interaction['request']['body']) is type(request_body)
+        assert type(interaction['response']['body']['string']) is type(response_body)
+
+
+def test_binary_bodies_are_base64():
+    serialized = cassette_serializer.serialize(_cassette(b'\x00\x01', 'text\x00'))
+    assert '"body":{"base64":"AAE="}' in serialized
+    assert '"string":{"base64":"dGV4dAA=","type":"str"}' in serialized
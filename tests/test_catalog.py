@@ -0,0 +1,82 @@
+REPOSITORIES = '/pulp/api/v3/repositories/file/file/'
+
+
+def _catalog(squeeze):
+    return squeeze('catalog', plugins=['file'])['ansible_facts']['pulp_catalog']
+
+
+def test_catalog_output(pulp_server, squeeze):
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    pulp_server.add('remotes/file/file/', {'name': 'test_remote', 'url': 'https://example.org/PULP_MANIFEST'})
+    pulp_server.add('publications/file/file/', {'repository_version': repository['latest_version_href']})
+    catalog = _catalog(squeeze)
+    assert sorted(catalog) == ['file']
+    assert sorted(catalog['file']) == ['distributions', 'publications', 'remotes', 'repositories']
+    assert catalog['file']['repositories']['test_repository']['pulp_href'] == repository['pulp_href']
+    assert catalog['file']['remotes']['test_remote']['url'] == 'https://example.org/PULP_MANIFEST'
+    # Publications are keyed by their repository version
+    assert list(catalog['file']['publications']) == [repository['latest_version_href']]
+    assert catalog['file']['distributions'] == {}
+
+
+def test_catalog_hit(pulp_server, squeeze):
+    pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    catalog = _catalog(squeeze)
+    requests = pulp_server.request_count()
+    lookups = pulp_server.request_count('GET', REPOSITORIES)
+    result = squeeze('file_repository', name='test_repository', state='present', catalog=catalog)
+    assert not result['changed']
+    assert result['repository']['name'] == 'test_repository'
+    assert pulp_server.request_count() == requests
+    # Entities missing in the catalog are looked up
+    assert squeeze('file_repository', name='other_repository', state='present', catalog=catalog)['changed']
+    assert pulp_server.request_count('GET', REPOSITORIES) == lookups + 1
+
+
+def test_stale_catalog_entry(pulp_server, squeeze):
+    pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    catalog = _catalog(squeeze)
+    # Changed behind the back of the catalog
+    squeeze('file_repository', name='test_repository', description='Updated', state='present')
+    patches = pulp_server.request_count('PATCH')
+    # Before changing the entity, the module refreshes it, and finds nothing to change
+    result = squeeze('file_repository', name='test_repository', description='Updated', state='present', catalog=catalog)
+    assert not result['changed']
+    assert result['repository']['description'] == 'Updated'
+    assert pulp_server.request_count('PATCH') == patches
+    # Deleted behind the back of the catalog
+    squeeze('file_repository', name='test_repository', state='absent')
+    result = squeeze('file_repository', name='test_repository', state='absent', catalog=catalog)
+    assert not result['changed']
+    assert pulp_server.request_count('DELETE') == 1
+
+
+def test_sync_after_404(pulp_server, squeeze):
+    pulp_server.add('remotes/file/file/', {'name': 'test_remote', 'url': 'https://example.org/PULP_MANIFEST'})
+    old = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    catalog = _catalog(squeeze)
+    # Recreated behind the back of the catalog
+    squeeze('file_repository', name='test_repository', state='absent')
+    new = squeeze('file_repository', name='test_repository', state='present')['repository']
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository', catalog=catalog)
+    assert result['changed']
+    assert result['repository_version'] == new['versions_href'] + '1/'
+    assert [href for href, _data in pulp_server.syncs] == [new['pulp_href']]
+    assert pulp_server.request_count('POST', old['pulp_href'] + 'sync/') == 1
+
+
+def test_publish_after_sync(pulp_server, squeeze):
+    # The catalog still holds the version before the sync
+    pulp_server.add('remotes/file/file/', {'name': 'test_remote', 'url': 'https://example.org/PULP_MANIFEST'})
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    catalog = _catalog(squeeze)
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository', catalog=catalog)
+    assert result['repository_version'] == repository['versions_href'] + '1/'
+    result = squeeze('file_publication', repository='test_repository', state='present', catalog=catalog)
+    assert result['changed']
+    assert result['publication']['repository_version'] == repository['versions_href'] + '1/'
+    # A sync creating no version reports the latest one
+    pulp_server.sync_changes = False
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository', catalog=catalog)
+    assert not result['changed']
+    assert result['repository_version'] == repository['versions_href'] + '1/'
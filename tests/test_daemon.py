@@ -0,0 +1,98 @@
+import os
+import socket
+import stat
+import time
+
+import pytest
+
+from ansible_collections.pulp.squeezer.plugins.module_utils import pulp_helper
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_daemon import PulpDaemonPoolManager
+
+DAEMON_OPTIONS = dict(persistent_connection_idle_timeout=1)
+
+
+@pytest.fixture
+def squeeze_process(squeeze):
+    # Module runs in process keep their api clients; every run gets a connection to the daemon of its own here
+    def _squeeze(module_name, **module_args):
+        try:
+            return squeeze(module_name, **module_args)
+        finally:
+            for _api_client, pool_manager in pulp_helper.API_CLIENTS.values():
+                if isinstance(pool_manager, PulpDaemonPoolManager):
+                    pool_manager.close()
+            pulp_helper.API_CLIENTS.clear()
+    return _squeeze
+
+
+def _mode(path):
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+def _wait_for_shutdown(socket_path, timeout=10):
+    deadline = time.time() + timeout
+    while os.path.exists(socket_path) and time.time() < deadline:
+        time.sleep(0.1)
+    return not os.path.exists(socket_path)
+
+
+def test_start_and_reuse(pulp_server, squeeze_process, tmpdir):
+    directory = tmpdir.join('daemon').strpath
+    socket_path = os.path.join(directory, 'squeezer.sock')
+    try:
+        first = squeeze_process('file_repository', persistent_connection_dir=directory, **DAEMON_OPTIONS)['persistent_connection']
+        assert _mode(directory) == 0o700
+        assert stat.S_ISSOCK(os.lstat(socket_path).st_mode)
+        assert _mode(socket_path) & 0o077 == 0
+        assert first['requests'] == 1
+        assert first['pool_manager_misses'] == 1
+
+        second = squeeze_process('file_repository', persistent_connection_dir=directory, **DAEMON_OPTIONS)['persistent_connection']
+        assert second['pid'] == first['pid']
+        assert second['clients'] == 2
+        assert second['requests'] == 2
+        assert second['pool_manager_hits'] == 1
+        # The connection to the server was kept open
+        assert second['connections'] == 1
+        assert second['reused'] == 1
+        assert second['connection_hit_rate'] == 0.5
+    finally:
+        # Without clients, the daemon leaves
+        assert _wait_for_shutdown(socket_path)
+
+
+def test_restart_after_stale_socket(pulp_server, squeeze_process, tmpdir):
+    directory = tmpdir.mkdir('daemon')
+    directory.chmod(0o700)
+    socket_path = directory.join('squeezer.sock').strpath
+    # Left behind by a daemon that was killed
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    try:
+        result = squeeze_process('file_repository', persistent_connection_dir=directory.strpath, **DAEMON_OPTIONS)
+        assert result['persistent_connection']['requests'] == 1
+    finally:
+        assert _wait_for_shutdown(socket_path)
+    # A new daemon is started on demand
+    try:
+        result = squeeze_process('file_repository', persistent_connection_dir=directory.strpath, **DAEMON_OPTIONS)
+        assert result['persistent_connection']['clients'] == 1
+    finally:
+        assert _wait_for_shutdown(socket_path)
+
+
+def test_refuse_foreign_socket(pulp_server, squeeze_process, tmpdir):
+    directory = tmpdir.mkdir('daemon')
+    directory.chmod(0o700)
+    socket_path = directory.join('squeezer.sock')
+    socket_path.write('')
+    result = squeeze_process('file_repository', persistent_connection_dir=directory.strpath)
+    assert result['failed']
+    assert result['msg'] == "Refusing to use {0}, which is not a socket of the user.".format(socket_path.strpath)
+    assert pulp_server.request_count() == 0
+
+    directory.chmod(0o755)
+    result = squeeze_process('file_repository', persistent_connection_dir=directory.strpath)
+    assert result['failed']
+    assert result['msg'] == "The directory {0} must be owned by the user and not be accessible by others.".format(directory.strpath)
@@ -0,0 +1,52 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+
+MODULE_NAMES = sorted(name[:-3] for name in os.listdir('plugins/modules') if name.endswith('.py') and not name.startswith('__'))
+MODULE_PREFIX = 'ansible_collections.pulp.squeezer.plugins.modules.'
+MODULE_UTILS_PREFIX = 'ansible_collections.pulp.squeezer.plugins.module_utils.'
+# Imported only when their options ask for them
+OPTIONAL_FEATURES = ['pulp_auth', 'pulp_cache', 'pulp_daemon', 'pulp_files', 'pulp_metrics', 'pulp_profile', 'pulp_ratelimit', 'pulp_trace']
+
+
+@pytest.fixture(scope='module')
+def collections_path(tmpdir_factory):
+    path = tmpdir_factory.mktemp('collections')
+    namespace = path.join('ansible_collections', 'pulp').ensure(dir=True)
+    os.symlink(os.getcwd(), namespace.join('squeezer').strpath)
+    return path.strpath
+
+
+def import_module(collections_path, name):
+    # The modules loaded by importing name in a fresh interpreter, and the cumulative import time in microseconds per package.
+    # Times are noisy, so they are only recorded; what gets imported is what is checked.
+    env = dict(os.environ, PYTHONPATH=collections_path)
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', 'import json, sys, {0}; print(json.dumps(sorted(sys.modules)))'.format(name)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+    )
+    stdout, stderr = process.communicate()
+    assert process.returncode == 0, stderr.decode('utf-8')
+    times = {}
+    for match in re.finditer(r'^import time:\s+\d+ \|\s+(\d+) \| \s*(\S+)$', stderr.decode('utf-8'), re.MULTILINE):
+        times[match.group(2)] = int(match.group(1))
+    return json.loads(stdout.decode('utf-8')), times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="-X importtime needs python 3.7")
+@pytest.mark.parametrize('module_name', MODULE_NAMES)
+def test_import_time(collections_path, module_name, record_property):
+    modules, times = import_module(collections_path, MODULE_PREFIX + module_name)
+    record_property('import_time_us', times[MODULE_PREFIX + module_name])
+    # Client packages are imported lazily, when the module actually talks to the server
+    clients = [name for name in modules if name.startswith('pulpcore.client')]
+    assert clients == []
+    features = [name for name in OPTIONAL_FEATURES if MODULE_UTILS_PREFIX + name in modules]
+    assert features == []
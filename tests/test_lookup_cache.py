@@ -0,0 +1,94 @@
+import os
+import time
+
+from ansible_collections.pulp.squeezer.plugins.module_utils import pulp_cache
+from ansible_collections.pulp.squeezer.plugins.module_utils.pulp_cache import PulpLookupCache
+
+PULP_URL = 'https://pulp.example.org'
+
+
+def test_expiry(tmpdir, monkeypatch):
+    cache = PulpLookupCache(tmpdir.strpath, PULP_URL, 'admin', ttl=60)
+    cache.set('PulpFileRepository', {'name': 'test'}, {'name': 'test'})
+    assert cache.get('PulpFileRepository', {'name': 'test'}) == {'name': 'test'}
+    now = time.time()
+    monkeypatch.setattr(pulp_cache.time, 'time', lambda: now + 61)
+    assert cache.get('PulpFileRepository', {'name': 'test'}) is None
+    # Expired entries are removed
+    assert tmpdir.listdir() == []
+
+
+def test_eviction(tmpdir):
+    cache = PulpLookupCache(tmpdir.strpath, PULP_URL, 'admin', ttl=60, size=2)
+    for index, name in enumerate(['first', 'second']):
+        cache.set('PulpFileRepository', {'name': name}, {'name': name})
+        os.utime(cache._filename('PulpFileRepository', {'name': name}), (1000 + index, 1000 + index))
+    # Using the first entry makes the second the least recently used one
+    assert cache.get('PulpFileRepository', {'name': 'first'}) == {'name': 'first'}
+    cache.set('PulpFileRepository', {'name': 'third'}, {'name': 'third'})
+    assert len(tmpdir.listdir()) == 2
+    assert cache.get('PulpFileRepository', {'name': 'second'}) is None
+    assert cache.get('PulpFileRepository', {'name': 'first'}) == {'name': 'first'}
+    assert cache.get('PulpFileRepository', {'name': 'third'}) == {'name': 'third'}
+
+
+def test_users(tmpdir):
+    PulpLookupCache(tmpdir.strpath, PULP_URL, 'admin', ttl=60).set('PulpFileRepository', {'name': 'test'}, {'name': 'test'})
+    assert PulpLookupCache(tmpdir.strpath, PULP_URL, 'admin', ttl=60).get('PulpFileRepository', {'name': 'test'}) == {'name': 'test'}
+    assert PulpLookupCache(tmpdir.strpath, PULP_URL, 'other', ttl=60).get('PulpFileRepository', {'name': 'test'}) is None
+    assert PulpLookupCache(tmpdir.strpath, 'https://other.example.org', 'admin', ttl=60).get('PulpFileRepository', {'name': 'test'}) is None
+
+
+def test_lookup(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.join('cache').strpath
+    assert squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir)['changed']
+    requests = pulp_server.request_count()
+    result = squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir)
+    assert not result['changed']
+    assert result['repository']['name'] == 'test_repository'
+    # Found in the cache, without asking the server
+    assert pulp_server.request_count() == requests
+
+    # Deleting the entity removes it from the cache
+    assert squeeze('file_repository', name='test_repository', state='absent', lookup_cache_dir=cache_dir)['changed']
+    assert os.listdir(cache_dir) == []
+    assert squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir)['changed']
+    assert pulp_server.request_count('POST', '/pulp/api/v3/repositories/file/file/') == 2
+
+
+def test_verify(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.join('cache').strpath
+    repository = squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir)['repository']
+    # Deleted behind the back of the cache
+    assert squeeze('file_repository', name='test_repository', state='absent')['changed']
+    # The cached entity is trusted...
+    assert not squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir)['changed']
+    # ...unless it is verified
+    result = squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir, lookup_cache_verify=True)
+    assert result['changed']
+    assert result['repository']['pulp_href'] != repository['pulp_href']
+    assert pulp_server.request_count('GET', repository['pulp_href']) == 1
+    # A verified entry is used
+    requests = pulp_server.request_count()
+    result = squeeze('file_repository', name='test_repository', state='present', lookup_cache_dir=cache_dir, lookup_cache_verify=True)
+    assert not result['changed']
+    assert pulp_server.request_count() == requests + 1
+    assert pulp_server.request_count('GET', result['repository']['pulp_href']) == 1
+
+
+def test_sync(pulp_server, squeeze, tmpdir):
+    pulp_server.add('remotes/file/file/', {'name': 'test_remote', 'url': 'https://example.org/PULP_MANIFEST'})
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    squeeze('file_repository', name='test_repository', lookup_cache_dir=tmpdir.strpath)
+    cache = PulpLookupCache(tmpdir.strpath, pulp_server.url, pulp_server.username, ttl=3600)
+    assert cache.get('PulpFileRepository', {'name': 'test_repository'})['latest_version_href'] == repository['versions_href'] + '0/'
+    # The sync updates the cached repository
+    squeeze('file_sync', remote='test_remote', repository='test_repository', lookup_cache_dir=tmpdir.strpath)
+    assert cache.get('PulpFileRepository', {'name': 'test_repository'})['latest_version_href'] == repository['versions_href'] + '1/'
+    result = squeeze('file_publication', repository='test_repository', state='present', lookup_cache_dir=tmpdir.strpath)
+    assert result['publication']['repository_version'] == repository['versions_href'] + '1/'
+    # A version made elsewhere is not missed either
+    pulp_server.modify(repository['pulp_href'])
+    result = squeeze('file_publication', repository='test_repository', state='present', lookup_cache_dir=tmpdir.strpath)
+    assert result['changed']
+    assert result['publication']['repository_version'] == repository['versions_href'] + '2/'
@@ -0,0 +1,49 @@
+# The module calls of the playbooks, replayed in this process against their cassettes.
+# Without ansible-playbook, a worker process and a python interpreter per call, this is the quick tier of the tests;
+# the playbooks remain the end to end tests. The calls are stored by `pytest --update-invocations`.
+
+import json
+import os
+
+import pytest
+
+from ansible_collections.pulp.squeezer.plugins.module_utils import pulp_helper
+from ansible_collections.pulp.squeezer.plugins.plugin_utils.pulp_action import run_module
+from vcr_python_wrapper import TESTS_DIR, budget_path, check_budget, invocations_path, use_cassette
+
+
+CONNECTION = {'pulp_url': 'https://pulp.example.org', 'username': 'admin', 'password': 'password'}
+
+
+def collect_invocations():
+    params = []
+    for file_name in sorted(os.listdir(os.path.join(TESTS_DIR, 'invocations'))):
+        test_name = file_name[:-len('.json')]
+        with open(invocations_path(test_name)) as invocations_file:
+            invocations = json.load(invocations_file)
+        for mode, calls in sorted(invocations.items()):
+            for serial, invocation in sorted(calls.items(), key=lambda item: int(item[0])):
+                params.append(pytest.param(
+                    test_name, int(serial), invocation.get('check_mode', mode == 'check_mode'), invocation,
+                    id='{0}-{1}-{2}-{3}'.format(test_name, mode, serial, invocation['module']),
+                ))
+    return params
+
+
+@pytest.mark.parametrize('test_name,serial,check_mode,invocation', collect_invocations())
+def test_module(monkeypatch, test_name, serial, check_mode, invocation):
+    # Relative paths in the arguments are meant from the playbooks
+    monkeypatch.chdir(os.path.join(TESTS_DIR, 'playbooks'))
+    module_args = dict(invocation['args'], task_poll_interval=0, **CONNECTION)
+    if check_mode:
+        module_args['_ansible_check_mode'] = True
+    # Pooled connections of a previous call would still play back the cassette they were opened with
+    pulp_helper.API_CLIENTS.clear()
+    with use_cassette(test_name, serial, 'none', check_mode) as cassette:
+        result = run_module(invocation['module'], module_args)
+        requests = cassette.play_count
+    assert result['stderr'] == ''
+    data = json.loads(result['stdout'])
+    assert data.get('failed', False) == invocation['failed'], data.get('msg')
+    assert data.get('changed', False) == invocation['changed']
+    assert check_budget(budget_path(test_name), invocation['module'], requests, False) is None
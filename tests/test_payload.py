@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+from payload_size import build_payload
+
+from ansible_collections.pulp.squeezer.plugins.plugin_utils.pulp_action import feature_sources, features
+
+COLLECTION_DIR = os.path.join(os.getcwd(), 'build', 'collections', 'ansible_collections', 'pulp', 'squeezer')
+MODULE_UTILS = 'ansible_collections/pulp/squeezer/plugins/module_utils/'
+FEATURES = ['pulp_auth', 'pulp_cache', 'pulp_daemon', 'pulp_files', 'pulp_metrics', 'pulp_profile', 'pulp_ratelimit', 'pulp_trace']
+
+
+def run_payload(module_name, module_args, tmpdir):
+    # Run the module from its payload, like on a target without the collection
+    b_module_data, _payload_zip = build_payload(COLLECTION_DIR, 'pulp.squeezer.' + module_name, module_name, module_args)
+    payload_file = tmpdir.join(module_name + '.py')
+    payload_file.write_binary(b_module_data)
+    env = dict((key, value) for key, value in os.environ.items() if key != 'PYTHONPATH')
+    process = subprocess.Popen([sys.executable, payload_file.strpath], stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=tmpdir.strpath, env=env)
+    stdout, stderr = process.communicate()
+    assert stdout, stderr.decode('utf-8')
+    return json.loads(stdout.decode('utf-8'))
+
+
+def test_payload_leaves_out_features():
+    _b_module_data, payload_zip = build_payload(COLLECTION_DIR, 'pulp.squeezer.file_repository', 'file_repository')
+    shipped = [name for name in FEATURES if MODULE_UTILS + name + '.py' in payload_zip.namelist()]
+    assert shipped == []
+
+
+def test_features():
+    assert features({}, {}) == []
+    assert features({'auth_method': 'basic', 'metrics': False}, {}) == []
+    assert features({'auth_method': 'session', 'rate_limit': 5, 'metrics': 'yes'}, {}) == ['pulp_files', 'pulp_auth', 'pulp_ratelimit', 'pulp_metrics']
+    # Options not set fall back to the environment, like in the module
+    assert features({}, {'SQUEEZER_TRACE_FILE': '/tmp/trace', 'SQUEEZER_PROFILE': 'cpu'}) == ['pulp_trace', 'pulp_profile']
+    assert features({'persistent_connection_dir': '/tmp/daemon'}, {'SQUEEZER_LOOKUP_CACHE_DIR': '/tmp/cache'}) == ['pulp_cache', 'pulp_files', 'pulp_daemon']
+
+
+def test_features_sent_along(pulp_server, tmpdir):
+    pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    trace_file = tmpdir.join('trace.json')
+    module_args = dict(
+        pulp_url=pulp_server.url,
+        username=pulp_server.username,
+        password=pulp_server.password,
+        name='test_repository',
+        auth_method='session',
+        metrics=True,
+        trace_file=trace_file.strpath,
+    )
+    module_args['feature_sources'] = feature_sources(features(module_args, {}))
+    result = run_payload('file_repository', module_args, tmpdir)
+    assert not result.get('failed'), result.get('msg')
+    assert result['repository']['name'] == 'test_repository'
+    assert result['metrics']['requests'] > 0
+    assert len(trace_file.readlines()) == 1
+    assert pulp_server.request_count('POST', '/auth/login/') == 1
+    # The sources are not returned with the invocation
+    assert 'feature_sources' not in result['invocation']['module_args']
+
+
+def test_features_not_sent(pulp_server, tmpdir):
+    module_args = dict(pulp_url=pulp_server.url, username=pulp_server.username, password=pulp_server.password, trace_file=tmpdir.join('trace.json').strpath)
+    result = run_payload('file_repository', module_args, tmpdir)
+    assert result['failed']
+    assert 'The module_utils pulp_trace were not sent along with the module.' in result['msg']
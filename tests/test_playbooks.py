@@ -1,9 +1,12 @@
 import pytest
+import fcntl
 import os
 import sys
 import json
 import ansible_runner
 
+from vcr_python_wrapper import invocations_path
+
 
 TEST_NAMES = [name[:-5] for name in os.listdir('tests/playbooks') if name.endswith('.yaml')]
 
@@ -17,7 +20,7 @@ if sys.version_info[0] == 2:
             os.environ.pop(envvar)
 
 
-def run_playbook_vcr(tmpdir, test_name, extra_vars=None, record=False, check_mode=False):
+def run_playbook_vcr(tmpdir, test_name, extra_vars=None, record=False, check_mode=False, update_budgets=False, update_invocations=False):
     playbook = test_name + '.yaml'
     if extra_vars is None:
         extra_vars = {}
@@ -33,11 +36,41 @@ def run_playbook_vcr(tmpdir, test_name, extra_vars=None, record=False, check_mod
         limit = 'tests'
 
     # Dump recording parameters to json-file and pass its name by environment
-    test_params = {'test_name': test_name, 'serial': 0, 'record_mode': record_mode}
+    test_params = {
+        'test_name': test_name,
+        'serial': 0,
+        'record_mode': record_mode,
+        'check_mode': check_mode,
+        'update_budgets': update_budgets,
+    }
+    if update_invocations:
+        test_params['invocations_file'] = tmpdir.join('invocations_{}.json'.format(test_name)).strpath
     params_file = tmpdir.join('test_params_{}.json'.format(test_name))
     params_file.write(json.dumps(test_params))
     os.environ['PAM_TEST_VCR_PARAMS_FILE'] = params_file.strpath
-    return run_playbook(playbook, extra_vars=extra_vars, limit=limit, check_mode=check_mode)
+    run = run_playbook(playbook, extra_vars=extra_vars, limit=limit, check_mode=check_mode)
+    if update_invocations and run.rc == 0:
+        store_invocations(test_name, 'check_mode' if check_mode else 'run', test_params['invocations_file'])
+    return run
+
+
+# Only the module calls of a successful run are kept for test_modules.py
+def store_invocations(test_name, mode, invocations_file):
+    calls = {}
+    if os.path.exists(invocations_file):
+        with open(invocations_file) as f:
+            calls = json.load(f)
+    with open(invocations_path(test_name), 'a+') as f:
+        # The check mode test of the playbook may run at the same time
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        invocations = json.loads(content) if content else {}
+        invocations[mode] = calls
+        f.seek(0)
+        f.truncate()
+        json.dump(invocations, f, indent=2, sort_keys=True)
+        f.write('\n')
 
 
 def run_playbook(playbook, extra_vars=None, limit=None, check_mode=False):
@@ -57,14 +90,15 @@ def run_playbook(playbook, extra_vars=None, limit=None, check_mode=False):
 
 
 @pytest.mark.parametrize('test_name', TEST_NAMES)
-def test_playbook(tmpdir, test_name, record):
-    run = run_playbook_vcr(tmpdir, test_name, record=record)
+def test_playbook(tmpdir, test_name, record, update_budgets, update_invocations):
+    run = run_playbook_vcr(tmpdir, test_name, record=record, update_budgets=update_budgets, update_invocations=update_invocations)
     assert run.rc == 0
 
 
 @pytest.mark.parametrize('test_name', TEST_NAMES)
-def test_check_mode(tmpdir, test_name):
+def test_check_mode(tmpdir, test_name, record, update_budgets, update_invocations):
     # if test_name == 'not_working_one':
     #     pytest.skip("TODO: Fix check_mode test for not_working_one.")
-    run = run_playbook_vcr(tmpdir, test_name, check_mode=True)
+    # Recording in check mode needs the fixtures of the playbook to be set up for real (`check_mode: false` on its first play)
+    run = run_playbook_vcr(tmpdir, test_name, record=record, check_mode=True, update_budgets=update_budgets, update_invocations=update_invocations)
     assert run.rc == 0
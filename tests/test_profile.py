@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+
+@pytest.mark.skipif(sys.version_info < (3, 4), reason="tracemalloc needs python 3.4")
+def test_profile(pulp_server, squeeze, tmpdir):
+    import tracemalloc
+
+    profile_dir = tmpdir.join('profiles')
+    result = squeeze('file_repository', profile=['cpu', 'memory'], profile_dir=profile_dir.strpath)
+    assert result['profile']['cpu']['calls'] > 0
+    assert result['profile']['memory']['peak'] >= result['profile']['memory']['current']
+    assert sorted(os.path.basename(result['profile'][kind]['file']).rsplit('.', 1)[1] for kind in ['cpu', 'memory']) == ['prof', 'tracemalloc']
+    assert len(profile_dir.listdir()) == 2
+    assert not tracemalloc.is_tracing()
+
+    # Tracing started before the module keeps running
+    tracemalloc.start()
+    try:
+        tmpdir.join('blocked').write('')
+        result = squeeze('file_repository', profile=['memory'], profile_dir=tmpdir.join('blocked', 'profiles').strpath)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert 'file' not in result['profile']['memory']
+    assert any(warning.startswith('Could not write the profile to') for warning in result['warnings'])
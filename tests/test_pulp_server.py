@@ -0,0 +1,195 @@
+import hashlib
+import os
+
+import pulp_server as pulp_server_module
+from pulp_server import synthetic_href
+
+
+def test_repository_lifecycle(pulp_server, squeeze):
+    result = squeeze('file_repository', name='test_repository', state='present')
+    assert result['changed']
+    assert pulp_server.entities('repositories/file/file/')[0]['name'] == 'test_repository'
+    result = squeeze('file_repository', name='test_repository', state='present')
+    assert not result['changed']
+    result = squeeze('file_repository', name='test_repository', description='Updated', state='present')
+    assert result['changed']
+    assert result['repository']['description'] == 'Updated'
+    result = squeeze('file_repository', name='test_repository', state='absent')
+    assert result['changed']
+    assert pulp_server.entities('repositories/file/file/') == []
+
+
+def test_list_pages(pulp_server, squeeze):
+    pulp_server.populate('repositories/file/file/', 1000)
+    result = squeeze('file_repository')
+    assert len(result['repositories']) == 1000
+    assert pulp_server.request_count('GET', '/pulp/api/v3/repositories/file/file/') == 50
+
+
+def test_chunked_upload(pulp_server, squeeze, tmpdir):
+    data = os.urandom(1200 * 1024)
+    artifact_file = tmpdir.join('artifact.bin')
+    artifact_file.write_binary(data)
+    sha256 = hashlib.sha256(data).hexdigest()
+    result = squeeze('artifact', file=artifact_file.strpath, sha256=sha256, state='present')
+    assert result['changed']
+    assert result['artifact']['sha256'] == sha256
+    assert pulp_server.request_count('PUT', '/pulp/api/v3/uploads/') == 3
+
+
+def test_task_wait(pulp_server, squeeze):
+    pulp_server.task_duration = 1.0
+    result = squeeze('file_distribution', name='test_distribution', base_path='test_path', state='present', metrics=True)
+    assert result['changed']
+    assert result['metrics']['task_wait']['polls'] == 2
+
+
+def test_retry_after_errors(pulp_server, squeeze):
+    pulp_server.inject_error(503, count=2, method='GET', retry_after=0)
+    result = squeeze('status')
+    assert result['retries'] == 2
+    assert result['status']['database_connection']['connected']
+
+    pulp_server.inject_error(502, count=3, method='GET')
+    result = squeeze('status', request_retry_backoff=0.01, metrics=True)
+    assert result['retries'] == 3
+    assert result['metrics']['statuses'] == {'502': 3, '200': 1}
+
+    pulp_server.inject_error(503, method='POST')
+    result = squeeze('file_repository', name='test_repository', state='present')
+    assert result['failed']
+    assert 'retries' not in result
+
+
+def test_synthetic_entities(pulp_server, squeeze):
+    # The generated entities must be understood by the clients
+    for path in ['tasks/', 'artifacts/', 'content/file/files/', 'publications/file/file/', 'remotes/file/file/', 'distributions/file/file/']:
+        pulp_server.synthesize(path, 50)
+    assert len(squeeze('task')['tasks']) == 50
+    assert len(squeeze('artifact')['artifacts']) == 50
+    assert len(squeeze('file_content')['contents']) == 50
+    assert len(squeeze('file_publication')['publications']) == 50
+    assert len(squeeze('file_remote')['remotes']) == 50
+    assert len(squeeze('file_distribution')['distributions']) == 50
+
+
+def test_find_among_1m(pulp_server, squeeze):
+    pulp_server.synthesize('repositories/file/file/', 1000000)
+    result = squeeze('file_repository', name='repository-765432', state='present')
+    assert not result['changed']
+    assert result['repository']['pulp_href'] == synthetic_href('repositories/file/file/', 765432)
+    assert pulp_server.request_count() == 1
+    result = squeeze('file_repository', name='repository-5', description='Updated', state='present')
+    assert result['changed']
+    result = squeeze('file_repository', name='repository-5', state='present')
+    assert result['repository']['description'] == 'Updated'
+    result = squeeze('file_repository', name='test_repository', state='present')
+    assert result['changed']
+
+
+def test_orphans_estimate(pulp_server, squeeze):
+    pulp_server.synthesize('artifacts/', 3000)
+    pulp_server.synthesize('content/file/files/', 2500)
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    content = [synthetic_href('content/file/files/', index) for index in range(2500)]
+    pulp_server.modify(repository['pulp_href'], add=content[:1500])
+    # Content removed from the latest version is still held by the one before
+    pulp_server.modify(repository['pulp_href'], add=content[1500:2000], remove=content[1000:1500])
+    size = sum(len('artifact-{0}'.format(index)) for index in range(2000, 3000))
+
+    result = squeeze('delete_orphans', _ansible_check_mode=True)
+    assert result['changed']
+    assert result['summary'] == {'artifacts': 1000, 'content': 500, 'artifacts_size': size}
+    result = squeeze('delete_orphans', report=True, workers=1)
+    assert not result['changed']
+    assert result['summary'] == {'artifacts': 1000, 'content': 500, 'artifacts_size': size}
+    assert len(pulp_server.entities('artifacts/')) == 3000
+
+    result = squeeze('delete_orphans')
+    assert result['summary'] == {'artifacts': 1000, 'content': 500}
+    result = squeeze('delete_orphans', _ansible_check_mode=True)
+    assert not result['changed']
+    assert result['summary'] == {'artifacts': 0, 'content': 0, 'artifacts_size': 0}
+
+
+def test_orphans_estimate_other_holders(pulp_server, squeeze, monkeypatch):
+    # Artifacts of no known content may be the metadata of publications, or belong to content of other plugins
+    pulp_server.synthesize('artifacts/', 30)
+    pulp_server.synthesize('content/file/files/', 20)
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    pulp_server.modify(repository['pulp_href'], add=[synthetic_href('content/file/files/', index) for index in range(10)])
+    size = sum(len('artifact-{0}'.format(index)) for index in range(10, 20))
+
+    pulp_server.add('publications/file/file/', {'repository_version': repository['latest_version_href']})
+    result = squeeze('delete_orphans', report=True)
+    assert result['summary'] == {'artifacts': 10, 'content': 10, 'artifacts_size': size}
+    assert result['warnings'] == [
+        "10 artifact(s) belong to no content of the types file.file, ansible.role, ansible.collection_version, python.python. "
+        "They may be held by publications, and are not counted as orphans."
+    ]
+
+    squeeze('file_publication', repository='test_repository', state='absent')
+    assert pulp_server.entities('publications/file/file/') == []
+    status = dict(pulp_server_module.STATUS, versions=pulp_server_module.STATUS['versions'] + [{'component': 'rpm', 'version': '3.0.0'}])
+    monkeypatch.setattr(pulp_server_module, 'STATUS', status)
+    result = squeeze('delete_orphans', report=True)
+    assert result['summary'] == {'artifacts': 10, 'content': 10, 'artifacts_size': size}
+    assert result['warnings'][0].endswith("They may be held by the content of rpm, and are not counted as orphans.")
+
+
+def test_orphans_in_batches(pulp_server, squeeze):
+    pulp_server.synthesize('artifacts/', 30)
+    pulp_server.synthesize('content/file/files/', 30)
+    pulp_server.synthesize('content/python/packages/', 5)
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    pulp_server.modify(repository['pulp_href'], add=[synthetic_href('content/file/files/', index) for index in range(10)])
+    # Orphans of just now are spared
+    pulp_server.add('content/file/files/', {'relative_path': 'recent', 'artifact': None})
+    args = dict(content_types=['file.file'], older_than=60, batch_size=8, batch_pause=0)
+
+    result = squeeze('delete_orphans', _ansible_check_mode=True, **args)
+    assert result['changed']
+    assert result['batches'] == [{'content_type': 'file.file', 'content': count} for count in [8, 8, 4]]
+    assert pulp_server.request_count('POST') == 0
+
+    result = squeeze('delete_orphans', **args)
+    assert result['changed']
+    assert result['batches'] == [{'content_type': 'file.file', 'content': count, 'artifacts': count} for count in [8, 8, 4]]
+    assert result['summary'] == {'content': 20, 'artifacts': 20}
+    assert pulp_server.request_count('POST', '/pulp/api/v3/orphans/cleanup/') == 3
+    assert len(pulp_server.entities('content/file/files/')) == 11
+    assert len(pulp_server.entities('content/python/packages/')) == 5
+    assert len(pulp_server.entities('artifacts/')) == 10
+
+    result = squeeze('delete_orphans', **args)
+    assert not result['changed']
+    assert result['batches'] == []
+
+
+def test_authentication(pulp_server, squeeze):
+    pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    assert not squeeze('file_repository', name='test_repository', state='present')['changed']
+    result = squeeze('file_repository', name='test_repository', state='present', password='wrong')
+    assert result['failed']
+    assert '401' in result['msg']
+    result = squeeze('file_repository', name='test_repository', state='present', auth_method='session')
+    assert not result['changed']
+    assert pulp_server.request_count('POST', '/auth/login/') == 1
+
+
+def test_orphans_in_batches_unsupported(pulp_server, squeeze):
+    # Servers before pulpcore 3.14 have no targeted cleanup
+    pulp_server.synthesize('content/file/files/', 3)
+    pulp_server.inject_error(404, method='POST', path='/pulp/api/v3/orphans/cleanup/')
+    result = squeeze('delete_orphans', batch_size=2)
+    assert result['failed']
+    assert result['msg'] == "Deleting orphans in batches needs pulpcore 3.14 or later on the server."
+
+
+def test_several_client_packages(pulp_server, squeeze):
+    # The client packages name their auth settings differently
+    pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    pulp_server.add('remotes/python/python/', {'name': 'test_remote', 'url': 'https://pypi.org/'})
+    result = squeeze('catalog', plugins=['file', 'python'])
+    assert list(result['ansible_facts']['pulp_catalog']['file']['repositories']) == ['test_repository']
+    assert list(result['ansible_facts']['pulp_catalog']['python']['remotes']) == ['test_remote']
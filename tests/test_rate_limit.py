@@ -0,0 +1,45 @@
+import errno
+import hashlib
+import os
+import stat
+
+
+def _mode(path):
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+def _lock_file(directory, pulp_url):
+    return os.path.join(directory, 'squeezer-rate-limit-' + hashlib.sha256(pulp_url.encode('utf-8')).hexdigest()[:16])
+
+
+def test_private_files(pulp_server, squeeze, tmpdir, monkeypatch):
+    # By default the files live in the home of the user
+    monkeypatch.setenv('HOME', tmpdir.strpath)
+    result = squeeze('status', rate_limit=100, max_concurrent_requests=2)
+    assert not result.get('failed')
+    directory = tmpdir.join('.ansible', 'tmp', 'squeezer-rate-limit').strpath
+    assert _mode(directory) == 0o700
+    lock_file = _lock_file(directory, pulp_server.url)
+    assert _mode(lock_file) == 0o600
+    assert _mode(lock_file + '.slot0') == 0o600
+
+
+def test_links_are_not_followed(pulp_server, squeeze, tmpdir):
+    directory = tmpdir.mkdir('rate-limit')
+    directory.chmod(0o700)
+    target = tmpdir.join('target')
+    target.write('keep')
+    os.symlink(target.strpath, _lock_file(directory.strpath, pulp_server.url))
+    result = squeeze('status', rate_limit=100, rate_limit_dir=directory.strpath)
+    assert result['failed']
+    assert os.strerror(errno.ELOOP) in result['msg']
+    assert target.read() == 'keep'
+
+
+def test_shared_directory(pulp_server, squeeze, tmpdir):
+    directory = tmpdir.mkdir('rate-limit')
+    directory.chmod(0o1777)
+    result = squeeze('status', rate_limit=100, rate_limit_dir=directory.strpath)
+    assert result['failed']
+    assert result['msg'] == "The directory {0} must be owned by the user and not be accessible by others.".format(directory.strpath)
+    assert directory.listdir() == []
@@ -0,0 +1,9 @@
+def test_retries_of_concurrent_requests(pulp_server, squeeze):
+    # The pages are fetched by the threads of PulpBulk, all of them counting their retries
+    for path in ['repositories/file/file/', 'remotes/file/file/', 'distributions/file/file/']:
+        pulp_server.populate(path, 200)
+    pulp_server.inject_error(502, count=40, method='GET')
+    result = squeeze('catalog', plugins=['file'], workers=8, request_retries=20, request_retry_backoff=0.001, metrics=True)
+    assert len(result['ansible_facts']['pulp_catalog']['file']['repositories']) == 200
+    assert result['retries'] == 40
+    assert result['metrics']['statuses']['502'] == 40
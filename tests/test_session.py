@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import stat
+
+LOGIN = '/auth/login/'
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_login_and_reuse(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.join('sessions').strpath
+    result = squeeze('file_repository', name='test_repository', state='present', auth_method='session', session_cache_dir=cache_dir)
+    assert result['changed']
+    assert pulp_server.request_count('POST', LOGIN) == 1
+    assert _mode(cache_dir) == 0o700
+    session_files = [name for name in os.listdir(cache_dir) if name.endswith('.json')]
+    assert len(session_files) == 1
+    session_file = os.path.join(cache_dir, session_files[0])
+    assert _mode(session_file) == 0o600
+    assert _mode(os.path.join(cache_dir, 'secret')) == 0o600
+    with open(session_file) as f:
+        content = f.read()
+    assert pulp_server.password not in content
+    # Neither is the password part of the name
+    unsalted = hashlib.sha256(json.dumps([pulp_server.url, pulp_server.username, pulp_server.password]).encode('utf-8')).hexdigest()
+    assert session_files != [unsalted + '.json']
+    assert 'sessionid' in json.loads(content)['cookies']
+
+    result = squeeze('file_repository', name='test_repository', state='absent', auth_method='session', session_cache_dir=cache_dir)
+    assert result['changed']
+    assert pulp_server.request_count('GET', LOGIN) == 1
+    assert pulp_server.request_count('POST', LOGIN) == 1
+
+    # The cached session is not handed out for other credentials
+    result = squeeze('file_repository', auth_method='session', session_cache_dir=cache_dir, password='wrong')
+    assert result['failed']
+    assert result['msg'] == "Failed to log in to {0} as {1}.".format(pulp_server.url, pulp_server.username)
+    assert not squeeze('file_repository', auth_method='session', session_cache_dir=cache_dir).get('failed')
+    assert pulp_server.request_count('POST', LOGIN) == 2
+
+
+def test_expiry(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.join('sessions')
+    assert not squeeze('file_repository', auth_method='session', session_cache_dir=cache_dir.strpath).get('failed')
+    session_file = [path for path in cache_dir.listdir() if path.ext == '.json'][0]
+    record = json.loads(session_file.read())
+    record['expires'] = 0
+    session_file.write(json.dumps(record))
+    # The cookie expired, so the module logs in again instead of trying it
+    assert not squeeze('file_repository', auth_method='session', session_cache_dir=cache_dir.strpath).get('failed')
+    assert pulp_server.request_count('POST', LOGIN) == 2
+    assert pulp_server.request_count('GET', '/pulp/api/v3/') == 2
+
+
+def test_login_after_401(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.join('sessions').strpath
+    assert squeeze('file_repository', name='test_repository', state='present', auth_method='session', session_cache_dir=cache_dir)['changed']
+    # The sessions end on the server before their cookies expire
+    pulp_server.expire_sessions()
+    result = squeeze('file_repository', name='test_repository', description='Updated', state='present', auth_method='session', session_cache_dir=cache_dir)
+    assert result['changed']
+    assert result['repository']['description'] == 'Updated'
+    assert pulp_server.request_count('POST', LOGIN) == 2
+    # The new session is cached
+    result = squeeze('file_repository', name='test_repository', description='Updated', state='present', auth_method='session', session_cache_dir=cache_dir)
+    assert not result['changed']
+    assert pulp_server.request_count('POST', LOGIN) == 2
+
+
+def test_foreign_cache_dir(pulp_server, squeeze, tmpdir):
+    cache_dir = tmpdir.mkdir('sessions')
+    cache_dir.chmod(0o755)
+    result = squeeze('file_repository', auth_method='session', session_cache_dir=cache_dir.strpath)
+    assert result['failed']
+    assert result['msg'] == "The directory {0} must be owned by the user and not be accessible by others.".format(cache_dir.strpath)
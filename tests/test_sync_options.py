@@ -0,0 +1,38 @@
+def test_sync_options(pulp_server, squeeze):
+    remote = pulp_server.add('remotes/file/file/', {'name': 'test_remote', 'url': 'https://example.org/PULP_MANIFEST'})
+    repository = pulp_server.add('repositories/file/file/', {'name': 'test_repository'})
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository')
+    assert result['changed']
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository', mirror=True)
+    assert result['changed']
+    assert pulp_server.syncs == [
+        (repository['pulp_href'], {'remote': remote['pulp_href']}),
+        (repository['pulp_href'], {'remote': remote['pulp_href'], 'mirror': True}),
+    ]
+    # Options the installed clients do not know are rejected before anything is sent
+    result = squeeze('file_sync', remote='test_remote', repository='test_repository', optimize=True)
+    assert result['failed']
+    assert result['msg'] == "The installed client does not support the option(s): optimize."
+    result = squeeze('file_remote', name='test_remote', rate_limit=10, state='present')
+    assert result['failed']
+    assert result['msg'] == "The installed client does not support the option(s): rate_limit."
+    assert len(pulp_server.syncs) == 2
+    assert pulp_server.request_count('PATCH') == 0
+    # Deleting a remote does not depend on the options the client knows
+    result = squeeze('file_remote', name='test_remote', rate_limit=10, state='absent')
+    assert result['changed']
+    assert pulp_server.entities('remotes/file/file/') == []
+
+
+def test_distribution_serves_repository_or_version(pulp_server, squeeze):
+    repository = pulp_server.add('repositories/ansible/ansible/', {'name': 'test_repository'})
+    pulp_server.add('distributions/ansible/ansible/', {
+        'name': 'test_distribution', 'base_path': 'test', 'repository_version': repository['latest_version_href'],
+    })
+    # The repository version is cleared along with setting the repository; check mode shows what would be sent
+    result = squeeze(
+        'ansible_distribution', name='test_distribution', base_path='test', repository='test_repository', state='present', _ansible_check_mode=True,
+    )
+    assert result['changed']
+    assert result['distribution']['repository'] == repository['pulp_href']
+    assert result['distribution']['repository_version'] is None
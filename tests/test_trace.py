@@ -0,0 +1,30 @@
+import json
+
+
+def test_trace(pulp_server, squeeze, tmpdir):
+    trace_file = tmpdir.join('traces', 'trace.json')
+    result = squeeze('file_repository', name='test_repository', state='present', trace_file=trace_file.strpath)
+    assert result['changed']
+    squeeze('file_repository', name='test_repository', state='absent', trace_file=trace_file.strpath)
+    traces = [json.loads(line) for line in trace_file.readlines()]
+    assert len(traces) == 2
+    spans = traces[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+    root = spans[0]
+    assert root['name'].startswith('module ')
+    assert 'parentSpanId' not in root
+    assert all(span['traceId'] == root['traceId'] for span in spans)
+    assert {'key': 'ansible.changed', 'value': {'boolValue': True}} in root['attributes']
+    requests = [span for span in spans if span['name'].startswith('HTTP ')]
+    assert [span['name'] for span in requests] == ['HTTP GET', 'HTTP POST']
+    assert {'key': 'http.status_code', 'value': {'intValue': '201'}} in requests[1]['attributes']
+    # Every request of both runs is traced
+    assert len([
+        span for trace in traces for span in trace['resourceSpans'][0]['scopeSpans'][0]['spans'] if span['name'].startswith('HTTP ')
+    ]) == pulp_server.request_count()
+
+    # A trace that cannot be written does not fail the module
+    tmpdir.join('blocked').write('')
+    result = squeeze('file_repository', name='test_repository', trace_file=tmpdir.join('blocked', 'trace.json').strpath)
+    assert not result.get('failed')
+    assert result['repository'] is None
+    assert any(warning.startswith('Could not write the trace to') for warning in result['warnings'])
@@ -1,39 +1,123 @@
 #!/usr/bin/env python
 
+import fcntl
+import hashlib
 import os
 import sys
 import vcr
+import vcr.cassette
+import vcr.errors
+import vcr.matchers
 import json
 import re
+import yaml
+import weakref
+
+import cassette_serializer
 
 try:
     from urlparse import urlparse, urlunparse
+    from StringIO import StringIO
 except ImportError:
     from urllib.parse import urlparse, urlunparse
+    from io import StringIO
 
 
 # We need our own json level2 matcher, because, python2 and python3 do not save
 # dictionaries in the same order.
 # Also multipart bounderies must be ignored.
+# The normalized body is hashed only once per request, and the recorded interactions
+# are looked up by it (see IndexedCassette).
+BODY_FINGERPRINTS = weakref.WeakKeyDictionary()
+
+
+def body_fingerprint(request):
+    fingerprint = BODY_FINGERPRINTS.get(request)
+    if fingerprint is None:
+        content_type = request.headers.get('content-type') or ''
+        if request.body is None:
+            fingerprint = (None, None)
+        elif content_type == 'application/json':
+            body = json.loads(request.body.decode('utf8'))
+            if 'search' in body:
+                body['search'] = ','.join(sorted(re.findall(r'([^=,]*="(?:[^"]|\\")*")', body['search'])))
+            fingerprint = ('json', hashlib.sha256(json.dumps(body, sort_keys=True).encode('utf8')).digest())
+        elif content_type.startswith('multipart/form-data'):
+            boundary = re.findall(r'boundary=(\S.*)', content_type)[0].encode()
+            fingerprint = ('multipart', hashlib.sha256(request.body.replace(boundary, b'TILT')).digest())
+        else:
+            # Compared as they are
+            fingerprint = ('raw', None)
+        BODY_FINGERPRINTS[request] = fingerprint
+    return fingerprint
+
+
 def amp_body_matcher(r1, r2):
-    if r1.headers.get('content-type') == 'application/json' and r2.headers.get('content-type') == 'application/json':
-        if r1.body is None or r2.body is None:
-            return r1.body == r2.body
-        body1 = json.loads(r1.body.decode('utf8'))
-        body2 = json.loads(r2.body.decode('utf8'))
-        if 'search' in body1:
-            body1['search'] = ','.join(sorted(re.findall(r'([^=,]*="(?:[^"]|\\")*")', body1['search'])))
-        if 'search' in body2:
-            body2['search'] = ','.join(sorted(re.findall(r'([^=,]*="(?:[^"]|\\")*")', body2['search'])))
-        return body1 == body2
-    elif r1.headers.get('content-type').startswith('multipart/form-data') and r2.headers.get('content-type').startswith('multipart/form-data'):
-        if r1.body is None or r2.body is None:
-            return r1.body == r2.body
-        boundary1 = re.findall(r'boundary=(\S.*)', r1.headers['content-type'])[0].encode()
-        boundary2 = re.findall(r'boundary=(\S.*)', r2.headers['content-type'])[0].encode()
-        return r1.body.replace(boundary1, b'TILT') == r2.body.replace(boundary2, b'TILT')
-    else:
-        return r1.body == r2.body
+    kind1, digest1 = body_fingerprint(r1)
+    kind2, digest2 = body_fingerprint(r2)
+    if kind1 == kind2 and kind1 != 'raw':
+        return digest1 == digest2
+    return r1.body == r2.body
+
+
+def request_key(request):
+    # What the matchers compare (method, path, query and amp_body), as a dictionary key
+    kind, digest = body_fingerprint(request)
+    return (request.method, request.path, tuple(request.query), kind, request.body if kind == 'raw' else digest)
+
+
+class IndexedCassette(vcr.cassette.Cassette):
+    # vcr matches a live request against every recorded one; this cassette indexes the
+    # recorded interactions by request_key as they are loaded (or recorded) instead.
+    # Only the public api of the cassette (data, play_counts, filter_request) is relied on,
+    # the lookups of play_response, responses_of and __contains__ are replaced.
+
+    def __init__(self, path, *args, **kwargs):
+        super(IndexedCassette, self).__init__(path, *args, **kwargs)
+        self.path = path
+        self.match_on = kwargs.get('match_on', ())
+        self.index = {}
+
+    def append(self, request, response):
+        length = len(self.data)
+        super(IndexedCassette, self).append(request, response)
+        if len(self.data) > length:
+            self.index.setdefault(request_key(self.data[-1][0]), []).append(length)
+
+    def matches(self, request):
+        # The indices of the recorded interactions matching the request
+        request = self.filter_request(request)
+        indices = self.index.get(request_key(request))
+        if indices is not None:
+            return indices
+        # The matchers may still accept a body of another kind that is the same
+        return [
+            index for index, (recorded_request, _response) in enumerate(self.data)
+            if vcr.matchers.requests_match(request, recorded_request, self.match_on)
+        ]
+
+    def _playable(self, index):
+        return self.play_counts[index] == 0 or self.allow_playback_repeats
+
+    def play_response(self, request):
+        for index in self.matches(request):
+            if self._playable(index):
+                self.play_counts[index] += 1
+                return self.data[index][1]
+        raise vcr.errors.UnhandledHTTPRequestError(
+            "The cassette ({0!r}) doesn't contain the request ({1!r}) asked for".format(self.path, request)
+        )
+
+    def responses_of(self, request):
+        responses = [self.data[index][1] for index in self.matches(request)]
+        if not responses:
+            raise vcr.errors.UnhandledHTTPRequestError(
+                "The cassette ({0!r}) doesn't contain the request ({1!r}) asked for".format(self.path, request)
+            )
+        return responses
+
+    def __contains__(self, request):
+        return any(self._playable(index) for index in self.matches(request))
 
 
 def filter_request_uri(request):
@@ -41,38 +125,162 @@ def filter_request_uri(request):
     return request
 
 
-VCR_PARAMS_FILE = os.environ.get('PAM_TEST_VCR_PARAMS_FILE')
+def module_name(path):
+    # AnsiballZ_<module>.py
+    return re.sub(r'^AnsiballZ_|\.py$', '', os.path.basename(path))
+
+
+def cassette_path(test_name, serial, check_mode=False):
+    # Check mode plays back the answers of the run, unless a module asks differently in check mode;
+    # those playbooks get cassettes of their own, recorded with `make record-check_<playbook_name>`
+    if check_mode:
+        path = os.path.join(TESTS_DIR, 'fixtures', '{}-check_mode-{}{}'.format(test_name, serial, cassette_serializer.SUFFIX))
+        if check_mode == 'record' or os.path.exists(path):
+            return path
+    return os.path.join(TESTS_DIR, 'fixtures', '{}-{}{}'.format(test_name, serial, cassette_serializer.SUFFIX))
 
-# Remove the name of the wrapper from argv
-# (to make it look like the module had been called directly)
-sys.argv.pop(0)
 
-if VCR_PARAMS_FILE is None:
-    # Run the program as if nothing had happened
+def budget_path(test_name):
+    return os.path.join(TESTS_DIR, 'budgets', '{}.yml'.format(test_name))
+
+
+def invocations_path(test_name):
+    return os.path.join(TESTS_DIR, 'invocations', '{}.json'.format(test_name))
+
+
+def use_cassette(test_name, serial, record_mode, check_mode=False):
+    if check_mode and record_mode != 'none':
+        check_mode = 'record'
+    amp_vcr = vcr.VCR()
+    amp_vcr.register_matcher('amp_body', amp_body_matcher)
+    amp_vcr.register_serializer(cassette_serializer.NAME, cassette_serializer)
+    return IndexedCassette.use(**amp_vcr.get_merged_config(
+        path=cassette_path(test_name, serial, check_mode),
+        record_mode=record_mode,
+        serializer=cassette_serializer.NAME,
+        match_on=['method', 'path', 'query', 'amp_body'],
+        filter_headers=['Authorization', 'Cookie', 'X-CSRFToken'],
+        before_record_request=filter_request_uri,
+    ))
+
+
+# Every playbook may have a budget file, holding the most requests a single call of each module may send
+def check_budget(budget_file, module, requests, update):
+    if update:
+        with open(budget_file, 'a+') as f:
+            # The check mode test of the playbook may run at the same time
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            budgets = yaml.safe_load(f) or {}
+            if requests > budgets.get(module, -1):
+                budgets[module] = requests
+                f.seek(0)
+                f.truncate()
+                yaml.safe_dump(budgets, f, default_flow_style=False)
+        return None
+    if not os.path.exists(budget_file):
+        return None
+    with open(budget_file) as f:
+        budget = (yaml.safe_load(f) or {}).get(module)
+    if budget is not None and requests > budget:
+        return "Request budget exceeded: {0} sent {1} requests, the budget in {2} is {3}.".format(module, requests, budget_file, budget)
+    return None
+
+
+# The module calls of a playbook run are kept with their arguments and outcome,
+# to replay them in process against the cassettes without ansible (see test_modules.py)
+def record_invocation(invocations_file, serial, module, module_args, result):
+    invocations = {}
+    if os.path.exists(invocations_file):
+        with open(invocations_file) as f:
+            invocations = json.load(f)
+    invocations[str(serial)] = {
+        'module': module,
+        'args': dict((key, value) for key, value in module_args.items() if not key.startswith('_ansible_') and key not in CONNECTION_ARGS),
+        'check_mode': module_args.get('_ansible_check_mode', False),
+        'changed': result.get('changed', False),
+        'failed': result.get('failed', False),
+    }
+    with open(invocations_file, 'w') as f:
+        json.dump(invocations, f)
+
+
+def run_module():
     with open(sys.argv[0]) as f:
         code = compile(f.read(), sys.argv[0], 'exec')
-        exec(code)
-else:
+        exec(code, globals())
+
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Replaced by the example connection details when replaying the invocations
+CONNECTION_ARGS = ['pulp_url', 'username', 'password', 'validate_certs']
+
+
+def main():
+    vcr_params_file = os.environ.get('PAM_TEST_VCR_PARAMS_FILE')
+
+    # Remove the name of the wrapper from argv
+    # (to make it look like the module had been called directly)
+    sys.argv.pop(0)
+
+    if vcr_params_file is None:
+        # Run the program as if nothing had happened
+        run_module()
+        return
+
     # Run the program wrapped within vcr cassette recorder
     # Load recording parameters from file
-    with open(VCR_PARAMS_FILE, 'r') as params_file:
+    with open(vcr_params_file, 'r') as params_file:
         test_params = json.load(params_file)
-    cassette_file = '../fixtures/{}-{}.yml'.format(test_params['test_name'], test_params['serial'])
+    test_name = test_params['test_name']
+    serial = test_params['serial']
     # Increase serial and dump back to file
     test_params['serial'] += 1
-    with open(VCR_PARAMS_FILE, 'w') as params_file:
+    with open(vcr_params_file, 'w') as params_file:
         json.dump(test_params, params_file)
 
+    if test_params['record_mode'] == 'none':
+        # The answers are replayed, so waiting for tasks to make progress is pointless
+        os.environ['SQUEEZER_TASK_POLL_INTERVAL'] = '0'
+
     # Call the original python script with vcr-cassette in place
-    amp_vcr = vcr.VCR()
-    amp_vcr.register_matcher('amp_body', amp_body_matcher)
-    with amp_vcr.use_cassette(
-        cassette_file,
-        record_mode=test_params['record_mode'],
-        match_on=['method', 'path', 'query', 'amp_body'],
-        filter_headers=['Authorization'],
-        before_record_request=filter_request_uri,
-    ):
-        with open(sys.argv[0]) as f:
-            code = compile(f.read(), sys.argv[0], 'exec')
-            exec(code)
+    # The result of the module is held back, to fail it when the module exceeded its request budget
+    real_stdout = sys.stdout
+    sys.stdout = StringIO()
+    exit_code = 0
+    requests = None
+    try:
+        with use_cassette(test_name, serial, test_params['record_mode'], test_params.get('check_mode', False)) as cassette:
+            recorded = len(cassette)
+            try:
+                run_module()
+            except SystemExit as e:
+                exit_code = e.code or 0
+            # Played back and newly recorded interactions
+            requests = cassette.play_count + len(cassette) - recorded
+    finally:
+        output = sys.stdout.getvalue()
+        sys.stdout = real_stdout
+        if requests is None:
+            # Something went wrong beyond the module; pass on what it printed
+            sys.stdout.write(output)
+
+    module = module_name(sys.argv[0])
+    message = None
+    if requests is not None:
+        message = check_budget(budget_path(test_name), module, requests, test_params.get('update_budgets', False))
+    if message is not None:
+        result = json.loads(output)
+        result.update(failed=True, msg=message)
+        output = json.dumps(result)
+        exit_code = 1
+    if requests is not None and test_params.get('invocations_file'):
+        # The arguments as handed to the module by the AnsiballZ wrapper
+        module_args = json.loads(sys.modules['ansible.module_utils.basic']._ANSIBLE_ARGS)['ANSIBLE_MODULE_ARGS']
+        record_invocation(test_params['invocations_file'], serial, module, module_args, json.loads(output))
+    sys.stdout.write(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()